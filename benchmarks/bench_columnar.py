@@ -0,0 +1,97 @@
+# Writing and reading memory-mapped columnar schedules.
+#
+# Writes the schedules of a portfolio of 30 year loans to a temporary schedule
+# directory and times the writer, opening the directory, reading single
+# loans, reading one month across all loans, the monthly totals and the CSV
+# export. Peak memory is reported after writing, to compare with the size of
+# the files.
+#
+# Usage:
+#     python benchmarks/bench_columnar.py [--loans 100000]
+import argparse
+import os
+import resource
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from mortgage_columnar import ColumnarSchedules, write_columnar_csv, write_schedules
+
+
+def peak_mb():
+    """Peak resident memory of this process so far, in MB"""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark columnar schedule files")
+    parser.add_argument('--loans', type=int, default=100_000, help="Loans in the portfolio")
+    parser.add_argument('--csv-loans', type=int, default=2_000,
+                        help="Loans exported to CSV (the export is timed per row)")
+    args = parser.parse_args(argv)
+
+    rng = np.random.default_rng(0)
+    loan_amount = rng.uniform(500_000, 5_000_000, args.loans).round(-3)
+    rate = rng.uniform(1, 8, args.loans).round(2)
+    principal = (loan_amount / 360).round(2)
+    extra = rng.choice([0.0, 500.0, 2_000.0], args.loans)
+    fee = rng.uniform(0, 4_000, args.loans).round(2)
+    directory = tempfile.mkdtemp(prefix='schedules_')
+    try:
+        before = peak_mb()
+        start = time.perf_counter()
+        rows = write_schedules(directory, loan_amount, rate, principal, extra, fee,
+                               currency='kr')
+        elapsed = time.perf_counter() - start
+        size = sum(os.path.getsize(os.path.join(directory, name))
+                   for name in os.listdir(directory)) / 2 ** 20
+        print(f"write        {args.loans:,} loans, {rows:,} rows in {elapsed:.2f}s "
+              f"({rows / elapsed:,.0f} rows/sec)")
+        print(f"             {size:,.0f} MB on disk, peak memory {before:,.0f} -> "
+              f"{peak_mb():,.0f} MB")
+
+        start = time.perf_counter()
+        schedules = ColumnarSchedules(directory)
+        print(f"open         {(time.perf_counter() - start) * 1000:.2f} ms")
+
+        picks = rng.integers(0, len(schedules), 1_000)
+        start = time.perf_counter()
+        for index in picks:
+            list(schedules[index])
+        elapsed = time.perf_counter() - start
+        print(f"one loan     {elapsed / len(picks) * 1000:.3f} ms per schedule "
+              f"(all rows as ScheduleRows)")
+
+        start = time.perf_counter()
+        for month in range(1, 361, 12):
+            schedules.month(month)
+        print(f"one month    {(time.perf_counter() - start) / 30 * 1000:.1f} ms "
+              f"across {len(schedules):,} loans")
+
+        start = time.perf_counter()
+        schedules.monthly_totals()
+        elapsed = time.perf_counter() - start
+        print(f"totals       {elapsed:.2f}s ({rows / elapsed:,.0f} rows/sec)")
+
+        csv_path = os.path.join(directory, 'export.csv')
+        subset_dir = os.path.join(directory, 'subset')
+        count = min(args.csv_loans, args.loans)
+        write_schedules(subset_dir, loan_amount[:count], rate[:count], principal[:count],
+                        extra[:count], fee[:count], currency='kr')
+        subset = ColumnarSchedules(subset_dir)
+        start = time.perf_counter()
+        written = write_columnar_csv(csv_path, subset)
+        elapsed = time.perf_counter() - start
+        print(f"csv export   {written:,} rows in {elapsed:.2f}s ({written / elapsed:,.0f} rows/sec)")
+    finally:
+        shutil.rmtree(directory)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,135 @@
+# Pricing loans with dated events: closed-form segments against monthly steps.
+#
+# In the busy portfolio every loan gets a yearly bonus lump sum, a rate reset
+# every five years, a six-month payment pause and a raised principal payment
+# afterwards, about 40 events each; in the quiet one only the rate resets. The
+# segment engine is timed against stepping the same batch one month at a
+# time, vectorized over the loans, and the totals of the two are checked to
+# agree to the cent.
+#
+# Usage:
+#     python benchmarks/bench_events.py [--loans 100000]
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from mortgage_events import (EXTRA, LUMP_SUM, PRINCIPAL, RATE, EventTable, _event_units,
+                             event_schedule, price_events)
+from mortgage_money import INTEREST_DIVISOR, to_cents, to_rate_units
+
+
+def rate_reset_events(rng, loans):
+    """EventTable with only a rate reset every five years"""
+    count = 5
+    return EventTable(np.repeat(np.arange(loans), count),
+                      np.tile(np.arange(1, count + 1) * 60 + 1, loans),
+                      np.full(loans * count, 'rate', dtype=object),
+                      rng.uniform(1, 7, loans * count).round(2))
+
+
+def portfolio_events(rng, loans):
+    """EventTable with the events described at the top of this file"""
+    years = np.arange(1, 31)
+    owner, month, kind, amount = [], [], [], []
+
+    def add(loan, months, event, amounts):
+        owner.append(loan)
+        month.append(months)
+        kind.append(np.full(len(loan), event, dtype=object))
+        amount.append(amounts)
+
+    index = np.arange(loans)
+    for year in years:
+        add(index, np.full(loans, year * 12), 'lump_sum',
+            rng.choice([0.0, 10_000.0, 25_000.0], loans))
+    for year in range(5, 30, 5):
+        add(index, np.full(loans, year * 12 + 1), 'rate', rng.uniform(1, 7, loans).round(2))
+    pause = rng.integers(12, 120, loans)
+    add(index, pause, 'principal', np.zeros(loans))
+    add(index, pause + 6, 'principal', rng.uniform(6_000, 9_000, loans).round(2))
+    add(index, pause, 'extra', np.zeros(loans))
+    loan, month, kind, amount = (np.concatenate(column) for column in (owner, month, kind,
+                                                                        amount))
+    order = np.lexsort((month, loan))
+    return EventTable(loan[order], month[order], kind[order], amount[order])
+
+
+def price_monthly(loan_amount, interest_rate, principal_payment, extra_payment, events):
+    """Total interest and payoff months, stepping every loan month by month
+    with the same exact interest as the engine"""
+    balance = to_cents(loan_amount)
+    rate = to_rate_units(interest_rate)
+    principal, extra = to_cents(principal_payment), to_cents(extra_payment)
+    months, codes, units = _event_units(events.month, events.kind, events.amount)
+    order = np.argsort(months, kind='stable')
+    bounds = np.searchsorted(months[order], np.arange(int(months.max(initial=0)) + 2))
+    whole = np.zeros(len(balance), dtype=np.int64)
+    rest = np.zeros(len(balance), dtype=np.int64)
+    payoff = np.zeros(len(balance), dtype=np.int64)
+    month = 0
+    while np.any(balance > 0):
+        month += 1
+        due = order[bounds[min(month, len(bounds) - 1)]:bounds[min(month + 1, len(bounds) - 1)]]
+        for code, values in ((PRINCIPAL, principal), (EXTRA, extra), (RATE, rate)):
+            hit = due[codes[due] == code]
+            values[events.loan[hit]] = units[hit]
+        lump = np.zeros(len(balance), dtype=np.int64)
+        hit = due[codes[due] == LUMP_SUM]
+        np.add.at(lump, events.loan[hit], units[hit])
+        owing = balance > 0
+        quotient, remainder = np.divmod(balance, INTEREST_DIVISOR)
+        accrued = rest + rate * remainder
+        whole += rate * quotient + accrued // INTEREST_DIVISOR
+        rest = accrued % INTEREST_DIVISOR
+        balance = np.maximum(balance - principal - extra - lump, 0)
+        payoff[owing & (balance == 0)] = month
+    return whole + (2 * rest + INTEREST_DIVISOR) // (2 * INTEREST_DIVISOR), payoff
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the event-driven engine")
+    parser.add_argument('--loans', type=int, default=100_000, help="Loans in the batch")
+    args = parser.parse_args(argv)
+
+    rng = np.random.default_rng(0)
+    loan_amount = rng.uniform(500_000, 5_000_000, args.loans).round(-3)
+    rate = rng.uniform(1, 8, args.loans).round(2)
+    principal = (loan_amount / 360).round(2)
+    extra = rng.choice([0.0, 500.0, 2_000.0], args.loans)
+    same = True
+    for name, events in (("busy", portfolio_events(rng, args.loans)),
+                         ("quiet", rate_reset_events(rng, args.loans))):
+        print(f"{name}: {args.loans:,} loans, {len(events.loan):,} events")
+        start = time.perf_counter()
+        results = price_events(loan_amount, rate, principal, extra, events=events)
+        elapsed = time.perf_counter() - start
+        print(f"  segments   {elapsed:.2f}s ({args.loans / elapsed:,.0f} loans/sec)")
+
+        start = time.perf_counter()
+        interest, payoff = price_monthly(loan_amount, rate, principal, extra, events)
+        elapsed = time.perf_counter() - start
+        print(f"  monthly    {elapsed:.2f}s ({args.loans / elapsed:,.0f} loans/sec)")
+        match = (np.array_equal(payoff, results['payoff_months'])
+                 and np.array_equal(interest, to_cents(results['total_interest'])))
+        print(f"             totals {'match' if match else 'DIFFER'}")
+        same &= match
+
+    events = portfolio_events(rng, 1)
+    first = list(zip(events.month, events.kind, events.amount))
+    start = time.perf_counter()
+    for _ in range(1_000):
+        schedule = event_schedule(loan_amount[0], rate[0], principal[0], extra[0],
+                                  events=first)
+    elapsed = time.perf_counter() - start
+    print(f"one loan     {elapsed:.3f} ms per schedule ({len(first)} events, "
+          f"{len(schedule.segments)} segments, {len(schedule)} months)")
+    return 0 if same else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,95 @@
+# Incremental recalculation of interactive edits.
+#
+# Replays runs of single-field edits on a long schedule the way the live
+# recalculation worker sees them. It compares a full recompute (the engine
+# plus the whole month-by-month schedule, as before) with the incremental
+# path: update_loan() recomputes only the results an edit changes, and
+# build_schedule() keeps the schedule segments before the first month the edit
+# changes and solves the rest in closed form.
+# Every incremental schedule is checked against schedule_rows().
+#
+# Usage:
+#     python benchmarks/bench_incremental.py [--loan 4000000] [--edits 40]
+import argparse
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from mortgage_engine import ENGINE_INPUTS, calculate_loan, update_loan  # noqa: E402
+from mortgage_schedule import build_schedule, schedule_rows  # noqa: E402
+
+
+def edit_runs(loan, count):
+    """name: list of engine input tuples, one per edit"""
+    base = (loan, 4.5, 5_000.0, 0.0, 3_000.0, 1)
+    return {
+        'monthly fee': [base[:4] + (3_000.0 + step, 1) for step in range(count)],
+        'extra payment from year 10': [base[:3] + (1_000.0 + 10 * step, 3_000.0, 109)
+                                       for step in range(count)],
+        'extra payment start year': [base[:3] + (2_000.0, 3_000.0, 12 * step + 1)
+                                     for step in range(1, count + 1)],
+        'extra payment from year 1': [base[:3] + (1_000.0 + 10 * step, 3_000.0, 1)
+                                      for step in range(count)],
+        'interest rate': [(loan, 4.5 + step / 100) + base[2:] for step in range(count)],
+    }
+
+
+def full(edits):
+    """Recompute everything for every edit"""
+    for inputs in edits:
+        results = calculate_loan(*inputs)
+        schedule = list(schedule_rows(results['loan_amount'], *inputs[1:]))
+    return schedule
+
+
+def incremental(edits):
+    """Recompute each edit from the one before it, as the live worker does"""
+    inputs = edits[0]
+    results = calculate_loan(*inputs)
+    schedule = build_schedule(*inputs)
+    for new_inputs in edits[1:]:
+        results = update_loan(dict(zip(ENGINE_INPUTS, inputs)), results, *new_inputs)
+        schedule = build_schedule(*new_inputs, previous=schedule)
+        inputs = new_inputs
+    return schedule
+
+
+def best_time(function, repeat=5):
+    """Fastest of repeat calls, in seconds"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare full and incremental recalculation")
+    parser.add_argument('--loan', type=float, default=4_000_000, help="Loan amount")
+    parser.add_argument('--edits', type=int, default=40, help="Edits per run")
+    args = parser.parse_args(argv)
+
+    months = len(build_schedule(args.loan, 4.5, 5_000.0))
+    print(f"Per edit, {months}-month schedule")
+    failed = 0
+    for name, edits in edit_runs(args.loan, args.edits).items():
+        if list(incremental(edits)) != list(schedule_rows(*edits[-1])):
+            failed += 1
+            print(f"  {name}: incremental schedule differs from schedule_rows()")
+        # The first edit of a run is a full calculation in both cases
+        full_seconds = best_time(lambda: full(edits[1:]))
+        incremental_seconds = best_time(lambda: incremental(edits)) - best_time(
+            lambda: incremental(edits[:1]))
+        per_edit = len(edits) - 1
+        print(f"  {name:<28} full {full_seconds / per_edit * 1e6:8.1f} us   "
+              f"incremental {incremental_seconds / per_edit * 1e6:8.1f} us   "
+              f"{full_seconds / incremental_seconds:5.1f}x")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
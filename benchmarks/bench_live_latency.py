@@ -0,0 +1,87 @@
+# UI frame latency while typing into "Loan Seeking For" with live recalculation.
+#
+# A heartbeat is scheduled every FRAME_MS on the Tk mainloop; how late each
+# beat runs is the frame latency the user would see. Keystrokes are simulated
+# by appending digits to the loan seeking field while every recalculation
+# also builds the full month-by-month schedule.
+#
+# Needs a display (use xvfb-run on a headless machine).
+#
+# Usage:
+#     python benchmarks/bench_live_latency.py [--keystrokes 200]
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+FRAME_MS = 10
+KEYSTROKE_MS = 40
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of a list of numbers"""
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure UI latency during live recalculation")
+    parser.add_argument('--keystrokes', type=int, default=200)
+    args = parser.parse_args(argv)
+
+    import tkinter as tk
+    try:
+        root = tk.Tk()
+    except tk.TclError as e:
+        print(f"No display available ({e}); run under xvfb-run")
+        return 1
+
+    from mortgage_calculator_new import MortgageCalculator
+
+    app = MortgageCalculator(root)
+    app.interest_rate_var.set("4.5")
+    # Small principal payment so every recalculation builds a long schedule
+    app.principal_payment_var.set("500")
+    app.extra_payment_var.set("0")
+    app.monthly_fee_var.set("3000")
+
+    latencies = []
+    state = {'expected': None, 'typed': 0, 'text': "1"}
+
+    def heartbeat():
+        now = time.perf_counter()
+        if state['expected'] is not None:
+            latencies.append(max(0.0, (now - state['expected']) * 1000))
+        state['expected'] = now + FRAME_MS / 1000
+        app.root.after(FRAME_MS, heartbeat)
+
+    def type_key():
+        if state['typed'] >= args.keystrokes:
+            # Let the last debounce and computation finish before stopping
+            app.root.after(1000, app.root.quit)
+            return
+        state['text'] = state['text'][-6:] + str(state['typed'] % 10)
+        app.loan_seeking_var.set(state['text'])
+        state['typed'] += 1
+        app.root.after(KEYSTROKE_MS, type_key)
+
+    app.root.after(FRAME_MS, heartbeat)
+    app.root.after(200, type_key)
+    app.root.mainloop()
+
+    recalculator = app.live_recalculator
+    print(f"keystrokes: {args.keystrokes}, recalculations: {recalculator.submitted}, "
+          f"stale results dropped: {recalculator.dropped}")
+    print(f"frame latency ms: p50 {statistics.median(latencies):.2f}, "
+          f"p95 {percentile(latencies, 0.95):.2f}, "
+          f"p99 {percentile(latencies, 0.99):.2f}, max {max(latencies):.2f}")
+    app.on_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
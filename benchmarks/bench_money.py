@@ -0,0 +1,124 @@
+# Float vs integer-cents money arithmetic.
+#
+# Times batch pricing with the float engine (mortgage_engine.calculate_batch)
+# against the exact int64 cents engine (mortgage_money), with and without the
+# conversion from float inputs, and month-by-month schedules stepped in
+# floats against the exact cents schedules. Also counts the schedules whose
+# rows, rounded to cents as they are exported, do not add up to the loan
+# amount and the total interest; the cents schedules always do.
+#
+# Usage:
+#     python benchmarks/bench_money.py [--loans 1000000] [--schedules 2000]
+import argparse
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import numpy as np  # noqa: E402
+
+from mortgage_engine import calculate_batch  # noqa: E402
+from mortgage_money import (calculate_batch_cents, price_cents, schedule_columns,  # noqa: E402
+                            to_cents, to_rate_units)
+from mortgage_schedule import ScheduleRow, schedule_rows  # noqa: E402
+
+
+def best_time(function, repeat=3):
+    """Fastest of repeat calls, in seconds"""
+    function()  # Warm up
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def random_loans(count, seed=0):
+    """Reproducible loan inputs with amounts that have cents"""
+    rng = np.random.default_rng(seed)
+    return (
+        np.round(rng.uniform(200_000, 5_000_000, count), 2),
+        np.round(rng.uniform(1, 10, count), 2),
+        np.round(rng.uniform(1_000, 20_000, count), 2),
+        rng.choice([0.0, 1_000.0, 5_000.0], count),
+        np.round(rng.uniform(0, 5_000, count), 2),
+    )
+
+
+def float_schedule_rows(loan_amount, interest_rate, principal_payment,
+                        extra_payment=0.0, monthly_fee=0.0):
+    """The float schedule generator schedule_rows() used before"""
+    monthly_rate = interest_rate / 100 / 12
+    balance = float(loan_amount)
+    total_interest = 0.0
+    total_paid = 0.0
+    month = 0
+    while balance > 0.005:
+        month += 1
+        interest = balance * monthly_rate
+        principal = min(principal_payment, balance)
+        extra = min(extra_payment, balance - principal)
+        balance -= principal + extra
+        payment = principal + extra + interest + monthly_fee
+        total_interest += interest
+        total_paid += payment
+        yield ScheduleRow(month, payment, principal, extra, interest, monthly_fee,
+                          max(balance, 0.0), total_interest, total_paid)
+
+
+def reconciles(rows, loan_amount):
+    """True when the rows, rounded to cents as exported, add up to the loan
+    amount and to the total interest shown on the last row"""
+    principal = sum(round((row.principal + row.extra) * 100) for row in rows)
+    interest = sum(round(row.interest * 100) for row in rows)
+    return (principal == round(loan_amount * 100)
+            and interest == round(rows[-1].total_interest * 100))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare float and integer-cents arithmetic")
+    parser.add_argument('--loans', type=int, default=1_000_000, help="Loans priced per batch")
+    parser.add_argument('--schedules', type=int, default=2000, help="Schedules built")
+    args = parser.parse_args(argv)
+
+    inputs = random_loans(args.loans)
+    cents = (to_cents(inputs[0]), to_rate_units(inputs[1]),
+             to_cents(inputs[2]), to_cents(inputs[3]), to_cents(inputs[4]))
+    print(f"Batch pricing, {args.loans:,} loans")
+    timings = {
+        'float engine': best_time(lambda: calculate_batch(*inputs)),
+        'cents engine (int64 inputs)': best_time(lambda: price_cents(*cents)),
+        'cents engine (float inputs)': best_time(lambda: calculate_batch_cents(*inputs)),
+    }
+    for name, seconds in timings.items():
+        print(f"  {name:<32} {seconds * 1000:9.1f} ms  "
+              f"{args.loans / seconds:14,.0f} loans/s")
+
+    count = args.schedules
+    loan, rate, principal, extra, _ = (column.tolist() for column in random_loans(count, seed=1))
+    loans = list(zip(loan, rate, principal, extra))
+    print(f"\nSchedules, {count:,} loans")
+    timings = {
+        'float rows (previous)': best_time(
+            lambda: [list(float_schedule_rows(*row)) for row in loans], repeat=1),
+        'cents rows (schedule_rows)': best_time(
+            lambda: [list(schedule_rows(*row)) for row in loans], repeat=1),
+        'cents columns (schedule_columns)': best_time(
+            lambda: schedule_columns(to_cents(loan), to_rate_units(rate), to_cents(principal),
+                                     to_cents(extra)), repeat=1),
+    }
+    for name, seconds in timings.items():
+        print(f"  {name:<32} {seconds * 1000:9.1f} ms")
+
+    float_misses = sum(not reconciles(list(float_schedule_rows(*row)), row[0]) for row in loans)
+    cents_misses = sum(not reconciles(list(schedule_rows(*row)), row[0]) for row in loans)
+    print(f"\nSchedules whose rounded rows do not add up to their totals: "
+          f"float {float_misses:,} of {count:,}, cents {cents_misses:,} of {count:,}")
+    return 1 if cents_misses else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,119 @@
+# Customer reports per second: the batch renderer against "Export PDF".
+#
+# The baseline renders each loan's results summary with render_summary_pdf(),
+# one document after another, as the window's export does. The batch
+# renderer writes the same summary plus two balance charts per document,
+# first in this process and then on a pool of worker processes. The baseline
+# is timed again with binary PDF streams, which the batch renderer's workers
+# write, to separate that from the layout reuse.
+#
+# Usage:
+#     python benchmarks/bench_reports.py [--loans 2000] [--workers 4]
+import argparse
+import csv
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from mortgage_export import build_summary_report, render_summary_pdf
+from mortgage_reports import BinaryStreams, render_portfolio
+
+
+def write_portfolio(path, count):
+    """Portfolio CSV of count loans with a mix of terms and extra payments"""
+    rng = np.random.default_rng(0)
+    loan = rng.uniform(500_000, 5_000_000, count).round(-3)
+    rate = rng.uniform(1, 8, count).round(2)
+    principal = (loan / rng.integers(120, 480, count)).round()
+    extra = rng.choice([0, 1_000, 3_000], count)
+    fee = rng.choice([0, 2_500], count)
+    start_year = rng.choice(['', '3', '10'], count)
+    with open(path, 'w', newline='', encoding='utf-8') as output:
+        writer = csv.writer(output)
+        writer.writerow(['customer', 'loan_seeking', 'down_payment', 'interest_rate',
+                         'principal_payment', 'extra_payment', 'monthly_fee', 'currency',
+                         'extra_start_year'])
+        for index in range(count):
+            writer.writerow([f"Customer {index + 1}", loan[index], 'auto', rate[index],
+                             principal[index], extra[index], fee[index], 'kr',
+                             start_year[index]])
+
+
+def summary_reports(path):
+    """The render_summary_pdf() report of every loan in the portfolio, with
+    the lines the window's export writes"""
+    from mortgage_engine import calculate_loan
+    from mortgage_inputs import format_months, parse_start_year
+
+    reports = []
+    with open(path, newline='', encoding='utf-8') as input_file:
+        for row in csv.DictReader(input_file):
+            loan_seeking = float(row['loan_seeking'])
+            down_payment = loan_seeking * 0.15
+            start_month = parse_start_year(row['extra_start_year'])
+            result = calculate_loan(loan_seeking - down_payment, float(row['interest_rate']),
+                                    float(row['principal_payment']),
+                                    float(row['extra_payment']), float(row['monthly_fee']),
+                                    start_month)
+            reports.append(build_summary_report(
+                [f"Loan Seeking For: kr{loan_seeking:,.0f}",
+                 f"Down Payment: kr{down_payment:,.0f}",
+                 f"Loan Amount: kr{result['loan_amount']:,.0f}",
+                 f"Interest Rate: {row['interest_rate']}%",
+                 f"Extra Payments From: Year {row['extra_start_year'] or 1}"],
+                [f"Principal Payment: kr{result['principal_payment']:,.0f}",
+                 f"Extra Payment: kr{result['extra_payment']:,.0f}",
+                 f"Total Principal: kr{result['total_principal']:,.0f}",
+                 f"Interest Payment: kr{result['monthly_interest']:,.0f}",
+                 f"Monthly House Fee: {result['monthly_fee']:,.0f}",
+                 f"Total Monthly Payment: kr{result['monthly_payment']:,.0f}"],
+                [f"Time Saved: {format_months(result['time_saved_months'])}",
+                 f"Interest Saved: kr{result['interest_saved']:,.0f}",
+                 f"Loan Payoff Time: {format_months(result['payoff_months'])}"]))
+    return reports
+
+
+def time_summaries(reports, directory):
+    """Documents per second rendering every report with render_summary_pdf()"""
+    start = time.perf_counter()
+    for report in reports:
+        render_summary_pdf(report, export_dir=directory)
+    return len(reports) / (time.perf_counter() - start)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the batch report renderer")
+    parser.add_argument('--loans', type=int, default=2_000)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as directory:
+        portfolio = os.path.join(directory, 'portfolio.csv')
+        write_portfolio(portfolio, args.loans)
+        reports = summary_reports(portfolio)
+        print(f"{args.loans:,} reports, {os.cpu_count()} CPUs")
+
+        baseline = time_summaries(reports, os.path.join(directory, 'summary'))
+        print(f"export_pdf (summary only)      {baseline:8,.0f} docs/sec")
+
+        rates = {}
+        for workers in sorted({1, args.workers}):
+            stats = render_portfolio(portfolio, os.path.join(directory, f'batch_{workers}'),
+                                     workers=workers)
+            rates[workers] = stats['reports_per_second']
+            print(f"batch, {workers} worker{'s' if workers > 1 else ' '} (with charts) "
+                  f"{rates[workers]:8,.0f} docs/sec ({rates[workers] / baseline:.1f}x)")
+
+        with BinaryStreams():  # The baseline again with the workers' binary streams
+            binary = time_summaries(reports, os.path.join(directory, 'binary'))
+        print(f"export_pdf, binary streams     {binary:8,.0f} docs/sec")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
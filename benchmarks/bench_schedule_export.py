@@ -0,0 +1,51 @@
+# Throughput of the streaming schedule exporters.
+#
+# Usage:
+#     python benchmarks/bench_schedule_export.py [--loans 200]
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mortgage_schedule import write_schedule_csv, write_schedule_pdf
+
+
+def sample_loans(count):
+    """Portfolio of 30 year loans with a 360 row schedule each"""
+    for index in range(count):
+        loan_amount = 1_000_000 + 10_000 * index
+        yield {
+            'label': index + 1,
+            'loan_amount': loan_amount,
+            'interest_rate': 4.5,
+            'principal_payment': loan_amount / 360,
+            'monthly_fee': 3_000,
+            'currency': 'kr',
+        }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the schedule exporters")
+    parser.add_argument('--loans', type=int, default=200)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as directory:
+        start = time.perf_counter()
+        rows = write_schedule_csv(os.path.join(directory, 'schedule.csv'),
+                                  sample_loans(args.loans))
+        elapsed = time.perf_counter() - start
+        print(f"CSV: {rows:,} rows in {elapsed:.2f}s ({rows / elapsed:,.0f} rows/sec)")
+
+        start = time.perf_counter()
+        pages, rows = write_schedule_pdf(os.path.join(directory, 'schedule.pdf'),
+                                         sample_loans(args.loans))
+        elapsed = time.perf_counter() - start
+        print(f"PDF: {pages:,} pages, {rows:,} rows in {elapsed:.2f}s "
+              f"({pages / elapsed:,.1f} pages/sec, {rows / elapsed:,.0f} rows/sec)")
+
+
+if __name__ == "__main__":
+    main()
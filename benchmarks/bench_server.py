@@ -0,0 +1,159 @@
+# Load test for the local HTTP/JSON service.
+#
+# Starts `mortgage_server.py` on a free localhost port (or uses --url), then
+# opens a number of keep-alive connections that each send requests back to
+# back for a fixed duration. Reports requests per second and p50/p95/p99/max
+# latency for each scenario.
+#
+# Usage:
+#     python benchmarks/bench_server.py [--connections 32] [--duration 5]
+#     python benchmarks/bench_server.py --url http://127.0.0.1:8765 single
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+from urllib.parse import urlsplit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+LOAN = {"loan_seeking": 1500000, "interest_rate": 4.5, "principal_payment": 5000,
+        "extra_payment": 1000, "monthly_fee": 3000, "currency": "kr"}
+
+# name: request body
+SCENARIOS = {
+    'single': LOAN,
+    'batch_100': {"loans": [dict(LOAN, loan_seeking=1000000 + i * 5000) for i in range(100)]},
+    'schedule_1': dict(LOAN, schedule=True),
+    'batch_5000': {"loans": [dict(LOAN, loan_seeking=1000000 + i * 100) for i in range(5000)]},
+}
+
+
+def _free_port():
+    """Ask the system for an unused localhost port"""
+    with socket.socket() as probe:
+        probe.bind(('127.0.0.1', 0))
+        return probe.getsockname()[1]
+
+
+async def _wait_for_server(host, port, timeout=30):
+    """Wait until the server accepts connections"""
+    deadline = time.perf_counter() + timeout
+    while True:
+        try:
+            _, writer = await asyncio.open_connection(host, port)
+            writer.close()
+            return
+        except OSError:
+            if time.perf_counter() > deadline:
+                raise
+            await asyncio.sleep(0.1)
+
+
+async def _client(host, port, request, deadline, latencies, failures):
+    """Send requests on one keep-alive connection until the deadline"""
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            writer.write(request)
+            await writer.drain()
+            head = await reader.readuntil(b'\r\n\r\n')
+            length = 0
+            for line in head.split(b'\r\n'):
+                if line.lower().startswith(b'content-length:'):
+                    length = int(line.split(b':', 1)[1])
+            await reader.readexactly(length)
+            latencies.append(time.perf_counter() - start)
+            if not head.startswith(b'HTTP/1.1 200'):
+                failures.append(head.split(b'\r\n', 1)[0].decode())
+    finally:
+        writer.close()
+
+
+def _percentile(values, fraction):
+    """Nearest-rank percentile of sorted values"""
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+async def run_scenario(host, port, body, connections, duration):
+    """Load one scenario; returns a dict of throughput and latency figures"""
+    payload = json.dumps(body).encode('utf-8')
+    request = (f"POST /calculate HTTP/1.1\r\nHost: {host}\r\n"
+               f"Content-Type: application/json\r\nContent-Length: {len(payload)}\r\n"
+               f"\r\n").encode('latin-1') + payload
+    latencies = []
+    failures = []
+    start = time.perf_counter()
+    deadline = start + duration
+    await asyncio.gather(*(_client(host, port, request, deadline, latencies, failures)
+                           for _ in range(connections)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        'requests': len(latencies),
+        'failures': len(failures),
+        'requests_per_second': len(latencies) / elapsed,
+        'p50_ms': _percentile(latencies, 0.50) * 1000,
+        'p95_ms': _percentile(latencies, 0.95) * 1000,
+        'p99_ms': _percentile(latencies, 0.99) * 1000,
+        'max_ms': latencies[-1] * 1000,
+    }
+
+
+async def run(host, port, names, connections, duration):
+    """Run the selected scenarios against a running server"""
+    await _wait_for_server(host, port)
+    results = {}
+    for name in names:
+        results[name] = await run_scenario(host, port, SCENARIOS[name], connections, duration)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load test the mortgage HTTP/JSON service")
+    parser.add_argument('names', nargs='*', help=f"Scenarios to run ({', '.join(SCENARIOS)})")
+    parser.add_argument('--url', help="Test a running server instead of starting one")
+    parser.add_argument('--connections', type=int, default=32,
+                        help="Concurrent keep-alive connections")
+    parser.add_argument('--duration', type=float, default=5.0, help="Seconds per scenario")
+    parser.add_argument('--workers', type=int, help="Worker processes for a started server")
+    parser.add_argument('--json', action='store_true', help="Print results as JSON")
+    args = parser.parse_args(argv)
+    names = args.names or list(SCENARIOS)
+
+    server = None
+    if args.url:
+        parts = urlsplit(args.url)
+        host, port = parts.hostname, parts.port or 80
+    else:
+        host, port = '127.0.0.1', _free_port()
+        command = [sys.executable, os.path.join(ROOT, 'mortgage_server.py'),
+                   '--host', host, '--port', str(port)]
+        if args.workers:
+            command += ['--workers', str(args.workers)]
+        server = subprocess.Popen(command, cwd=ROOT, stdout=subprocess.DEVNULL)
+
+    try:
+        results = asyncio.run(run(host, port, names, args.connections, args.duration))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        for name, result in results.items():
+            print(f"{name:<12} {result['requests_per_second']:9,.0f} req/s  "
+                  f"p50 {result['p50_ms']:7.2f} ms  p95 {result['p95_ms']:7.2f} ms  "
+                  f"p99 {result['p99_ms']:7.2f} ms  max {result['max_ms']:7.2f} ms  "
+                  f"({result['requests']:,} requests, {result['failures']} failed)")
+    return 1 if any(result['failures'] for result in results.values()) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
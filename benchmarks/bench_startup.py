@@ -0,0 +1,96 @@
+# Import-time budget for the calculator's startup paths.
+#
+# Each scenario runs in a fresh interpreter under `python -X importtime`; the
+# cumulative time of its top-level imports is compared against a budget, and
+# modules the scenario must not load are checked too. Exits with status 1 if
+# any scenario is over budget or loads a forbidden module.
+#
+# Usage:
+#     python benchmarks/bench_startup.py [--runs 5] [--scale 1.5]
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HEAVY_MODULES = ('tkinter', 'ttkbootstrap', 'numpy', 'reportlab')
+
+# name: (code to run, budget in ms, modules that must not be imported)
+SCENARIOS = {
+    'headless': (
+        "import mortgage_calculator_new",
+        60, HEAVY_MODULES,
+    ),
+    'batch': (
+        "import mortgage_batch",
+        250, ('tkinter', 'ttkbootstrap', 'reportlab'),
+    ),
+    'gui': (
+        "import mortgage_calculator_new as app; app.load_gui(); "
+        "import ttkbootstrap, mortgage_live",
+        300, ('numpy', 'reportlab'),
+    ),
+}
+
+
+def measure(code):
+    """Run code under -X importtime; return (total ms, heavy modules loaded)"""
+    probe = (f"{code}\nimport sys, json\n"
+             f"print(json.dumps([m for m in {HEAVY_MODULES!r} if m in sys.modules]))")
+    completed = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', probe],
+        cwd=ROOT, capture_output=True, text=True, check=True)
+
+    total_us = 0
+    for line in completed.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line.split('|')
+        # Top-level imports have no indentation before the module name
+        if not name[1:].startswith(' '):
+            total_us += int(cumulative)
+    loaded = json.loads(completed.stdout.strip().splitlines()[-1])
+    return total_us / 1000, loaded
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check import-time budgets")
+    parser.add_argument('--runs', type=int, default=5,
+                        help="Runs per scenario; the fastest one is reported")
+    parser.add_argument('--scale', type=float, default=1.0,
+                        help="Multiply every budget, e.g. for slow CI machines")
+    parser.add_argument('--json', action='store_true', help="Print results as JSON")
+    args = parser.parse_args(argv)
+
+    results = {}
+    failed = False
+    for name, (code, budget, forbidden) in SCENARIOS.items():
+        timings = []
+        loaded = []
+        for _ in range(args.runs):
+            elapsed, loaded = measure(code)
+            timings.append(elapsed)
+        best = min(timings)
+        limit = budget * args.scale
+        unexpected = [module for module in loaded if module in forbidden]
+        ok = best <= limit and not unexpected
+        failed = failed or not ok
+        results[name] = {'ms': round(best, 2), 'budget_ms': limit,
+                         'forbidden_loaded': unexpected, 'ok': ok}
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        for name, result in results.items():
+            status = "ok" if result['ok'] else "FAIL"
+            extra = (f", loaded {', '.join(result['forbidden_loaded'])}"
+                     if result['forbidden_loaded'] else "")
+            print(f"{name:<10} {result['ms']:8.1f} ms (budget {result['budget_ms']:.0f} ms) "
+                  f"{status}{extra}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
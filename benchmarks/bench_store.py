@@ -0,0 +1,116 @@
+# Scenario store: bulk saves and listing at portfolio scale.
+#
+# Fills a temporary store with random priced scenarios through save_many()
+# (one transaction and prepared statement per chunk) and compares the rate
+# with committing every row on its own, then times the listings the Saved
+# Scenarios window runs and reopening one scenario with its schedule.
+#
+# Usage:
+#     python benchmarks/bench_store.py [--scenarios 300000] [--chunk-size 10000]
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import numpy as np  # noqa: E402
+
+from mortgage_engine import calculate_batch, calculate_loan  # noqa: E402
+from mortgage_schedule import schedule_rows  # noqa: E402
+from mortgage_store import ScenarioStore  # noqa: E402
+
+
+def random_records(count, seed=0):
+    """Priced scenario records for count random loans"""
+    rng = np.random.default_rng(seed)
+    loan_seeking = np.round(rng.uniform(500_000, 6_000_000, count), -3)
+    down_payment = loan_seeking * 0.15
+    rate = rng.choice([3.25, 3.5, 4.0, 4.5, 5.25], count)
+    principal = rng.choice([4_000.0, 5_000.0, 8_000.0], count)
+    extra = rng.choice([0.0, 1_000.0], count)
+    fee = np.full(count, 300.0)
+    results = calculate_batch(loan_seeking - down_payment, rate, principal, extra, fee)
+    columns = dict(results, loan_seeking=loan_seeking, down_payment=down_payment,
+                   interest_rate=rate)
+    names = ['loan_seeking', 'down_payment', 'loan_amount', 'interest_rate',
+             'principal_payment', 'extra_payment', 'monthly_fee', 'monthly_interest',
+             'monthly_payment', 'total_interest', 'interest_saved', 'payoff_months',
+             'time_saved_months']
+    values = [columns[name].tolist() for name in names]
+    customers = [f"C{number:05d}" for number in rng.integers(0, 20_000, count)]
+    return [dict(zip(names, row), customer=customer, currency='kr')
+            for customer, *row in zip(customers, *values)]
+
+
+def timed(function, repeat=5):
+    """Fastest of repeat calls in milliseconds, and the last result"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000, result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the SQLite scenario store")
+    parser.add_argument('--scenarios', type=int, default=300_000, help="Scenarios stored")
+    parser.add_argument('--chunk-size', type=int, default=10_000,
+                        help="Records per save_many() transaction")
+    args = parser.parse_args(argv)
+
+    records = random_records(args.scenarios)
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'scenarios.db')
+        with ScenarioStore(path) as store:
+            sample = records[:2000]
+            start = time.perf_counter()
+            for record in sample:
+                store.save_many([record])
+            single = len(sample) / (time.perf_counter() - start)
+
+            start = time.perf_counter()
+            for offset in range(len(sample), len(records), args.chunk_size):
+                store.save_many(records[offset:offset + args.chunk_size])
+            bulk = (len(records) - len(sample)) / (time.perf_counter() - start)
+            print(f"Saving {len(records):,} scenarios")
+            print(f"  {'one transaction per row':<40} {single:12,.0f} rows/s")
+            print(f"  {'save_many(), ' + format(args.chunk_size, ',') + ' per transaction':<40} "
+                  f"{bulk:12,.0f} rows/s")
+
+            inputs = dict(loan_seeking=1_500_000, down_payment=225_000, interest_rate=4.5,
+                          principal_payment=5_000, extra_payment=1_000, monthly_fee=300,
+                          currency='kr')
+            results = calculate_loan(1_275_000, 4.5, 5_000, 1_000, 300)
+            schedule = list(schedule_rows(1_275_000, 4.5, 5_000, 1_000, 300))
+            scenario_id = store.save(inputs, results, schedule, customer="C00042")
+
+        # Reopen, as a new session would
+        with ScenarioStore(path) as store:
+            print(f"\nListing (page of 200), {store.count():,} stored")
+            listings = {
+                'count all': lambda: store.count(),
+                'newest first': lambda: store.query(),
+                'page 500 (offset 100,000)': lambda: store.query(offset=100_000),
+                'one customer': lambda: store.query(customer="C00042"),
+                'customer prefix': lambda: store.query(customer="C012"),
+                'rate 3.25-3.5%': lambda: store.query(min_rate=3.25, max_rate=3.5),
+                'loan amount 1.00-1.01M': lambda: store.query(min_amount=1_000_000,
+                                                              max_amount=1_010_000),
+                'amount and rate, by payment': lambda: store.query(
+                    min_amount=1_000_000, max_amount=2_000_000, min_rate=4.5,
+                    order_by='monthly_payment'),
+                'open scenario with schedule': lambda: (store.get(scenario_id),
+                                                        store.schedule(scenario_id)),
+            }
+            for name, listing in listings.items():
+                milliseconds, _ = timed(listing)
+                print(f"  {name:<40} {milliseconds:9.2f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
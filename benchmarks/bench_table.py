@@ -0,0 +1,98 @@
+# Scrolling, resizing and sorting the virtualized schedule table.
+#
+# Shows a long schedule in mortgage_table.ScheduleTable and times each
+# operation until Tk has drawn it: filling the table, scrolling by rows and by
+# dragging the scrollbar, jumping to a year, resizing the window and sorting.
+# For comparison it also fills a plain ttk.Treeview with one item per month.
+#
+# Needs a display (use xvfb-run on a headless machine).
+#
+# Usage:
+#     python benchmarks/bench_table.py [--months 100000]
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def timed(root, action):
+    """Milliseconds for action() plus the redraw it causes"""
+    start = time.perf_counter()
+    action()
+    root.update()
+    return (time.perf_counter() - start) * 1000
+
+
+def report(name, samples):
+    """Print the median and worst of a list of milliseconds"""
+    print(f"  {name:<32} median {statistics.median(samples):8.2f} ms   "
+          f"worst {max(samples):8.2f} ms")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the virtualized schedule table")
+    parser.add_argument('--months', type=int, default=100_000, help="Schedule length")
+    parser.add_argument('--steps', type=int, default=300, help="Scroll steps timed")
+    args = parser.parse_args(argv)
+
+    import tkinter as tk
+    from tkinter import ttk
+    try:
+        root = tk.Tk()
+    except tk.TclError as e:
+        print(f"No display available ({e}); run under xvfb-run")
+        return 1
+
+    from mortgage_schedule import build_schedule
+    from mortgage_table import COLUMNS, ScheduleTable
+
+    # A principal payment that repays the loan in exactly args.months months
+    schedule = build_schedule(args.months * 100.0, 4.5, 100.0, 0.0, 300.0)
+    root.geometry("900x500")
+    table = ScheduleTable(root)
+    table.pack(fill='both', expand=True)
+    root.update()
+
+    print(f"ScheduleTable, {len(schedule):,} months")
+    report("fill", [timed(root, lambda: table.set_rows(schedule))])
+    report("scroll one row", [timed(root, lambda: table.yview('scroll', 1, 'units'))
+                              for _ in range(args.steps)])
+    report("page down", [timed(root, lambda: table.yview('scroll', 1, 'pages'))
+                         for _ in range(args.steps)])
+    rng = random.Random(0)
+    report("drag scrollbar", [timed(root, lambda: table.yview('moveto', rng.random()))
+                              for _ in range(args.steps)])
+    years = len(schedule) // 12
+    report("jump to year", [timed(root, lambda: table.jump_to_year(rng.randint(1, years)))
+                            for _ in range(args.steps // 10)])
+    report("resize window", [timed(root, lambda size=size: root.geometry(size))
+                             for size in ("900x700", "900x400", "1000x600") * 10])
+    report("sort by balance", [timed(root, lambda: table.sort_by('balance'))
+                               for _ in range(4)])
+    report("sort by interest", [timed(root, lambda: table.sort_by('interest'))
+                                for _ in range(4)])
+    table.destroy()
+
+    # One item per month, as a plain Treeview would need
+    tree = ttk.Treeview(root, columns=[field for field, _, _ in COLUMNS], show='headings')
+    tree.pack(fill='both', expand=True)
+    format_row = ScheduleTable.format_row.__get__(table)
+
+    def fill_plain():
+        for row in schedule:
+            tree.insert('', 'end', values=format_row(row))
+
+    print(f"\nPlain Treeview, {len(schedule):,} items")
+    report("fill", [timed(root, fill_plain)])
+    report("scroll one row", [timed(root, lambda: tree.yview('scroll', 1, 'units'))
+                              for _ in range(args.steps)])
+    root.destroy()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
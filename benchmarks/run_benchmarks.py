@@ -0,0 +1,347 @@
+# Benchmark suite for the mortgage calculator.
+#
+# Covers the calculation core at 1, 1k and 1M loans, goal seek, event
+# pricing, refinance scans, input parsing, summary PDF export, batch customer
+# reports and cold startup of the window up to its first idle event. Every
+# benchmark reports seconds per operation (lower is better). Results can be
+# saved as a JSON baseline; later runs are compared against it and the suite
+# fails when any benchmark is slower than the baseline by more than the
+# threshold.
+#
+# The startup benchmark needs a display. Without one it is run under xvfb-run
+# when that is installed and skipped otherwise.
+#
+# Usage:
+#     python benchmarks/run_benchmarks.py --save            # record a baseline
+#     python benchmarks/run_benchmarks.py --threshold 0.25  # compare against it
+import argparse
+import atexit
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+DEFAULT_BASELINE = os.path.join(ROOT, 'benchmarks', 'baseline.json')
+DEFAULT_THRESHOLD = 0.25  # Fail when 25% slower than the baseline
+
+BENCHMARKS = {}
+
+
+def benchmark(name, repeat=5, number=1):
+    """Register a setup function returning the callable to time"""
+    def register(setup):
+        BENCHMARKS[name] = (setup, repeat, number)
+        return setup
+    return register
+
+
+def best_time(function, repeat, number):
+    """Fastest time per call over repeat rounds of number calls"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            function()
+        best = min(best, (time.perf_counter() - start) / number)
+    return best
+
+
+# STEP 1: Calculation Core
+def _loan_arrays(count):
+    """Random but reproducible inputs for count loans"""
+    import numpy as np
+
+    rng = np.random.default_rng(0)
+    return (
+        rng.uniform(200_000, 5_000_000, count),
+        rng.uniform(1, 10, count),
+        rng.uniform(1_000, 20_000, count),
+        rng.choice([0.0, 1_000.0, 5_000.0], count),
+        rng.uniform(0, 5_000, count),
+    )
+
+
+def _calculate_setup(count):
+    from mortgage_engine import calculate_batch
+
+    arrays = _loan_arrays(count)
+    return lambda: calculate_batch(*arrays)
+
+
+@benchmark('calculate_1', repeat=5, number=2000)
+def calculate_1():
+    from mortgage_engine import calculate_loan
+
+    return lambda: calculate_loan(1_200_000, 4.5, 10_000, 2_000, 3_000)
+
+
+@benchmark('calculate_1k', repeat=5, number=200)
+def calculate_1k():
+    return _calculate_setup(1_000)
+
+
+@benchmark('calculate_1m', repeat=3, number=1)
+def calculate_1m():
+    return _calculate_setup(1_000_000)
+
+
+@benchmark('compare_500', repeat=5, number=20)
+def compare_500():
+    from mortgage_compare import compare_offers, comparison_rows
+
+    loan, rate, principal, extra, fee = (column.tolist() for column in _loan_arrays(500))
+    offers = [dict(loan_seeking=amount, down_payment=0.0, interest_rate=round(percent, 2),
+                   principal_payment=payment, extra_payment=more, monthly_fee=house_fee,
+                   currency='kr', name=f"Bank {position}")
+              for position, (amount, percent, payment, more, house_fee)
+              in enumerate(zip(loan, rate, principal, extra, fee))]
+    return lambda: comparison_rows(compare_offers(offers))
+
+
+@benchmark('goal_seek_10k', repeat=3, number=5)
+def goal_seek_10k():
+    from mortgage_goalseek import required_principal_payment
+
+    # An interest budget with extra payments from year 3, the searched case
+    loan, rate, principal, extra, _ = _loan_arrays(10_000)
+    budget = loan * rate / 100 * 8
+    return lambda: required_principal_payment(loan, rate, extra, interest_budget=budget,
+                                              extra_start_month=25)
+
+
+@benchmark('events_10k', repeat=3, number=5)
+def events_10k():
+    import numpy as np
+
+    from mortgage_events import EventTable, price_events
+
+    # Yearly lump sums for 20 years and a rate reset every 5 years
+    loan, rate, principal, extra, fee = _loan_arrays(10_000)
+    owner = np.repeat(np.arange(10_000), 24)
+    month = np.tile(np.r_[np.arange(12, 241, 12), np.arange(61, 242, 60)], 10_000)
+    kind = np.tile(np.array(['lump_sum'] * 20 + ['rate'] * 4), 10_000)
+    amount = np.tile(np.r_[np.full(20, 20_000.0), [3.0, 4.5, 6.0, 3.5]], 10_000)
+    events = EventTable(owner, month, kind, amount)
+    return lambda: price_events(loan, rate, principal, extra, fee, events)
+
+
+@benchmark('refinance_10k', repeat=3, number=5)
+def refinance_10k():
+    import numpy as np
+
+    from mortgage_refinance import scan_portfolio
+
+    # Every loan against a 20 offer rate sheet, half of them with a new term
+    loan, rate, principal, extra, fee = _loan_arrays(10_000)
+    loans = dict(balance=loan, interest_rate=rate, principal_payment=principal,
+                 extra_payment=extra, monthly_fee=fee, extra_start_month=np.ones(10_000),
+                 exit_cost=np.zeros(10_000),
+                 currency=np.full(10_000, 'SEK', dtype=object))
+    offers = dict(name=[f"Bank {position}" for position in range(20)],
+                  interest_rate=np.linspace(2, 7, 20), term_years=np.tile([25.0, np.nan], 10),
+                  monthly_fee=np.full(20, np.nan), switching_cost=np.full(20, 10_000.0),
+                  switching_percent=np.zeros(20), currency=np.full(20, '', dtype=object))
+    return lambda: scan_portfolio(loans, offers)
+
+
+# STEP 2: Parsing
+PARSE_VALUES = ["1,200,000", "kr 850000", "$2,500.50", "4.5", "", "15 000", "€99"] * 1000
+
+
+@benchmark('parse_7k_values', repeat=5, number=5)
+def parse_values():
+    from mortgage_inputs import parse_amount
+
+    def parse_all():
+        for value in PARSE_VALUES:
+            try:
+                parse_amount(value)
+            except ValueError:
+                pass
+    return parse_all
+
+
+@benchmark('parse_bulk_100k', repeat=3, number=1)
+def parse_bulk():
+    from mortgage_inputs import parse_amounts
+
+    values = ["1 250 000,50", "kr 850 000", "4,5", "1250000", "€1.250.000,50",
+              "12,34,56,789.50", "1'250'000.5", "abc"] * 12_500
+    return lambda: parse_amounts(values)
+
+
+# STEP 3: PDF Export
+@benchmark('export_pdf', repeat=3, number=20)
+def export_pdf():
+    from mortgage_export import build_summary_report, render_summary_pdf
+
+    directory = tempfile.mkdtemp(prefix='mortgage_bench_')
+    atexit.register(shutil.rmtree, directory, ignore_errors=True)
+    report = build_summary_report(
+        ["Loan Seeking For: kr1,500,000", "Down Payment: kr225,000",
+         "Loan Amount: kr1,275,000", "Interest Rate: 4.5%"],
+        ["Principal Payment: kr5,000", "Extra Payment: kr1,000", "Total Principal: kr6,000",
+         "Interest Payment: kr4,781", "Monthly House Fee: 3,000",
+         "Total Monthly Payment: kr13,781"],
+        ["Time Saved: 3 years, 7 months", "Interest Saved: kr401,275",
+         "Loan Payoff Time: 17 years, 9 months"])
+    return lambda: render_summary_pdf(report, export_dir=directory)
+
+
+@benchmark('reports_100', repeat=3, number=1)
+def reports_100():
+    import numpy as np
+
+    from mortgage_reports import BinaryStreams, render_reports
+
+    directory = tempfile.mkdtemp(prefix='mortgage_bench_')
+    atexit.register(shutil.rmtree, directory, ignore_errors=True)
+    loan, rate, principal, extra, fee = _loan_arrays(100)
+    loans = dict(row=list(range(2, 102)), customer=[''] * 100, currency=['kr'] * 100,
+                 loan_seeking=loan, down_payment=loan * 0.15, interest_rate=rate,
+                 principal_payment=principal, extra_payment=extra, monthly_fee=fee,
+                 extra_start_month=np.full(100, 25.0))
+
+    def render():
+        # Binary streams as in the report workers, without changing how the
+        # other benchmarks save PDFs
+        with BinaryStreams():
+            render_reports(loans, directory)
+    return render
+
+
+# STEP 4: Cold Startup
+STARTUP_PROBE = """
+import time
+start = time.perf_counter()
+import mortgage_calculator_new as app
+root = app.load_gui().Tk()
+calculator = app.MortgageCalculator(root)
+def idle():
+    print(time.perf_counter() - start)
+    calculator.root.quit()
+calculator.root.after_idle(idle)
+calculator.root.mainloop()
+"""
+
+
+def _startup_command():
+    """Command that runs the startup probe, or None without a display"""
+    command = [sys.executable, '-c', STARTUP_PROBE]
+    if os.environ.get('DISPLAY') or platform.system() in ('Windows', 'Darwin'):
+        return command
+    if shutil.which('xvfb-run'):
+        return ['xvfb-run', '-a'] + command
+    return None
+
+
+@benchmark('startup_to_idle', repeat=3, number=1)
+def startup():
+    command = _startup_command()
+    if command is None:
+        return None
+
+    def run():
+        completed = subprocess.run(command, cwd=ROOT, capture_output=True,
+                                   text=True, check=True)
+        return float(completed.stdout.strip().splitlines()[-1])
+    return run
+
+
+def run_startup(function, repeat):
+    """Startup reports its own in-process time; keep the fastest"""
+    return min(function() for _ in range(repeat))
+
+
+# STEP 5: Runner
+def run(selected=None):
+    """Run the selected benchmarks; returns {name: seconds or None if skipped}"""
+    results = {}
+    for name, (setup, repeat, number) in BENCHMARKS.items():
+        if selected and name not in selected:
+            continue
+        function = setup()
+        if function is None:
+            results[name] = None
+        elif name == 'startup_to_idle':
+            results[name] = run_startup(function, repeat)
+        else:
+            function()  # Warm up imports and caches
+            results[name] = best_time(function, repeat, number)
+    return results
+
+
+def compare(results, baseline, threshold):
+    """Return (name, current, baseline, ratio) for benchmarks over threshold"""
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if current is None or not previous:
+            continue
+        ratio = current / previous
+        if ratio > 1 + threshold:
+            regressions.append((name, current, previous, ratio))
+    return regressions
+
+
+def _format_seconds(seconds):
+    """Human readable duration"""
+    if seconds is None:
+        return "skipped"
+    if seconds < 1e-3:
+        return f"{seconds * 1e6:.1f} us"
+    if seconds < 1:
+        return f"{seconds * 1e3:.2f} ms"
+    return f"{seconds:.2f} s"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the calculator benchmarks")
+    parser.add_argument('names', nargs='*', help=f"Benchmarks to run ({', '.join(BENCHMARKS)})")
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help="Baseline JSON file")
+    parser.add_argument('--save', action='store_true', help="Write results as the new baseline")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help="Allowed slowdown before failing (0.25 = 25%%)")
+    args = parser.parse_args(argv)
+
+    results = run(args.names)
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding='utf-8') as baseline_file:
+            baseline = json.load(baseline_file).get('results', {})
+
+    for name, seconds in results.items():
+        line = f"{name:<18} {_format_seconds(seconds):>12}"
+        if seconds is not None and baseline.get(name):
+            line += f"  ({seconds / baseline[name]:.2f}x baseline)"
+        print(line)
+
+    if args.save:
+        data = {
+            'python': platform.python_version(),
+            'machine': platform.machine(),
+            'saved': time.strftime('%Y-%m-%d %H:%M:%S'),
+            'results': {**baseline, **{k: v for k, v in results.items() if v is not None}},
+        }
+        with open(args.baseline, 'w', encoding='utf-8') as baseline_file:
+            json.dump(data, baseline_file, indent=2)
+        print(f"Saved baseline to {args.baseline}")
+        return 0
+
+    regressions = compare(results, baseline, args.threshold)
+    for name, current, previous, ratio in regressions:
+        print(f"REGRESSION {name}: {_format_seconds(current)} vs "
+              f"{_format_seconds(previous)} baseline ({ratio:.2f}x)")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
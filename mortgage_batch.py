@@ -0,0 +1,457 @@
+# Non-interactive batch mode for the mortgage calculator.
+#
+# Streams a CSV of loan applications through the calculation engine in
+# fixed-size chunks spread over a process pool. Results are written in input
+# order, rows that fail validation go to a reject file instead of a dialog.
+#
+# Usage:
+#     python mortgage_calculator_new.py --batch in.csv --out results.csv
+import argparse
+import csv
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import mortgage_metrics as metrics
+from mortgage_cache import CalculationCache, normalize_key
+from mortgage_engine import auto_down_payment, calculate_batch, validate_batch
+from mortgage_inputs import (CURRENCY_NAMES, currency_symbol, format_months, parse_amount,
+                             parse_amounts, parse_start_year)
+
+# STEP 1: Constants
+# Input columns, matching the fields in "Step 2: Enter Loan Details"; a blank
+# extra_start_year starts extra payments in year 1
+INPUT_FIELDS = [
+    'loan_seeking', 'down_payment', 'interest_rate', 'principal_payment',
+    'extra_payment', 'monthly_fee', 'currency', 'extra_start_year',
+]
+NUMERIC_FIELDS = INPUT_FIELDS[:-2]  # The amounts and rate validate_batch() checks
+
+RESULT_FIELDS = [
+    'row', 'currency', 'loan_seeking', 'down_payment', 'loan_amount',
+    'interest_rate', 'principal_payment', 'extra_payment', 'monthly_fee',
+    'extra_start_month', 'monthly_interest', 'monthly_payment', 'total_interest', 'interest_saved',
+    'payoff_months', 'time_saved_months', 'loan_payoff', 'time_saved',
+]
+REJECT_FIELDS = ['row', 'error'] + INPUT_FIELDS
+
+DEFAULT_CHUNK_SIZE = 10000
+DEFAULT_CURRENCY = "kr"
+DEFAULT_CACHE_SIZE = 4096
+# --decimal choices: the decimal hint passed to parse_amounts()
+DECIMAL_SEPARATORS = {'auto': None, 'point': '.', 'comma': ','}
+
+# Per-process cache of priced rows, so repeated applications are not recomputed
+_worker_cache = CalculationCache(DEFAULT_CACHE_SIZE)
+
+
+def init_worker(cache_size):
+    """Set up a worker process with its own calculation cache"""
+    global _worker_cache
+    _worker_cache = CalculationCache(cache_size)
+
+
+# STEP 2: Row Parsing
+def parse_row(row):
+    """Parse one CSV row into numbers, filling in defaults like the GUI does"""
+    values = {}
+    for field in NUMERIC_FIELDS:
+        raw = (row.get(field) or '').strip()
+        if field == 'down_payment' and raw.lower() in ('', 'auto'):
+            values[field] = None  # Filled in with the 15% auto value
+        elif field == 'interest_rate' and not raw:
+            values[field] = 4.5  # Same default as the interest rate entry
+        else:
+            values[field] = parse_amount(raw)
+
+    if values['down_payment'] is None:
+        values['down_payment'] = float(auto_down_payment(values['loan_seeking']))
+
+    values['currency'] = currency_symbol((row.get('currency') or '').strip() or DEFAULT_CURRENCY)
+    values['extra_start_month'] = parse_start_year(row.get('extra_start_year') or '')
+    return values
+
+
+def parse_columns(rows, decimal=None):
+    """Parse the numeric columns of many rows at once, like parse_row()
+
+    Returns (columns, errors): a dict of NumPy arrays keyed by numeric input
+    field plus an 'extra_start_month' array and a 'currency' list, and a dict
+    mapping the position of each row that failed to its first error message.
+    """
+    errors = {}
+    columns = {}
+    auto = None
+    for field in NUMERIC_FIELDS:
+        raw = [(row.get(field) or '').strip() for row in rows]
+        if field == 'down_payment':
+            auto = np.array([value.lower() in ('', 'auto') for value in raw], dtype=bool)
+            raw = ['' if is_auto else value for is_auto, value in zip(auto, raw)]
+        elif field == 'interest_rate':
+            raw = [value or '4.5' for value in raw]  # Same default as the entry
+        values, field_errors = parse_amounts(raw, decimal)
+        for position, message in field_errors.items():
+            errors.setdefault(position, message)
+        columns[field] = np.array(values)
+
+    if len(rows):
+        columns['down_payment'] = np.where(auto, auto_down_payment(columns['loan_seeking']),
+                                           columns['down_payment'])
+
+    currencies = []
+    for position, row in enumerate(rows):
+        currency = (row.get('currency') or '').strip() or DEFAULT_CURRENCY
+        try:
+            currencies.append(currency_symbol(currency))
+        except ValueError as e:
+            errors.setdefault(position, str(e))
+            currencies.append(currency)
+    columns['currency'] = currencies
+
+    start_months = []
+    for position, row in enumerate(rows):
+        try:
+            start_months.append(parse_start_year(row.get('extra_start_year') or ''))
+        except ValueError as e:
+            errors.setdefault(position, str(e))
+            start_months.append(1)
+    columns['extra_start_month'] = np.array(start_months, dtype=np.int64)
+    return columns, errors
+
+
+# STEP 3: Chunk Processing
+def process_chunk(chunk, decimal=None, unpriced=None):
+    """Validate and calculate one chunk of (row number, raw row) pairs
+
+    Runs inside a worker process. unpriced maps the currencies that have no
+    FX rate to the error their rows are rejected with. Returns (results,
+    rejects) as lists of dicts ready to be written with csv.DictWriter.
+    """
+    rows = [row for _, row in chunk]
+    parsed_columns, parse_errors = parse_columns(rows, decimal)
+    if unpriced:
+        for position, currency in enumerate(parsed_columns['currency']):
+            if currency in unpriced:
+                parse_errors.setdefault(position, unpriced[currency])
+    rejects = [_reject(chunk[position][0], rows[position], message)
+               for position, message in parse_errors.items()]
+
+    kept = [position for position in range(len(rows)) if position not in parse_errors]
+    if not kept:
+        rejects.sort(key=lambda reject: reject['row'])
+        return [], rejects
+
+    numbers = [chunk[position][0] for position in kept]
+    columns = {field: parsed_columns[field][kept]
+               for field in NUMERIC_FIELDS + ['extra_start_month']}
+    lists = {field: column.tolist() for field, column in columns.items()}
+    lists['currency'] = [parsed_columns['currency'][position] for position in kept]
+    parsed = [(rows[position], {field: column[offset] for field, column in lists.items()})
+              for offset, position in enumerate(kept)]
+    errors = validate_batch(*(columns[field] for field in NUMERIC_FIELDS))
+
+    valid = errors == ''
+    for index in np.flatnonzero(~valid):
+        row, _ = parsed[index]
+        rejects.append(_reject(numbers[index], row, str(errors[index])))
+
+    valid_indices = np.flatnonzero(valid)
+    keys = [normalize_key(*(parsed[index][1][field] for field in NUMERIC_FIELDS),
+                          parsed[index][1]['currency'], parsed[index][1]['extra_start_month'])
+            for index in valid_indices]
+
+    # Look every row up in this worker's cache, then price the misses in one call
+    computed = [_worker_cache.get(key) for key in keys]
+    missing = [position for position, result in enumerate(computed) if result is None]
+    if missing:
+        selected = {field: column[valid_indices[missing]] for field, column in columns.items()}
+        priced = calculate_batch(selected['loan_seeking'] - selected['down_payment'],
+                                 selected['interest_rate'], selected['principal_payment'],
+                                 selected['extra_payment'], selected['monthly_fee'],
+                                 selected['extra_start_month'])
+        names = list(priced)
+        columns_out = [priced[name].tolist() for name in names]
+        for offset, position in enumerate(missing):
+            result = {name: column[offset] for name, column in zip(names, columns_out)}
+            computed[position] = result
+            _worker_cache.put(keys[position], result)
+
+    results = []
+    for index, result in zip(valid_indices, computed):
+        row, values = parsed[index]
+        payoff = result['payoff_months']
+        saved = result['time_saved_months']
+        results.append({
+            'row': numbers[index],
+            'customer': (row.get('customer') or '').strip(),
+            'currency': values['currency'],
+            'loan_seeking': f"{values['loan_seeking']:.2f}",
+            'down_payment': f"{values['down_payment']:.2f}",
+            'loan_amount': f"{result['loan_amount']:.2f}",
+            'interest_rate': values['interest_rate'],
+            'principal_payment': f"{values['principal_payment']:.2f}",
+            'extra_payment': f"{values['extra_payment']:.2f}",
+            'monthly_fee': f"{values['monthly_fee']:.2f}",
+            'extra_start_month': values['extra_start_month'],
+            'monthly_interest': f"{result['monthly_interest']:.2f}",
+            'monthly_payment': f"{result['monthly_payment']:.2f}",
+            'total_interest': f"{result['total_interest']:.2f}",
+            'interest_saved': f"{result['interest_saved']:.2f}",
+            'interest_paid': f"{result['interest_paid']:.2f}",
+            'payoff_months': payoff,
+            'time_saved_months': saved,
+            'loan_payoff': format_months(payoff),
+            'time_saved': format_months(saved),
+        })
+
+    rejects.sort(key=lambda reject: reject['row'])
+    return results, rejects
+
+
+def _reject(row_number, row, error):
+    """Build a reject file record for a row"""
+    record = {field: row.get(field, '') for field in INPUT_FIELDS}
+    record['row'] = row_number
+    record['error'] = error
+    return record
+
+
+def write_schedules(writer, results):
+    """Append the schedules of a chunk's results to a ColumnarScheduleWriter"""
+    numbers = {name: np.array([float(result[name]) for result in results])
+               for name in ('loan_amount', 'interest_rate', 'principal_payment',
+                            'extra_payment', 'monthly_fee', 'extra_start_month')}
+    writer.append(numbers['loan_amount'], numbers['interest_rate'],
+                  numbers['principal_payment'], numbers['extra_payment'],
+                  numbers['monthly_fee'], numbers['extra_start_month'],
+                  loan_ids=[result['row'] for result in results],
+                  currency=[result['currency'] for result in results])
+
+
+def add_totals(totals, results):
+    """Add a chunk's results to a mortgage_fx.CurrencyTotals"""
+    from mortgage_fx import TOTAL_AMOUNTS
+
+    totals.add([result['currency'] for result in results],
+               {name: np.array([result[name] for result in results], dtype=np.float64)
+                for name in TOTAL_AMOUNTS})
+
+
+def read_chunks(input_file, chunk_size):
+    """Yield lists of (row number, row) pairs from a CSV file"""
+    reader = csv.DictReader(input_file)
+    chunk = []
+    # Row numbers count the header as row 1, like a spreadsheet
+    for row_number, row in enumerate(reader, start=2):
+        chunk.append((row_number, row))
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+# STEP 4: Batch Runner
+@metrics.timed('batch.run')
+def run_batch(input_path, output_path, reject_path=None, workers=None,
+              chunk_size=DEFAULT_CHUNK_SIZE, progress=None,
+              cache_size=DEFAULT_CACHE_SIZE, decimal=None, store_path=None,
+              schedules_path=None, report_currency=None, fx_path=None, summary_path=None):
+    """Stream input_path through the calculator and write results
+
+    At most two chunks per worker are in flight at a time, so memory use is
+    bounded by the chunk size no matter how large the input file is. decimal
+    is passed to parse_amounts() for every amount. With store_path, accepted
+    rows are also saved to that scenario store, one transaction per chunk.
+    With schedules_path, the schedules of accepted rows are written there as
+    memory-mapped columns (see mortgage_columnar.py), keyed by row number.
+    With report_currency, accepted rows are totalled per currency and in
+    report_currency using the rate file fx_path, and the totals are written
+    to summary_path (default <output>_summary.csv); rows in a currency the
+    file has no rate for are rejected.
+    Returns a dict with row counts, elapsed seconds and rows per second.
+    """
+    if reject_path is None:
+        root, _ = os.path.splitext(output_path)
+        reject_path = f"{root}_rejects.csv"
+    workers = workers or os.cpu_count() or 1
+    max_pending = workers * 2
+
+    stats = {'rows': 0, 'accepted': 0, 'rejected': 0, 'bytes': 0}
+    start = time.perf_counter()
+    store = None
+    if store_path:
+        from mortgage_store import ScenarioStore
+        store = ScenarioStore(store_path)
+        source = os.path.basename(input_path)
+    totals = None
+    unpriced = None
+    if report_currency:
+        from mortgage_fx import DEFAULT_FX_PATH, CurrencyTotals, load_fx_table
+        fx = load_fx_table(fx_path or DEFAULT_FX_PATH)  # Fail before any work is done
+        fx.rate(report_currency, report_currency)
+        totals = CurrencyTotals()
+        # Rows in a currency the rate file lacks are rejected, not totalled
+        unpriced = {}
+        for currency in CURRENCY_NAMES:
+            try:
+                fx.rate(currency, report_currency)
+            except ValueError as e:
+                unpriced[currency] = str(e)
+    schedules = None
+    if schedules_path:
+        from mortgage_columnar import ColumnarScheduleWriter
+        schedules = ColumnarScheduleWriter(schedules_path)
+
+    with open(input_path, newline='', encoding='utf-8-sig') as input_file, \
+            open(output_path, 'w', newline='', encoding='utf-8') as output_file, \
+            open(reject_path, 'w', newline='', encoding='utf-8') as reject_file, \
+            ProcessPoolExecutor(max_workers=workers, initializer=init_worker,
+                                initargs=(cache_size,)) as executor:
+        result_writer = csv.DictWriter(output_file, fieldnames=RESULT_FIELDS,
+                                       extrasaction='ignore')
+        reject_writer = csv.DictWriter(reject_file, fieldnames=REJECT_FIELDS)
+        result_writer.writeheader()
+        reject_writer.writeheader()
+
+        def write_next():
+            with metrics.Timer('batch.chunk_wait'):
+                results, rejects = pending.popleft().result()
+            with metrics.Timer('batch.chunk_write'):
+                result_writer.writerows(results)
+                reject_writer.writerows(rejects)
+            if store is not None:
+                with metrics.Timer('batch.store'):
+                    store.save_many(dict(result, label=f"{source}:{result['row']}")
+                                    for result in results)
+            if totals is not None and results:
+                add_totals(totals, results)
+            if schedules is not None and results:
+                with metrics.Timer('batch.schedules'):
+                    write_schedules(schedules, results)
+            if metrics.is_enabled():
+                metrics.add_bytes('batch.chunk_write',
+                                  output_file.tell() + reject_file.tell() - stats['bytes'])
+                stats['bytes'] = output_file.tell() + reject_file.tell()
+            stats['accepted'] += len(results)
+            stats['rejected'] += len(rejects)
+            stats['rows'] = stats['accepted'] + stats['rejected']
+            if progress:
+                progress(stats['rows'], time.perf_counter() - start)
+
+        pending = deque()
+        for chunk in read_chunks(input_file, chunk_size):
+            pending.append(executor.submit(process_chunk, chunk, decimal, unpriced))
+            if len(pending) >= max_pending:
+                write_next()
+        while pending:
+            write_next()
+
+    if store is not None:
+        store.close()
+    if schedules is not None:
+        schedules.close()
+        stats['schedule_rows'] = schedules.rows
+    if totals is not None:
+        from mortgage_fx import write_summary_csv
+        if summary_path is None:
+            root, _ = os.path.splitext(output_path)
+            summary_path = f"{root}_summary.csv"
+        stats['summary'] = totals.report(fx, report_currency)
+        stats['summary_path'] = summary_path
+        write_summary_csv(summary_path, stats['summary'])
+
+    elapsed = time.perf_counter() - start
+    stats['seconds'] = elapsed
+    stats['rows_per_second'] = stats['rows'] / elapsed if elapsed > 0 else 0.0
+    stats['reject_path'] = reject_path
+    return stats
+
+
+# STEP 5: Command Line Interface
+def build_parser():
+    """Create the argument parser for batch mode"""
+    parser = argparse.ArgumentParser(
+        description="Run a CSV of loan applications through the mortgage calculator")
+    parser.add_argument('--batch', metavar='IN_CSV', required=True,
+                        help="CSV file with one loan application per row")
+    parser.add_argument('--out', metavar='OUT_CSV', required=True,
+                        help="CSV file to write results to")
+    parser.add_argument('--rejects', metavar='REJECT_CSV',
+                        help="CSV file for rows that fail validation "
+                             "(default: <out>_rejects.csv)")
+    parser.add_argument('--workers', type=int,
+                        help="Number of worker processes (default: all cores)")
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE,
+                        help="Rows per chunk sent to a worker")
+    parser.add_argument('--cache-size', type=int, default=DEFAULT_CACHE_SIZE,
+                        help="Results cached per worker for repeated rows (0 disables)")
+    parser.add_argument('--decimal', choices=sorted(DECIMAL_SEPARATORS), default='auto',
+                        help="Decimal separator of the amounts; 'auto' tells it from "
+                             "each value")
+    parser.add_argument('--store', metavar='DB',
+                        help="Also save accepted rows to this scenario store (SQLite)")
+    parser.add_argument('--schedules', metavar='DIR',
+                        help="Also write the schedules of accepted rows to this directory "
+                             "as memory-mapped columns")
+    parser.add_argument('--report-currency', metavar='CODE',
+                        help="Total the accepted rows per currency and in this currency, "
+                             "e.g. SEK or USD")
+    parser.add_argument('--fx', metavar='JSON',
+                        help="FX rate file for --report-currency (default: fx_rates.json)")
+    parser.add_argument('--summary', metavar='SUMMARY_CSV',
+                        help="CSV file for the currency totals (default: <out>_summary.csv)")
+    parser.add_argument('--metrics', metavar='JSON',
+                        help="Record timings and write them to this JSON file")
+    return parser
+
+
+def main(argv=None):
+    """Run batch mode from the command line"""
+    args = build_parser().parse_args(argv)
+    if args.metrics:
+        metrics.enable()
+
+    shown = False  # Whether the progress line has been printed
+
+    def report(rows, elapsed):
+        nonlocal shown
+        rate = rows / elapsed if elapsed > 0 else 0.0
+        print(f"\r{rows:,} rows, {rate:,.0f} rows/sec", end='', file=sys.stderr)
+        shown = True
+
+    try:
+        stats = run_batch(args.batch, args.out, args.rejects, args.workers,
+                          args.chunk_size, progress=report, cache_size=args.cache_size,
+                          decimal=DECIMAL_SEPARATORS[args.decimal], store_path=args.store,
+                          schedules_path=args.schedules, report_currency=args.report_currency,
+                          fx_path=args.fx, summary_path=args.summary)
+    except ValueError as e:
+        if shown:
+            print(file=sys.stderr)  # End the progress line
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    print(file=sys.stderr)
+    print(f"Processed {stats['rows']:,} rows in {stats['seconds']:.2f}s "
+          f"({stats['rows_per_second']:,.0f} rows/sec): "
+          f"{stats['accepted']:,} accepted, {stats['rejected']:,} rejected "
+          f"(see {stats['reject_path']})")
+    if args.schedules:
+        print(f"Wrote {stats['schedule_rows']:,} schedule rows to {args.schedules}")
+    if args.report_currency:
+        total = stats['summary'][-1]
+        print(f"{total['currency']}: lent {total['loan_amount_reported']:,.2f}, "
+              f"monthly payments {total['monthly_payment_reported']:,.2f}, "
+              f"interest {total['interest_paid_reported']:,.2f} "
+              f"(see {stats['summary_path']})")
+    if args.metrics:
+        metrics.dump_json(args.metrics)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,157 @@
+# Bounded LRU cache in front of the calculation engine.
+#
+# Keys are the normalized Step 2 inputs, values are the plain dicts returned by
+# calculate_loan(). The cache can be saved to and loaded from a JSON file so
+# scenarios survive between sessions.
+import json
+import os
+import threading
+from collections import OrderedDict
+
+# STEP 1: Constants
+DEFAULT_MAXSIZE = 256
+# Saved with the cache; bump it whenever the keys or the results of
+# calculate_loan() change, so files written by older versions are discarded
+CACHE_VERSION = 1
+
+
+# STEP 2: Key Normalization
+def normalize_key(loan_seeking, down_payment, interest_rate, principal_payment,
+                  extra_payment=0.0, monthly_fee=0.0, currency="kr", extra_start_month=1):
+    """Build a cache key from the Step 2 inputs
+
+    Amounts are rounded to cents and the rate to 1/10000 of a percent, so
+    "1,200,000" and "1200000.00" share an entry.
+    """
+    return (
+        round(float(loan_seeking), 2),
+        round(float(down_payment), 2),
+        round(float(interest_rate), 4),
+        round(float(principal_payment), 2),
+        round(float(extra_payment), 2),
+        round(float(monthly_fee), 2),
+        str(currency),
+        int(extra_start_month),
+    )
+
+
+def engine_inputs(key):
+    """calculate_loan() arguments for a normalize_key() key"""
+    return {
+        'loan_amount': key[0] - key[1],
+        'interest_rate': key[2],
+        'principal_payment': key[3],
+        'extra_payment': key[4],
+        'monthly_fee': key[5],
+        'extra_start_month': key[7],
+    }
+
+
+# STEP 3: LRU Cache
+class CalculationCache:
+    """Thread-safe LRU cache of calculation results with hit/miss counters"""
+
+    def __init__(self, maxsize=DEFAULT_MAXSIZE):
+        """Create an empty cache holding at most maxsize results"""
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        """Return the cached result for key, or None"""
+        with self._lock:
+            result = self._entries.get(key)
+            if result is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return result
+
+    def put(self, key, result):
+        """Store result under key, evicting the least recently used entry"""
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._entries[key] = result
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        """Drop all entries and reset the counters"""
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+
+    def stats(self):
+        """Return the hit/miss counters and current size"""
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0,
+            'size': len(self._entries),
+            'maxsize': self.maxsize,
+        }
+
+    # Persistence
+    def save(self, path):
+        """Write the cache to a JSON file, least recently used first"""
+        with self._lock:
+            entries = [[list(key), result] for key, result in self._entries.items()]
+        temp_path = f"{path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as cache_file:
+            json.dump({'version': CACHE_VERSION, 'maxsize': self.maxsize,
+                       'entries': entries}, cache_file)
+        os.replace(temp_path, path)
+
+    def load(self, path):
+        """Load entries saved with save()
+
+        A missing or damaged file is ignored, and so is a file saved by a
+        version of the calculator with a different CACHE_VERSION.
+        """
+        try:
+            with open(path, encoding='utf-8') as cache_file:
+                data = json.load(cache_file)
+            if data['version'] != CACHE_VERSION:
+                return 0
+            entries = data['entries']
+        except (OSError, ValueError, KeyError, TypeError):
+            return 0
+        for key, result in entries:
+            self.put(tuple(key), result)
+        return len(entries)
+
+
+# STEP 4: Cached Calculation
+def calculate_cached(cache, loan_seeking, down_payment, interest_rate,
+                     principal_payment, extra_payment=0.0, monthly_fee=0.0,
+                     currency="kr", extra_start_month=1, previous=None):
+    """calculate_loan() for the Step 2 inputs, served from cache when possible
+
+    previous is an optional (inputs, result) pair from an earlier call, with
+    inputs a dict of this function's arguments. On a cache miss only the
+    results the edit from those inputs changes are recomputed.
+    """
+    # Imported here so loading a saved cache at startup does not load NumPy
+    from mortgage_engine import calculate_loan, update_loan
+
+    key = normalize_key(loan_seeking, down_payment, interest_rate, principal_payment,
+                        extra_payment, monthly_fee, currency, extra_start_month)
+    result = cache.get(key)
+    if result is None:
+        if previous is None:
+            result = calculate_loan(**engine_inputs(key))
+        else:
+            previous_inputs, previous_result = previous
+            result = update_loan(engine_inputs(normalize_key(**previous_inputs)),
+                                 previous_result, **engine_inputs(key))
+        cache.put(key, result)
+    return result
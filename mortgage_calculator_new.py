@@ -1,18 +1,55 @@
 # STEP 1: Imports and Dependencies
-import tkinter as tk
-from tkinter import ttk, messagebox
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import letter
+# Only light modules are imported here. tkinter is loaded by load_gui(), so
+# batch mode and other headless uses of this module never load Tk; ttkbootstrap,
+# NumPy and reportlab are imported on first use.
+import math
 import os
+import sys
 from datetime import datetime
-from ttkbootstrap import Style
-from reportlab.lib import colors
-from tkinter import filedialog
+from mortgage_inputs import (
+    AUTO_DOWN_PAYMENT_RATE, CURRENCY_NAMES, format_months, parse_amount,
+    parse_start_year, split_months, validate_loan,
+)
+from mortgage_cache import CalculationCache, calculate_cached
+import mortgage_metrics as metrics
+
+tk = ttk = messagebox = filedialog = None
+
+
+def load_gui():
+    """Import tkinter and its dialogs the first time the window is needed"""
+    global tk, ttk, messagebox, filedialog
+    if tk is None:
+        import tkinter
+        from tkinter import ttk as tkinter_ttk, messagebox as tkinter_messagebox
+        from tkinter import filedialog as tkinter_filedialog
+        tk, ttk = tkinter, tkinter_ttk
+        messagebox, filedialog = tkinter_messagebox, tkinter_filedialog
+    return tk
+
+# Calculation cache file, saved when the window closes
+CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.calculation_cache.json')
+# Goal seek choices and the mortgage_goalseek input each one solves for
+GOAL_SEEK_FIELDS = {
+    "Extra payment": 'extra_payment',
+    "Principal payment": 'principal_payment',
+    "Interest rate": 'interest_rate',
+}
+
+
+def amount_text(value):
+    """Format a stored amount for an entry field, e.g. 1,250,000 or 1,250,000.50"""
+    text = f"{value:,.2f}"
+    return text[:-3] if text.endswith('.00') else text
 
 # STEP 2: Main Calculator Class
 class MortgageCalculator:
     def __init__(self, root):
         """Initialize the calculator"""
+        from ttkbootstrap import Style
+        from mortgage_live import LiveRecalculator
+
+        load_gui()
         self.root = root
         self.root.title("Mortgage Calculator")
         
@@ -33,14 +70,36 @@ class MortgageCalculator:
         
         # Initialize variables
         self.initialize_variables()
+
+        # Calculation cache, kept between sessions
+        self.calculation_cache = CalculationCache()
+        self.calculation_cache.load(CACHE_PATH)
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
         
         # Create input panels (left side)
         self.create_currency_panel(left_frame)
         self.create_loan_details_panel(left_frame)
         self.create_calculate_panel(left_frame)
+        self.create_scenarios_panel(left_frame)
+        self.create_compare_panel(left_frame)
+        self.create_goal_seek_panel(left_frame)
+        self.create_refinance_panel(left_frame)
         
         # Create results panel (right side)
         self.create_results_panel(right_frame)
+        if metrics.is_enabled():
+            self.create_diagnostics_panel(right_frame)  # Only with --diagnostics
+
+        # Recalculate in the background as the user types
+        self.current_schedule = []
+        self.current_schedule_inputs = None
+        self.live_previous = None
+        self.live_recalculator = LiveRecalculator(
+            self.root, self.read_inputs, self.compute_live, self.show_live_results)
+        for var in (self.loan_seeking_var, self.down_payment_var, self.interest_rate_var,
+                    self.principal_payment_var, self.extra_payment_var,
+                    self.extra_start_year_var, self.monthly_fee_var, self.currency_var):
+            var.trace_add('write', self.live_recalculator.schedule)
 
     # STEP 3: Input Fields Creation
     def create_currency_panel(self, parent):
@@ -81,16 +140,7 @@ class MortgageCalculator:
         currency_label.pack(side='left', padx=5)
         
         # Create a dictionary for currency names
-        self.currency_names = {
-            "kr": "Swedish Krona (SEK)",
-            "$": "US Dollar (USD)",
-            "€": "Euro (EUR)",
-            "C$": "Canadian Dollar (CAD)",
-            "A$": "Australian Dollar (AUD)",
-            "₹": "Indian Rupee (INR)",
-            "¥": "Japanese Yen (JPY)",
-            "£": "British Pound (GBP)"
-        }
+        self.currency_names = dict(CURRENCY_NAMES)
         
         # Bind the selection event to update the currency name
         def update_currency_name(event):
@@ -165,6 +215,14 @@ class MortgageCalculator:
         self.extra_payment_entry = ttk.Entry(extra_frame, textvariable=self.extra_payment_var)
         self.extra_payment_entry.pack(side='right', fill='x', expand=True)
 
+        # Extra Payments From Year
+        extra_start_frame = ttk.Frame(loan_frame)
+        extra_start_frame.pack(fill='x', expand=True)
+        ttk.Label(extra_start_frame, text="Extra Payments From Year:").pack(side='left')
+        self.extra_start_year_entry = ttk.Entry(extra_start_frame,
+                                                textvariable=self.extra_start_year_var)
+        self.extra_start_year_entry.pack(side='right', fill='x', expand=True)
+
         # Monthly House Fee
         fee_frame = ttk.Frame(loan_frame)
         fee_frame.pack(fill='x', expand=True)
@@ -180,6 +238,69 @@ class MortgageCalculator:
         ttk.Button(button_frame, text="Calculate", command=self.calculate, style='Primary.TButton').pack(side='left', padx=5)
         ttk.Button(button_frame, text="Clear", command=self.clear_fields).pack(side='left')
 
+    def create_scenarios_panel(self, parent):
+        """Create the saved scenarios panel"""
+        scenarios_frame = ttk.LabelFrame(parent, text="Saved Scenarios", padding=10)
+        scenarios_frame.pack(fill='x', padx=5, pady=5)
+        ttk.Label(scenarios_frame, text="Customer:").pack(side='left')
+        ttk.Entry(scenarios_frame, textvariable=self.customer_var, width=18).pack(side='left', padx=5)
+        ttk.Button(scenarios_frame, text="Save", command=self.save_scenario).pack(side='left')
+        ttk.Button(scenarios_frame, text="Browse...",
+                   command=self.open_scenarios).pack(side='left', padx=5)
+
+    def create_compare_panel(self, parent):
+        """Create the offer comparison panel"""
+        compare_frame = ttk.LabelFrame(parent, text="Compare Offers", padding=10)
+        compare_frame.pack(fill='x', padx=5, pady=5)
+        ttk.Label(compare_frame, text="Offer:").pack(side='left')
+        ttk.Entry(compare_frame, textvariable=self.offer_name_var, width=18).pack(side='left', padx=5)
+        ttk.Button(compare_frame, text="Add", command=self.add_offer).pack(side='left')
+        ttk.Button(compare_frame, text="Compare...",
+                   command=self.open_comparison).pack(side='left', padx=5)
+        ttk.Label(compare_frame, textvariable=self.offers_status_var).pack(side='left')
+
+    def create_goal_seek_panel(self, parent):
+        """Create the goal seek panel"""
+        goal_frame = ttk.LabelFrame(parent, text="Goal Seek", padding=10)
+        goal_frame.pack(fill='x', padx=5, pady=5)
+
+        target_frame = ttk.Frame(goal_frame)
+        target_frame.pack(fill='x', expand=True)
+        ttk.Radiobutton(target_frame, text="Pay off in (years)", variable=self.goal_target_var,
+                        value='payoff_years').pack(side='left')
+        ttk.Radiobutton(target_frame, text="Interest budget", variable=self.goal_target_var,
+                        value='interest_budget').pack(side='left', padx=5)
+        ttk.Entry(target_frame, textvariable=self.goal_value_var,
+                  width=12).pack(side='right', fill='x', expand=True)
+
+        solve_frame = ttk.Frame(goal_frame)
+        solve_frame.pack(fill='x', expand=True, pady=(5, 0))
+        ttk.Label(solve_frame, text="Solve for:").pack(side='left')
+        ttk.Combobox(solve_frame, textvariable=self.goal_solve_for_var, state='readonly',
+                     values=list(GOAL_SEEK_FIELDS), width=16).pack(side='left', padx=5)
+        ttk.Button(solve_frame, text="Solve", command=self.solve_goal).pack(side='left')
+        ttk.Label(solve_frame, textvariable=self.goal_status_var).pack(side='left', padx=5)
+
+    def create_refinance_panel(self, parent):
+        """Create the refinance panel"""
+        refinance_frame = ttk.LabelFrame(parent, text="Refinance", padding=10)
+        refinance_frame.pack(fill='x', padx=5, pady=5)
+
+        offer_frame = ttk.Frame(refinance_frame)
+        offer_frame.pack(fill='x', expand=True)
+        ttk.Label(offer_frame, text="New rate (%):").pack(side='left')
+        ttk.Entry(offer_frame, textvariable=self.refinance_rate_var, width=6).pack(side='left', padx=5)
+        ttk.Label(offer_frame, text="Term (years):").pack(side='left')
+        ttk.Entry(offer_frame, textvariable=self.refinance_term_var, width=5).pack(side='left', padx=5)
+        ttk.Label(offer_frame, text="Switching cost:").pack(side='left')
+        ttk.Entry(offer_frame, textvariable=self.refinance_cost_var,
+                  width=10).pack(side='left', fill='x', expand=True, padx=(5, 0))
+
+        check_frame = ttk.Frame(refinance_frame)
+        check_frame.pack(fill='x', expand=True, pady=(5, 0))
+        ttk.Button(check_frame, text="Check", command=self.check_refinance).pack(side='left')
+        ttk.Label(check_frame, textvariable=self.refinance_status_var).pack(side='left', padx=5)
+
     # STEP 4: Results Panel Creation
     def create_results_panel(self, parent):
         """Create the results display panel"""
@@ -202,6 +323,11 @@ class MortgageCalculator:
         export_frame = ttk.LabelFrame(parent, text="Step 5: Export Results", padding=10)
         export_frame.pack(fill='x', padx=5, pady=5)
         ttk.Button(export_frame, text="Export PDF", command=self.export_pdf).pack(side='right')
+        ttk.Label(export_frame, textvariable=self.export_status_var).pack(side='left')
+        ttk.Button(export_frame, text="Schedule CSV",
+                   command=lambda: self.export_schedule('csv')).pack(side='right', padx=5)
+        ttk.Button(export_frame, text="Schedule PDF",
+                   command=lambda: self.export_schedule('pdf')).pack(side='right')
 
         # Monthly Payment Breakdown
         breakdown_frame = ttk.LabelFrame(parent, text="Monthly Payment Breakdown", padding=10)
@@ -235,7 +361,7 @@ class MortgageCalculator:
         fee_frame = ttk.Frame(breakdown_frame)
         fee_frame.pack(fill='x', expand=True)
         ttk.Label(fee_frame, text="Monthly House Fee:", anchor='w').pack(side='left')
-        ttk.Label(fee_frame, textvariable=self.monthly_fee_var, anchor='e').pack(side='right')
+        ttk.Label(fee_frame, textvariable=self.monthly_fee_display_var, anchor='e').pack(side='right')
 
         # Total Monthly Payment
         total_frame = ttk.Frame(breakdown_frame)
@@ -265,47 +391,65 @@ class MortgageCalculator:
         ttk.Label(payoff_frame, text="Loan Payoff Time:", anchor='w').pack(side='left')
         ttk.Label(payoff_frame, textvariable=self.loan_payoff_time_var, anchor='e').pack(side='right')
 
-    # STEP 5: Input Validation
-    def validate_inputs(self):
-        """Validate all input fields"""
-        try:
-            # Validate loan seeking amount
-            loan_seeking = self.get_float_value(self.loan_seeking_var.get())
-            if loan_seeking <= 0:
-                messagebox.showerror("Error", "Loan seeking amount must be greater than 0")
-                return False
-
-            # Validate down payment
-            down_payment = self.get_float_value(self.down_payment_var.get())
-            if down_payment < 0:
-                messagebox.showerror("Error", "Down payment cannot be negative")
-                return False
-            if down_payment >= loan_seeking:
-                messagebox.showerror("Error", "Down payment must be less than loan seeking amount")
-                return False
+        # Amortization Schedule, showing only the visible months
+        from mortgage_table import ScheduleTable
+        schedule_frame = ttk.LabelFrame(parent, text="Amortization Schedule", padding=10)
+        schedule_frame.pack(fill='both', expand=True, padx=5, pady=5)
+        jump_frame = ttk.Frame(schedule_frame)
+        jump_frame.pack(fill='x')
+        ttk.Label(jump_frame, text="Go to year:").pack(side='left')
+        jump_entry = ttk.Entry(jump_frame, textvariable=self.jump_year_var, width=6)
+        jump_entry.pack(side='left', padx=5)
+        jump_entry.bind('<Return>', self.jump_to_year)
+        ttk.Button(jump_frame, text="Go", command=self.jump_to_year).pack(side='left')
+        ttk.Button(jump_frame, text="Portfolio...",
+                   command=self.open_portfolio_schedule).pack(side='left', padx=5)
+        ttk.Label(jump_frame, text="Click a heading to sort").pack(side='right')
+        self.schedule_table = ScheduleTable(schedule_frame, height=8)
+        self.schedule_table.pack(fill='both', expand=True, pady=(5, 0))
 
-            # Validate interest rate
-            interest_rate = self.get_float_value(self.interest_rate_var.get())
-            if interest_rate <= 0 or interest_rate >= 100:
-                messagebox.showerror("Error", "Interest rate must be between 0 and 100")
-                return False
+    def create_diagnostics_panel(self, parent):
+        """Create the instrumentation panel shown with --diagnostics"""
+        diagnostics_frame = ttk.LabelFrame(parent, text="Diagnostics", padding=10)
+        diagnostics_frame.pack(fill='x', padx=5, pady=5)
+        self.diagnostics_var = tk.StringVar(value=metrics.format_table())
+        ttk.Label(diagnostics_frame, textvariable=self.diagnostics_var,
+                  font=('Courier', 8), justify='left').pack(fill='x')
+        ttk.Button(diagnostics_frame, text="Save JSON",
+                   command=self.save_diagnostics).pack(side='right')
+        ttk.Button(diagnostics_frame, text="Reset",
+                   command=metrics.reset).pack(side='right', padx=5)
+        self.refresh_diagnostics()
 
-            # Validate principal payment
-            principal_payment = self.get_float_value(self.principal_payment_var.get())
-            if principal_payment < 0:
-                messagebox.showerror("Error", "Principal payment cannot be negative")
-                return False
+    def refresh_diagnostics(self):
+        """Redraw the diagnostics table every two seconds"""
+        self.diagnostics_var.set(metrics.format_table())
+        self.root.after(2000, self.refresh_diagnostics)
 
-            # Validate extra payment
-            extra_payment = self.get_float_value(self.extra_payment_var.get())
-            if extra_payment < 0:
-                messagebox.showerror("Error", "Extra payment cannot be negative")
-                return False
+    def save_diagnostics(self):
+        """Write the recorded metrics to a JSON file"""
+        filename = filedialog.asksaveasfilename(
+            defaultextension='.json', filetypes=[('JSON', '*.json')],
+            initialfile='mortgage_metrics.json')
+        if filename:
+            metrics.dump_json(filename)
 
-            # Validate monthly fee
-            monthly_fee = self.get_float_value(self.monthly_fee_var.get())
-            if monthly_fee < 0:
-                messagebox.showerror("Error", "Monthly house fee cannot be negative")
+    # STEP 5: Input Validation
+    @metrics.timed('gui.validate_inputs')
+    def validate_inputs(self):
+        """Validate all input fields"""
+        try:
+            error = validate_loan(
+                self.get_float_value(self.loan_seeking_var.get()),
+                self.get_float_value(self.down_payment_var.get()),
+                self.get_float_value(self.interest_rate_var.get()),
+                self.get_float_value(self.principal_payment_var.get()),
+                self.get_float_value(self.extra_payment_var.get()),
+                self.get_float_value(self.monthly_fee_var.get()),
+            )
+            parse_start_year(self.extra_start_year_var.get())
+            if error:
+                messagebox.showerror("Error", error)
                 return False
 
             return True
@@ -315,6 +459,7 @@ class MortgageCalculator:
             return False
 
     # STEP 6: Calculation Logic
+    @metrics.timed('gui.calculate')
     def calculate(self):
         """Calculate mortgage payments and update display"""
         if not self.validate_inputs():
@@ -322,114 +467,180 @@ class MortgageCalculator:
 
         try:
             # Get values from inputs
-            loan_seeking = self.get_float_value(self.loan_seeking_var.get())
-            down_payment = self.get_float_value(self.down_payment_var.get())
-            loan_amount = loan_seeking - down_payment
-            interest_rate = self.get_float_value(self.interest_rate_var.get())
-            principal_payment = self.get_float_value(self.principal_payment_var.get())
-            extra_payment = self.get_float_value(self.extra_payment_var.get() or "0")
-            monthly_fee = self.get_float_value(self.monthly_fee_var.get())
-
-            # Calculate monthly rate and base payment
-            monthly_rate = interest_rate / 100 / 12
-            base_monthly = (loan_amount * monthly_rate) / (1 - (1 + monthly_rate) ** -360)
-            
-            # Calculate monthly interest
-            monthly_interest = loan_amount * monthly_rate
-            
-            # Calculate total monthly payment (including principal, interest, extra payment, and fees)
-            total_monthly = principal_payment + extra_payment + monthly_interest + monthly_fee
-            
-            # Calculate total interest over loan term
-            total_interest = (base_monthly * 360) - loan_amount
-
-            # Calculate base payoff time (without extra payments)
-            base_months_to_payoff = int(loan_amount / principal_payment)
-            
-            # Calculate time and interest saved with extra payments
-            if extra_payment > 0:
-                # Calculate months to payoff with the simplified formula
-                total_monthly_payment = principal_payment + extra_payment
-                months_with_extra = int(loan_amount / total_monthly_payment)
-                
-                # Calculate interest for the shorter period
-                total_interest_with_extra = 0
-                remaining_balance = loan_amount
-                for _ in range(months_with_extra):
-                    interest = remaining_balance * monthly_rate
-                    total_interest_with_extra += interest
-                    remaining_balance -= total_monthly_payment
-                
-                # Calculate time saved by comparing with base payoff time
-                time_saved = base_months_to_payoff - months_with_extra
-                years_saved = time_saved // 12
-                months_saved = time_saved % 12
-                
-                # Calculate interest saved
-                interest_saved = total_interest - total_interest_with_extra
-                
-                # Calculate payoff time
-                years_to_payoff = months_with_extra // 12
-                months_to_payoff = months_with_extra % 12
-            else:
-                # Use base payoff time when no extra payments
-                months_with_extra = base_months_to_payoff
-                years_to_payoff = months_with_extra // 12
-                months_to_payoff = months_with_extra % 12
-                years_saved = months_saved = 0
-                interest_saved = 0
-
-            # Format currency based on selection
-            currency = self.currency_var.get()
-            
-            # Step 4: Update View Results
-            self.monthly_payment_var.set(f"{currency}{total_monthly:,.0f}")
-            self.total_interest_var.set(f"{currency}{total_interest:,.0f}")
-            
-            # Step 5: Update Monthly Payment Breakdown
-            self.monthly_principal_var.set(f"{currency}{principal_payment:,.0f}")
-            self.monthly_extra_var.set(f"{currency}{extra_payment:,.0f}")
-            self.monthly_total_principal_var.set(f"{currency}{(principal_payment + extra_payment):,.0f}")
-            self.monthly_interest_var.set(f"{currency}{monthly_interest:,.0f}")
-            # Monthly House Fee without currency symbol
-            self.monthly_fee_var.set(f"{monthly_fee:,.0f}")
-            self.monthly_total_var.set(f"{currency}{total_monthly:,.0f}")
-            
-            # Update Extra Payments Impact
-            self.time_saved_var.set(f"{years_saved} years, {months_saved} months")
-            self.interest_saved_var.set(f"{currency}{interest_saved:,.0f}")
-            self.loan_payoff_time_var.set(f"{years_to_payoff} years, {months_to_payoff} months")
-
-            # Store current values for PDF export
-            self.current_values = {
-                'loan_amount': loan_amount,
-                'currency_symbol': currency,
-                'monthly_payment': total_monthly,
-                'total_interest': total_interest,
-                'principal_payment': principal_payment,
-                'extra_payment': extra_payment,
-                'monthly_fee': monthly_fee,
-                'time_saved': f"{years_saved} years, {months_saved} months",
-                'interest_saved': interest_saved,
-                'loan_payoff': f"{years_to_payoff} years, {months_to_payoff} months"
-            }
+            inputs = self.parse_inputs(self.read_inputs())
+
+            # Run the shared amortization engine, reusing cached scenarios
+            results = calculate_cached(self.calculation_cache, **inputs)
+            self.show_results(inputs, results)
+            from mortgage_schedule import build_schedule
+            self.show_schedule(inputs, build_schedule(
+                results['loan_amount'], inputs['interest_rate'], inputs['principal_payment'],
+                inputs['extra_payment'], inputs['monthly_fee'], inputs['extra_start_month']))
 
         except Exception as e:
             messagebox.showerror("Error", f"An error occurred during calculation: {str(e)}")
             return False
         return True
 
+    def read_inputs(self):
+        """Read the raw Step 2 field values (main thread only)"""
+        return (
+            self.loan_seeking_var.get(),
+            self.down_payment_var.get(),
+            self.interest_rate_var.get(),
+            self.principal_payment_var.get(),
+            self.extra_payment_var.get() or "0",
+            self.monthly_fee_var.get(),
+            self.currency_var.get(),
+            self.extra_start_year_var.get(),
+        )
+
+    def parse_inputs(self, raw):
+        """Convert raw field values from read_inputs() into numbers"""
+        loan_seeking, down_payment, interest_rate, principal_payment, \
+            extra_payment, monthly_fee, currency, extra_start_year = raw
+        return {
+            'loan_seeking': self.get_float_value(loan_seeking),
+            'down_payment': self.get_float_value(down_payment),
+            'interest_rate': self.get_float_value(interest_rate),
+            'principal_payment': self.get_float_value(principal_payment),
+            'extra_payment': self.get_float_value(extra_payment),
+            'monthly_fee': self.get_float_value(monthly_fee),
+            'currency': currency,
+            'extra_start_month': parse_start_year(extra_start_year),
+        }
+
+    @metrics.timed('gui.compute_live')
+    def compute_live(self, raw):
+        """Validate and calculate raw inputs on the live recalculation worker
+
+        Each edit is calculated from the previous one, so only the results
+        and schedule months the edit changes are computed again.
+        """
+        from mortgage_schedule import build_schedule
+
+        inputs = self.parse_inputs(raw)
+        error = validate_loan(inputs['loan_seeking'], inputs['down_payment'],
+                              inputs['interest_rate'], inputs['principal_payment'],
+                              inputs['extra_payment'], inputs['monthly_fee'])
+        if error:
+            raise ValueError(error)
+
+        previous = self.live_previous  # Only touched on the worker thread
+        results = calculate_cached(self.calculation_cache, **inputs,
+                                   previous=previous and previous[:2])
+        schedule = build_schedule(results['loan_amount'], inputs['interest_rate'],
+                                  inputs['principal_payment'], inputs['extra_payment'],
+                                  inputs['monthly_fee'], inputs['extra_start_month'],
+                                  previous=previous and previous[2])
+        self.live_previous = (inputs, results, schedule)
+        return inputs, results, schedule
+
+    def show_live_results(self, raw, computed):
+        """Display results from the live recalculation worker"""
+        inputs, results, schedule = computed
+        self.show_results(inputs, results)
+        self.show_schedule(inputs, schedule)
+
+    def show_schedule(self, inputs, schedule):
+        """Keep the schedule of inputs for saving and show it in the table"""
+        self.current_schedule = schedule
+        self.current_schedule_inputs = inputs if schedule else None
+        self.schedule_table.set_rows(schedule, inputs['currency'] if inputs else None)
+
+    def jump_to_year(self, *args):
+        """Scroll the schedule table to the year typed next to it"""
+        text = self.jump_year_var.get().strip()
+        if not text:
+            return
+        if not text.isdigit() or int(text) < 1:
+            messagebox.showerror("Error", "Year must be a whole number of at least 1")
+            return
+        self.schedule_table.jump_to_year(int(text))
+
+    def open_portfolio_schedule(self):
+        """Show one loan from a schedule directory written by batch mode"""
+        from tkinter import simpledialog
+
+        directory = filedialog.askdirectory(title="Open schedule directory")
+        if not directory:
+            return
+        try:
+            from mortgage_columnar import ColumnarSchedules
+
+            schedules = ColumnarSchedules(directory)
+            if not len(schedules):
+                raise ValueError("The schedule directory has no loans")
+            first = int(schedules.columns['loan'][0])
+            loan_id = simpledialog.askinteger(
+                "Portfolio Schedule", f"Loan (row number) of {len(schedules):,}:",
+                initialvalue=first, parent=self.root)
+            if loan_id is None:
+                return
+            index = schedules.find(loan_id)
+        except KeyError:
+            messagebox.showerror("Error", f"No loan {loan_id} in {directory}")
+            return
+        except (OSError, ValueError) as e:
+            messagebox.showerror("Error", f"Failed to open schedules: {str(e)}")
+            return
+        # Rows are read from the mapped files only as they are shown
+        self.schedule_table.set_rows(schedules[index], schedules.currency(index))
+
+    def show_results(self, inputs, results):
+        """Update the results panels and current_values from engine results"""
+        currency = inputs['currency']
+        principal_payment = inputs['principal_payment']
+        extra_payment = inputs['extra_payment']
+        monthly_fee = inputs['monthly_fee']
+        total_monthly = results['monthly_payment']
+        total_interest = results['total_interest']
+        monthly_interest = results['monthly_interest']
+        interest_saved = results['interest_saved']
+        years_saved, months_saved = split_months(results['time_saved_months'])
+        years_to_payoff, months_to_payoff = split_months(results['payoff_months'])
+
+        # Step 4: Update View Results
+        self.monthly_payment_var.set(f"{currency}{total_monthly:,.0f}")
+        self.total_interest_var.set(f"{currency}{total_interest:,.0f}")
+
+        # Step 5: Update Monthly Payment Breakdown
+        self.monthly_principal_var.set(f"{currency}{principal_payment:,.0f}")
+        self.monthly_extra_var.set(f"{currency}{extra_payment:,.0f}")
+        self.monthly_total_principal_var.set(f"{currency}{(principal_payment + extra_payment):,.0f}")
+        self.monthly_interest_var.set(f"{currency}{monthly_interest:,.0f}")
+        # Monthly House Fee without currency symbol
+        self.monthly_fee_display_var.set(f"{monthly_fee:,.0f}")
+        self.monthly_total_var.set(f"{currency}{total_monthly:,.0f}")
+
+        # Update Extra Payments Impact
+        self.time_saved_var.set(f"{years_saved} years, {months_saved} months")
+        self.interest_saved_var.set(f"{currency}{interest_saved:,.0f}")
+        self.loan_payoff_time_var.set(f"{years_to_payoff} years, {months_to_payoff} months")
+
+        # Store current values for PDF export and saving
+        self.current_inputs = inputs
+        self.current_results = results
+        self.current_values = {
+            'loan_amount': results['loan_amount'],
+            'interest_rate': inputs['interest_rate'],
+            'currency_symbol': currency,
+            'monthly_payment': total_monthly,
+            'total_interest': total_interest,
+            'principal_payment': principal_payment,
+            'extra_payment': extra_payment,
+            'monthly_fee': monthly_fee,
+            'time_saved': f"{years_saved} years, {months_saved} months",
+            'interest_saved': interest_saved,
+            'loan_payoff': f"{years_to_payoff} years, {months_to_payoff} months",
+            'extra_start_month': inputs['extra_start_month'],
+        }
+
     def get_float_value(self, value_str):
         """Convert string to float, handling commas and invalid input"""
-        try:
-            # Remove any currency symbols and commas
-            cleaned_str = value_str.replace('kr', '').replace('$', '').replace(',', '').strip()
-            if not cleaned_str:
-                return 0.0
-            return float(cleaned_str)
-        except ValueError:
-            raise ValueError(f"Invalid number format: {value_str}")
+        return parse_amount(value_str)
 
+    @metrics.timed('gui.update_on_loan_seeking_change')
     def update_on_loan_seeking_change(self, *args):
         """Update loan amount when loan seeking amount changes"""
         try:
@@ -437,7 +648,7 @@ class MortgageCalculator:
             if loan_seeking > 0:
                 if self.down_payment_mode.get() == "auto":
                     # Calculate 15% down payment for auto mode
-                    down_payment = loan_seeking * 0.15
+                    down_payment = loan_seeking * AUTO_DOWN_PAYMENT_RATE
                     self.down_payment_var.set(f"{down_payment:,.0f}")
                     self.down_payment_entry.configure(state='disabled')
                 else:
@@ -463,6 +674,7 @@ class MortgageCalculator:
             self.down_payment_var.set("")
             self.loan_amount_var.set("")
 
+    @metrics.timed('gui.update_loan_amount')
     def update_loan_amount(self, *args):
         """Update loan amount when down payment changes"""
         try:
@@ -494,6 +706,7 @@ class MortgageCalculator:
         self.interest_rate_var = tk.StringVar(value="4.5")  # Set default to 4.5
         self.principal_payment_var = tk.StringVar(value="")
         self.extra_payment_var = tk.StringVar(value="")
+        self.extra_start_year_var = tk.StringVar(value="1")
         self.monthly_fee_var = tk.StringVar(value="")
         
         # Result variables
@@ -503,15 +716,35 @@ class MortgageCalculator:
         self.monthly_extra_var = tk.StringVar(value="kr0")
         self.monthly_total_principal_var = tk.StringVar(value="kr0")
         self.monthly_interest_var = tk.StringVar(value="kr0")
-        self.monthly_fee_var = tk.StringVar(value="")  # Keep Monthly House Fee blank
+        self.monthly_fee_display_var = tk.StringVar(value="")  # Keep Monthly House Fee blank
         self.monthly_total_var = tk.StringVar(value="kr0")
         self.time_saved_var = tk.StringVar(value="0 years, 0 months")
         self.interest_saved_var = tk.StringVar(value="kr0")
         self.loan_payoff_time_var = tk.StringVar(value="30 years, 0 months")
+        self.export_status_var = tk.StringVar(value="")
+        self.export_queue = None  # Created on first export
+        self.customer_var = tk.StringVar(value="")
+        self.scenario_store = None  # Opened on first save or browse
+        self.offer_name_var = tk.StringVar(value="")
+        self.offers_status_var = tk.StringVar(value="")
+        self.jump_year_var = tk.StringVar(value="")
+        self.goal_target_var = tk.StringVar(value='payoff_years')
+        self.goal_value_var = tk.StringVar(value="")
+        self.goal_solve_for_var = tk.StringVar(value="Extra payment")
+        self.goal_status_var = tk.StringVar(value="")
+        self.refinance_rate_var = tk.StringVar(value="")
+        self.refinance_term_var = tk.StringVar(value="")  # Blank keeps the principal payment
+        self.refinance_cost_var = tk.StringVar(value="")
+        self.refinance_status_var = tk.StringVar(value="")
+        self.offers = []  # Step 2 inputs of the offers being compared
+        self.comparison_window = None
+        self.current_inputs = None
+        self.current_results = None
 
         # Store current values for PDF export
         self.current_values = {
             'loan_amount': 0,
+            'interest_rate': 0,
             'currency_symbol': 'kr',
             'monthly_payment': 0,
             'total_interest': 0,
@@ -520,7 +753,8 @@ class MortgageCalculator:
             'monthly_fee': 0,
             'time_saved': '0 years, 0 months',
             'interest_saved': 0,
-            'loan_payoff': '30 years, 0 months'
+            'loan_payoff': '30 years, 0 months',
+            'extra_start_month': 1,
         }
 
     def initialize_display_variables(self):
@@ -531,111 +765,275 @@ class MortgageCalculator:
         self.monthly_extra_var = tk.StringVar(value="kr0")
         self.monthly_total_principal_var = tk.StringVar(value="kr0")
         self.monthly_interest_var = tk.StringVar(value="kr0")
-        self.monthly_fee_var = tk.StringVar(value="")  # Keep Monthly House Fee blank
+        self.monthly_fee_display_var = tk.StringVar(value="")  # Keep Monthly House Fee blank
         self.monthly_total_var = tk.StringVar(value="kr0")
         self.time_saved_var = tk.StringVar(value="0 years, 0 months")
         self.interest_saved_var = tk.StringVar(value="kr0")
         self.loan_payoff_time_var = tk.StringVar(value="30 years, 0 months")
 
+    @metrics.timed('gui.export_pdf')
     def export_pdf(self):
-        """Export results to PDF"""
+        """Export results to PDF in the background"""
         try:
-            # Create exports directory if it doesn't exist
-            export_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'exports')
-            os.makedirs(export_dir, exist_ok=True)
-            
-            # Generate timestamp for unique filename
-            current_date = datetime.now()
-            base_filename = f'mortgage_calculation_{current_date.strftime("%d-%m-%Y")}'
-            
-            # Check if file exists and create unique name
-            counter = 1
-            filename = os.path.join(export_dir, f'{base_filename}.pdf')
-            while os.path.exists(filename):
-                filename = os.path.join(export_dir, f'{base_filename}_{counter}.pdf')
-                counter += 1
-            
-            # Create PDF
-            c = canvas.Canvas(filename, pagesize=letter)
-            width, height = letter
-            
-            # Add title
-            c.setFont("Helvetica-Bold", 16)
-            c.drawString(50, height - 50, "Mortgage Calculator Results")
-            
-            # Add line under title
-            c.line(50, height - 60, width - 50, height - 60)
-            
-            # Add subtitle with timestamp
-            c.setFont("Helvetica", 10)
-            c.drawString(50, height - 80, f"Generated on: {current_date.strftime('%Y-%m-%d %H:%M:%S')}")
-            
-            # Add loan details
-            c.setFont("Helvetica-Bold", 12)
-            c.drawString(50, height - 100, "Loan Details")
-            
-            c.setFont("Helvetica", 10)
-            y = height - 120
-            
             # Get values and handle potential empty strings
             loan_seeking = self.get_float_value(self.loan_seeking_var.get() or "0")
             down_payment = self.get_float_value(self.down_payment_var.get() or "0")
             loan_amount = self.get_float_value(self.loan_amount_var.get() or "0")
-            
+
             details = [
                 f"Loan Seeking For: {self.currency_var.get()}{loan_seeking:,.0f}",
                 f"Down Payment: {self.currency_var.get()}{down_payment:,.0f}",
                 f"Loan Amount: {self.currency_var.get()}{loan_amount:,.0f}",
-                f"Interest Rate: {self.interest_rate_var.get()}%"
+                f"Interest Rate: {self.interest_rate_var.get()}%",
+                f"Extra Payments From: Year {self.extra_start_year_var.get() or 1}"
             ]
-            
-            for detail in details:
-                y -= 20
-                c.drawString(70, y, detail)
-            
-            # Add Monthly Payment Breakdown
-            y -= 40
-            c.setFont("Helvetica-Bold", 12)
-            c.drawString(50, y, "Monthly Payment Breakdown")
-            
-            c.setFont("Helvetica", 10)
-            y -= 20
             breakdown = [
                 f"Principal Payment: {self.monthly_principal_var.get()}",
                 f"Extra Payment: {self.monthly_extra_var.get()}",
                 f"Total Principal: {self.monthly_total_principal_var.get()}",
                 f"Interest Payment: {self.monthly_interest_var.get()}",
-                f"Monthly House Fee: {self.monthly_fee_var.get() or ''}",
+                f"Monthly House Fee: {self.monthly_fee_display_var.get() or ''}",
                 f"Total Monthly Payment: {self.monthly_total_var.get()}"
             ]
-            
-            for item in breakdown:
-                y -= 20
-                c.drawString(70, y, item)
-            
-            # Add Extra Payments Impact
-            y -= 40
-            c.setFont("Helvetica-Bold", 12)
-            c.drawString(50, y, "With Extra Payments")
-            
-            c.setFont("Helvetica", 10)
-            y -= 20
             extra_payments = [
                 f"Time Saved: {self.time_saved_var.get()}",
                 f"Interest Saved: {self.interest_saved_var.get()}",
                 f"Loan Payoff Time: {self.loan_payoff_time_var.get()}"
             ]
-            
-            for item in extra_payments:
-                y -= 20
-                c.drawString(70, y, item)
-            
-            c.save()
-            messagebox.showinfo("Success", f"PDF exported successfully to:\n{filename}")
-            
+            from mortgage_export import build_summary_report
+            report = build_summary_report(details, breakdown, extra_payments)
+            self.submit_export(report)
+
         except Exception as e:
             messagebox.showerror("Error", f"Failed to export PDF: {str(e)}")
 
+    def submit_export(self, report, **render_args):
+        """Render a PDF on the export queue; on_export_done() reports it"""
+        if self.export_queue is None:
+            from mortgage_export import ExportQueue
+            self.export_queue = ExportQueue(on_progress=self.update_export_status)
+        self.export_queue.submit(report, on_done=self.on_export_done, **render_args)
+        self.update_export_status(self.export_queue.completed, self.export_queue.submitted)
+        self.root.after(100, self.poll_exports)
+
+    def poll_exports(self):
+        """Deliver finished exports while any are running"""
+        self.export_queue.process_events()
+        if self.export_queue.busy:
+            self.root.after(100, self.poll_exports)
+
+    def update_export_status(self, done, total):
+        """Show export progress next to the Export PDF button"""
+        self.export_status_var.set("" if done >= total else f"Exporting {done}/{total}...")
+
+    def on_export_done(self, filename, error):
+        """Report a finished export"""
+        if error is not None:
+            messagebox.showerror("Error", f"Failed to export PDF: {str(error)}")
+        else:
+            messagebox.showinfo("Success", f"PDF exported successfully to:\n{filename}")
+
+    @metrics.timed('gui.export_schedule')
+    def export_schedule(self, file_format):
+        """Export the month-by-month schedule of the last calculation"""
+        values = self.current_values
+        if not values['loan_amount'] or not values['principal_payment']:
+            messagebox.showerror("Error", "Please calculate a loan before exporting its schedule")
+            return
+
+        filename = filedialog.asksaveasfilename(
+            defaultextension=f'.{file_format}',
+            filetypes=[(file_format.upper(), f'*.{file_format}')],
+            initialfile=f'mortgage_schedule_{datetime.now().strftime("%d-%m-%Y")}.{file_format}'
+        )
+        if not filename:
+            return
+
+        loan = {
+            'label': '',
+            'loan_amount': values['loan_amount'],
+            'interest_rate': values['interest_rate'],
+            'principal_payment': values['principal_payment'],
+            'extra_payment': values['extra_payment'],
+            'monthly_fee': values['monthly_fee'],
+            'extra_start_month': values['extra_start_month'],
+            'currency': values['currency_symbol'],
+        }
+        try:
+            from mortgage_schedule import write_schedule_csv, write_schedule_pdf
+
+            if file_format == 'pdf':
+                write_schedule_pdf(filename, [loan])
+            else:
+                write_schedule_csv(filename, [loan])
+            messagebox.showinfo("Success", f"Schedule exported successfully to:\n{filename}")
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to export schedule: {str(e)}")
+
+    # STEP 12: Saved Scenarios
+    def get_scenario_store(self):
+        """Open the scenario store the first time it is needed"""
+        if self.scenario_store is None:
+            from mortgage_store import ScenarioStore
+            self.scenario_store = ScenarioStore()
+        return self.scenario_store
+
+    @metrics.timed('gui.save_scenario')
+    def save_scenario(self):
+        """Save the last calculation, its results and its schedule"""
+        if self.current_results is None:
+            messagebox.showerror("Error", "Please calculate a loan before saving it")
+            return
+        inputs, results = self.current_inputs, self.current_results
+        try:
+            schedule = self.current_schedule
+            if not schedule or self.current_schedule_inputs != inputs:
+                from mortgage_schedule import build_schedule
+                schedule = build_schedule(results['loan_amount'], inputs['interest_rate'],
+                                          inputs['principal_payment'], inputs['extra_payment'],
+                                          inputs['monthly_fee'], inputs['extra_start_month'])
+            scenario_id = self.get_scenario_store().save(
+                inputs, results, schedule, customer=self.customer_var.get().strip())
+            self.export_status_var.set(f"Saved scenario {scenario_id}")
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to save scenario: {str(e)}")
+
+    def open_scenarios(self):
+        """Open a window listing saved scenarios with filters"""
+        from mortgage_store import DEFAULT_PAGE_SIZE
+
+        window = tk.Toplevel(self.root)
+        window.title("Saved Scenarios")
+        window.geometry("820x480")
+
+        # Filters
+        filter_frame = ttk.Frame(window, padding=5)
+        filter_frame.pack(fill='x')
+        filters = {}
+        for label, name, width in (("Customer", 'customer', 14), ("From date", 'since', 11),
+                                   ("To date", 'until', 11), ("Rate from", 'min_rate', 6),
+                                   ("to", 'max_rate', 6), ("Amount from", 'min_amount', 11),
+                                   ("to", 'max_amount', 11)):
+            ttk.Label(filter_frame, text=f"{label}:").pack(side='left')
+            filters[name] = tk.StringVar(value="")
+            ttk.Entry(filter_frame, textvariable=filters[name],
+                      width=width).pack(side='left', padx=(2, 6))
+
+        # Results list
+        columns = [("id", "ID", 60), ("created", "Saved", 130), ("customer", "Customer", 110),
+                   ("loan_amount", "Loan Amount", 110), ("interest_rate", "Rate (%)", 70),
+                   ("monthly_payment", "Monthly", 100), ("payoff", "Payoff", 130)]
+        list_frame = ttk.Frame(window, padding=5)
+        list_frame.pack(fill='both', expand=True)
+        tree = ttk.Treeview(list_frame, columns=[name for name, _, _ in columns],
+                            show='headings', selectmode='browse')
+        for name, heading, width in columns:
+            tree.heading(name, text=heading)
+            tree.column(name, width=width, anchor='w' if name in ('created', 'customer') else 'e')
+        scrollbar = ttk.Scrollbar(list_frame, orient='vertical', command=tree.yview)
+        tree.configure(yscrollcommand=scrollbar.set)
+        tree.pack(side='left', fill='both', expand=True)
+        scrollbar.pack(side='right', fill='y')
+
+        status_var = tk.StringVar(value="")
+        button_frame = ttk.Frame(window, padding=5)
+        button_frame.pack(fill='x')
+        ttk.Label(button_frame, textvariable=status_var).pack(side='left')
+        state = {'filters': {}, 'offset': 0, 'total': 0}
+
+        def read_filters():
+            values = {}
+            for name, var in filters.items():
+                text = var.get().strip()
+                if not text:
+                    continue
+                if name in ('customer', 'since', 'until'):
+                    values[name] = text
+                else:
+                    values[name] = self.get_float_value(text)
+            return values
+
+        def show_page():
+            store = self.get_scenario_store()
+            records = store.query(**state['filters'], limit=DEFAULT_PAGE_SIZE,
+                                  offset=state['offset'])
+            for record in records:
+                if tree.exists(str(record['id'])):
+                    continue  # Shifted onto this page by a scenario saved since
+                currency = record['currency']
+                tree.insert('', 'end', iid=str(record['id']), values=(
+                    record['id'], record['created'], record['customer'],
+                    f"{currency}{record['loan_amount']:,.0f}", f"{record['interest_rate']:g}",
+                    f"{currency}{record['monthly_payment']:,.0f}",
+                    format_months(record['payoff_months'])))
+            state['offset'] += len(records)
+            status_var.set(f"Showing {state['offset']:,} of {state['total']:,} scenarios")
+
+        def search(*args):
+            try:
+                state['filters'] = read_filters()
+            except ValueError as e:
+                messagebox.showerror("Error", str(e), parent=window)
+                return
+            tree.delete(*tree.get_children())
+            state['offset'] = 0
+            state['total'] = self.get_scenario_store().count(**state['filters'])
+            show_page()
+
+        def more():
+            if state['offset'] < state['total']:
+                show_page()
+
+        def load_selected(*args):
+            selection = tree.selection()
+            if selection:
+                self.load_scenario(int(selection[0]))
+
+        def compare_selected():
+            selection = tree.selection()
+            if selection:
+                self.add_saved_offer(int(selection[0]))
+
+        ttk.Button(filter_frame, text="Search", command=search).pack(side='left')
+        ttk.Button(button_frame, text="Open", command=load_selected).pack(side='right')
+        ttk.Button(button_frame, text="Compare", command=compare_selected).pack(side='right')
+        ttk.Button(button_frame, text="More", command=more).pack(side='right', padx=5)
+        tree.bind('<Double-1>', load_selected)
+        window.bind('<Return>', search)
+        search()
+
+    @metrics.timed('gui.load_scenario')
+    def load_scenario(self, scenario_id):
+        """Show a saved scenario from its stored results, without recalculating"""
+        from mortgage_store import record_inputs, record_results, record_summary
+
+        store = self.get_scenario_store()
+        record = store.get(scenario_id)
+        if record is None:
+            messagebox.showerror("Error", f"Scenario {scenario_id} no longer exists")
+            return
+        inputs, results = record_inputs(record), record_results(record)
+
+        # Fill in Step 2 as typed values; the manual mode keeps the stored down payment
+        self.down_payment_mode.set("manual")
+        self.toggle_down_payment_mode()
+        self.currency_var.set(inputs['currency'])
+        self.currency_name_var.set(CURRENCY_NAMES.get(inputs['currency'], ""))
+        self.customer_var.set(record['customer'])
+        for var, field in ((self.loan_seeking_var, 'loan_seeking'),
+                           (self.down_payment_var, 'down_payment'),
+                           (self.principal_payment_var, 'principal_payment'),
+                           (self.extra_payment_var, 'extra_payment'),
+                           (self.monthly_fee_var, 'monthly_fee')):
+            var.set(amount_text(inputs[field]))
+        self.interest_rate_var.set(f"{inputs['interest_rate']:g}")
+        self.extra_start_year_var.set(str((inputs['extra_start_month'] - 1) // 12 + 1))
+
+        self.show_results(inputs, results)
+        self.show_schedule(inputs, store.schedule(scenario_id) or [])
+        self.live_recalculator.mark_computed(self.read_inputs())
+        self.export_status_var.set(f"Opened {record_summary(record)}")
+
     def update_extra_payments_info(self, time_saved, interest_saved):
         """Update the extra payments information display"""
         self.time_saved_var.set(str(time_saved))
@@ -650,7 +1048,7 @@ class MortgageCalculator:
         self.monthly_extra_var.set(f"{currency}0")
         self.monthly_total_principal_var.set(f"{currency}0")
         self.monthly_interest_var.set(f"{currency}0")
-        self.monthly_fee_var.set("")  # Keep Monthly House Fee blank
+        self.monthly_fee_display_var.set("")  # Keep Monthly House Fee blank
         self.monthly_total_var.set(f"{currency}0")
         self.time_saved_var.set("0 years, 0 months")
         self.interest_saved_var.set(f"{currency}0")
@@ -664,6 +1062,7 @@ class MortgageCalculator:
         self.interest_rate_var.set("4.5")  # Reset interest rate to default
         self.principal_payment_var.set("")
         self.extra_payment_var.set("")
+        self.extra_start_year_var.set("1")
         self.monthly_fee_var.set("")
         
         # Reset currency to default
@@ -675,13 +1074,313 @@ class MortgageCalculator:
         
         # Clear displays
         self.clear_displays()
+        self.show_schedule(None, [])
+        self.live_recalculator.invalidate()
+
+    def on_close(self):
+        """Save the calculation cache and close the window"""
+        self.live_recalculator.shutdown()
+        if self.export_queue is not None:
+            self.export_queue.shutdown(wait=True)
+        if self.scenario_store is not None:
+            self.scenario_store.close()
+        try:
+            self.calculation_cache.save(CACHE_PATH)
+        except OSError:
+            pass
+        self.root.destroy()
+
+    # STEP 13: Offer Comparison
+    def add_offer(self):
+        """Add the last calculation to the offers being compared"""
+        if self.current_inputs is None:
+            messagebox.showerror("Error", "Please calculate a loan before comparing it")
+            return
+        name = self.offer_name_var.get().strip() or f"Offer {len(self.offers) + 1}"
+        self.offers.append(dict(self.current_inputs, name=name))
+        self.offer_name_var.set("")
+        self.offers_changed()
+
+    def add_saved_offer(self, scenario_id):
+        """Add a saved scenario to the offers being compared"""
+        from mortgage_store import record_inputs
+
+        record = self.get_scenario_store().get(scenario_id)
+        if record is None:
+            messagebox.showerror("Error", f"Scenario {scenario_id} no longer exists")
+            return
+        name = record['label'] or record['customer'] or f"Scenario {scenario_id}"
+        self.offers.append(dict(record_inputs(record), name=name))
+        self.offers_changed()
+
+    def offers_changed(self):
+        """Show the offer count and refresh an open comparison window"""
+        count = len(self.offers)
+        self.offers_status_var.set(f"{count} offer{'s' if count != 1 else ''}" if count else "")
+        if self.comparison_window is not None:
+            _, refresh = self.comparison_window
+            refresh()
+
+    def open_comparison(self):
+        """Open a window ranking the offers side by side"""
+        if self.comparison_window is not None:
+            window, refresh = self.comparison_window
+            window.lift()
+            refresh()
+            return
+        from mortgage_compare import RANKINGS
+
+        window = tk.Toplevel(self.root)
+        window.title("Compare Offers")
+        window.geometry("900x480")
+
+        # Ranking and offer list controls
+        control_frame = ttk.Frame(window, padding=5)
+        control_frame.pack(fill='x')
+        ttk.Label(control_frame, text="Rank by:").pack(side='left')
+        captions = {caption: name for name, caption in RANKINGS.items()}
+        rank_by_var = tk.StringVar(value=RANKINGS['total_cost'])
+        rank_by = ttk.Combobox(control_frame, textvariable=rank_by_var, values=list(captions),
+                               state='readonly', width=16)
+        rank_by.pack(side='left', padx=(2, 6))
+
+        # Offers, best first
+        columns = [("rank", "#", 40), ("name", "Offer", 160), ("loan_amount", "Loan Amount", 110),
+                   ("interest_rate", "Rate (%)", 70), ("monthly_payment", "Monthly", 100),
+                   ("interest_paid", "Total Interest", 120), ("total_cost", "Total Cost", 120),
+                   ("payoff_months", "Payoff", 130)]
+        list_frame = ttk.Frame(window, padding=5)
+        list_frame.pack(fill='both', expand=True)
+        tree = ttk.Treeview(list_frame, columns=[name for name, _, _ in columns],
+                            show='headings', selectmode='extended')
+        for name, heading, width in columns:
+            if name in RANKINGS:
+                # Clicking a ranking's heading ranks by it
+                tree.heading(name, text=heading,
+                             command=lambda name=name: (rank_by_var.set(RANKINGS[name]),
+                                                        refresh()))
+            else:
+                tree.heading(name, text=heading)
+            tree.column(name, width=width, anchor='w' if name == 'name' else 'e')
+        scrollbar = ttk.Scrollbar(list_frame, orient='vertical', command=tree.yview)
+        tree.configure(yscrollcommand=scrollbar.set)
+        tree.pack(side='left', fill='both', expand=True)
+        scrollbar.pack(side='right', fill='y')
+
+        status_var = tk.StringVar(value="")
+        button_frame = ttk.Frame(window, padding=5)
+        button_frame.pack(fill='x')
+        ttk.Label(button_frame, textvariable=status_var).pack(side='left')
+        state = {'comparison': None}
+
+        @metrics.timed('gui.compare_offers')
+        def refresh(*args):
+            from mortgage_compare import compare_offers, comparison_rows
+
+            tree.delete(*tree.get_children())
+            state['comparison'] = None
+            if not self.offers:
+                status_var.set("Add offers with Add, Compare in Saved Scenarios or Import CSV")
+                return
+            try:
+                comparison = compare_offers(self.offers)
+            except ValueError as e:
+                status_var.set(str(e))
+                return
+            state['comparison'] = comparison
+            currency = comparison['currency']
+            for row in comparison_rows(comparison, captions[rank_by_var.get()]):
+                tree.insert('', 'end', iid=str(row['position']), values=(
+                    row['rank'], row['name'], f"{currency}{row['loan_amount']:,.0f}",
+                    f"{row['interest_rate']:g}", f"{currency}{row['monthly_payment']:,.0f}",
+                    f"{currency}{row['interest_paid']:,.0f}",
+                    f"{currency}{row['total_cost']:,.0f}", row['loan_payoff']))
+            status_var.set(f"{len(self.offers)} offers")
+
+        def import_offers():
+            from mortgage_compare import read_offers
+
+            filename = filedialog.askopenfilename(
+                parent=window, filetypes=[("CSV", '*.csv'), ("All files", '*.*')])
+            if not filename:
+                return
+            try:
+                with open(filename, newline='', encoding='utf-8-sig') as input_file:
+                    offers, errors = read_offers(input_file)
+            except (OSError, ValueError) as e:
+                messagebox.showerror("Error", f"Failed to import offers: {str(e)}", parent=window)
+                return
+            self.offers.extend(offers)
+            self.offers_changed()
+            if errors:
+                lines = [f"Row {row}: {message}" for row, message in list(errors.items())[:10]]
+                messagebox.showwarning("Import", f"Skipped {len(errors)} rows:\n" + "\n".join(lines),
+                                       parent=window)
+
+        def remove_selected():
+            for position in sorted((int(iid) for iid in tree.selection()), reverse=True):
+                del self.offers[position]
+            self.offers_changed()
+
+        def clear_offers():
+            self.offers.clear()
+            self.offers_changed()
+
+        def export(file_format):
+            from mortgage_compare import render_comparison_pdf, write_comparison_csv
+
+            if state['comparison'] is None:
+                messagebox.showerror("Error", "There are no offers to export", parent=window)
+                return
+            filename = filedialog.asksaveasfilename(
+                parent=window, defaultextension=f'.{file_format}',
+                filetypes=[(file_format.upper(), f'*.{file_format}')],
+                initialfile=f'mortgage_comparison_{datetime.now().strftime("%d-%m-%Y")}.{file_format}')
+            if not filename:
+                return
+            ranking = captions[rank_by_var.get()]
+            try:
+                if file_format == 'pdf':
+                    # Hundreds of offers take a moment to draw, so render in the background
+                    self.submit_export(state['comparison'], render=render_comparison_pdf,
+                                       filename=filename, rank_by=ranking)
+                else:
+                    write_comparison_csv(filename, state['comparison'], ranking)
+                    messagebox.showinfo("Success", f"Comparison exported successfully to:\n{filename}",
+                                        parent=window)
+            except Exception as e:
+                messagebox.showerror("Error", f"Failed to export comparison: {str(e)}", parent=window)
+
+        def close():
+            self.comparison_window = None
+            window.destroy()
+
+        ttk.Button(control_frame, text="Import CSV...", command=import_offers).pack(side='left')
+        ttk.Button(control_frame, text="Remove", command=remove_selected).pack(side='left', padx=5)
+        ttk.Button(control_frame, text="Clear", command=clear_offers).pack(side='left')
+        ttk.Button(button_frame, text="Export PDF",
+                   command=lambda: export('pdf')).pack(side='right')
+        ttk.Button(button_frame, text="Export CSV",
+                   command=lambda: export('csv')).pack(side='right', padx=5)
+        rank_by.bind('<<ComboboxSelected>>', refresh)
+        window.protocol("WM_DELETE_WINDOW", close)
+        self.comparison_window = (window, refresh)
+        refresh()
+
+    # STEP 14: Goal Seek
+    def solve_goal(self):
+        """Fill in the Step 2 field that reaches the goal seek target"""
+        from mortgage_goalseek import goal_seek
+
+        caption = self.goal_solve_for_var.get()
+        solve_for = GOAL_SEEK_FIELDS[caption]
+        self.goal_status_var.set("")
+        try:
+            target = self.get_float_value(self.goal_value_var.get())
+            if target <= 0:
+                raise ValueError("Enter a goal seek target greater than 0")
+            # The field solved for is replaced, so any valid value stands in for it
+            inputs = dict(self.parse_inputs(self.read_inputs()), **{solve_for: 1.0})
+            error = validate_loan(inputs['loan_seeking'], inputs['down_payment'],
+                                  inputs['interest_rate'], inputs['principal_payment'],
+                                  inputs['extra_payment'], inputs['monthly_fee'])
+            if error:
+                raise ValueError(error)
+            if self.goal_target_var.get() == 'payoff_years':
+                target_months, interest_budget = round(target * 12), None
+            else:
+                target_months, interest_budget = None, target
+            solved = float(goal_seek(
+                solve_for, inputs['loan_seeking'] - inputs['down_payment'],
+                inputs['interest_rate'], inputs['principal_payment'], inputs['extra_payment'],
+                target_months, interest_budget, inputs['extra_start_month']))
+        except ValueError as e:
+            messagebox.showerror("Error", str(e))
+            return
+
+        if solve_for == 'interest_rate':
+            if solved >= 100:
+                self.goal_status_var.set("Any rate stays within the budget")
+                return
+            if not solved > 0:
+                self.goal_status_var.set("The target cannot be reached")
+                return
+            self.interest_rate_var.set(f"{solved:.4f}".rstrip('0').rstrip('.'))
+        elif not math.isfinite(solved):
+            self.goal_status_var.set("The target cannot be reached")
+            return
+        elif solve_for == 'extra_payment':
+            self.extra_payment_var.set(amount_text(solved))
+        else:
+            self.principal_payment_var.set(amount_text(solved))
+        # Setting the field recalculates the results live
+        self.goal_status_var.set(f"{caption} updated")
+
+    # STEP 15: Refinance
+    def check_refinance(self):
+        """Show when switching the Step 2 loan to the new rate breaks even"""
+        from mortgage_refinance import NEVER, refinance_batch, term_principal
+
+        self.refinance_status_var.set("")
+        try:
+            inputs = self.parse_inputs(self.read_inputs())
+            error = validate_loan(inputs['loan_seeking'], inputs['down_payment'],
+                                  inputs['interest_rate'], inputs['principal_payment'],
+                                  inputs['extra_payment'], inputs['monthly_fee'])
+            if error:
+                raise ValueError(error)
+            new_rate = self.get_float_value(self.refinance_rate_var.get())
+            if not 0 < new_rate < 100:
+                raise ValueError("New interest rate must be between 0 and 100")
+            switching_cost = self.get_float_value(self.refinance_cost_var.get())
+            if switching_cost < 0:
+                raise ValueError("Switching cost cannot be negative")
+            balance = inputs['loan_seeking'] - inputs['down_payment']
+            new_principal = inputs['principal_payment']
+            if self.refinance_term_var.get().strip():
+                term = self.get_float_value(self.refinance_term_var.get())
+                if term <= 0:
+                    raise ValueError("Term must be greater than 0 years")
+                new_principal = float(term_principal(balance, term))
+            results = refinance_batch(balance, inputs['interest_rate'],
+                                      inputs['principal_payment'], inputs['extra_payment'],
+                                      inputs['monthly_fee'], new_rate, new_principal,
+                                      inputs['monthly_fee'], switching_cost,
+                                      inputs['extra_start_month'])
+        except ValueError as e:
+            messagebox.showerror("Error", str(e))
+            return
+
+        month = int(results['break_even_month'])
+        if month == NEVER:
+            self.refinance_status_var.set("Switching does not pay off")
+        else:
+            self.refinance_status_var.set(
+                f"Breaks even in {format_months(month)}; saves "
+                f"{self.currency_var.get()}{float(results['net_savings']):,.0f} over the loan")
+
+    # STEP 16: Main Function
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if '--diagnostics' in argv:
+        # Record timings and show them in a Diagnostics panel
+        argv = [arg for arg in argv if arg != '--diagnostics']
+        metrics.enable()
+    if '--batch' in argv:
+        # Headless batch mode, no window is opened
+        import mortgage_batch
+        return mortgage_batch.main(argv)
+    if '--serve' in argv:
+        # Local HTTP/JSON service, no window is opened
+        import mortgage_server
+        return mortgage_server.main(argv)
 
-    # STEP 13: Main Function
-def main():
-    root = tk.Tk()
+    root = load_gui().Tk()
     app = MortgageCalculator(root)
+    # Load the calculation engine in the background once the window is up
+    root.after_idle(app.live_recalculator.warm_up, 'mortgage_engine')
     root.mainloop()
 
-# STEP 14: Entry Point
+# STEP 17: Entry Point
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
@@ -0,0 +1,460 @@
+# Memory-mapped columnar schedules for portfolio-scale runs.
+#
+# A schedule directory holds one .npy file per column. Row columns have one
+# entry per month of every loan, stored loan after loan: month, principal,
+# extra, interest, balance and total interest as int64 cents. Loan columns
+# have one entry per loan: its id, inputs, currency and the offset of its
+# first row. ColumnarScheduleWriter computes schedules in chunks of a fixed
+# number of rows and appends them to the files, so a whole book of 30 year
+# loans is written with a few megabytes of memory. ColumnarSchedules opens the
+# files memory-mapped: a loan's schedule or one month across all loans is a
+# slice of the files, and only the pages read are loaded.
+#
+# Usage:
+#     python mortgage_calculator_new.py --batch book.csv --out results.csv --schedules book/
+#     python mortgage_columnar.py book/ --csv schedules.csv --totals monthly.csv \
+#         --report-currency SEK --fx fx_rates.json
+import argparse
+import csv
+import json
+import os
+import struct
+import sys
+from collections.abc import Sequence
+
+import numpy as np
+
+from mortgage_money import schedule_columns, schedule_months, to_cents, to_rate_units
+from mortgage_schedule import PORTFOLIO_FIELDS, SchedulePdfWriter, ScheduleRow
+
+# STEP 1: Constants
+FORMAT_VERSION = 1
+META_FILE = 'schedules.json'  # Written last; its presence marks a complete directory
+# Row columns in cents, except 'month'
+ROW_COLUMNS = {
+    'month': np.int32, 'principal': np.int64, 'extra': np.int64, 'interest': np.int64,
+    'balance': np.int64, 'total_interest': np.int64,
+}
+# Loan columns; amounts in cents and rates in mortgage_money rate units.
+# 'offset' has one more entry than there are loans.
+LOAN_COLUMNS = {
+    'loan': np.int64, 'offset': np.int64, 'loan_amount': np.int64, 'interest_rate': np.int64,
+    'principal_payment': np.int64, 'extra_payment': np.int64, 'monthly_fee': np.int64,
+    'extra_start_month': np.int64, 'currency': np.int16,
+}
+DEFAULT_CHUNK_ROWS = 1 << 18  # Rows computed at a time, about 14 MB of columns
+# Each .npy header is padded to this size, so it can be rewritten in place
+# once the final length is known
+HEADER_BYTES = 128
+TOTAL_FIELDS = ['month', 'loans', 'principal', 'extra', 'interest', 'fee', 'payment',
+                'balance']
+
+
+# STEP 2: Column Files
+def _npy_header(dtype, length):
+    """A .npy (version 1.0) header of exactly HEADER_BYTES bytes"""
+    magic = np.lib.format.magic(1, 0)
+    header = repr({'descr': np.lib.format.dtype_to_descr(np.dtype(dtype)),
+                   'fortran_order': False, 'shape': (length,)})
+    padding = HEADER_BYTES - len(magic) - 2 - len(header) - 1
+    return magic + struct.pack('<H', HEADER_BYTES - len(magic) - 2) + (
+        header + ' ' * padding + '\n').encode('latin1')
+
+
+class _ColumnFile:
+    """A .npy file that arrays are appended to"""
+
+    def __init__(self, path, dtype):
+        self.dtype = np.dtype(dtype)
+        self.length = 0
+        self.file = open(path, 'wb')
+        self.file.write(_npy_header(self.dtype, 0))
+
+    def append(self, values):
+        values = np.ascontiguousarray(values, dtype=self.dtype)
+        self.file.write(values.data)
+        self.length += len(values)
+
+    def close(self):
+        self.file.seek(0)
+        self.file.write(_npy_header(self.dtype, self.length))
+        self.file.close()
+
+
+# STEP 3: Writing
+class ColumnarScheduleWriter:
+    """Append the schedules of batches of loans to a schedule directory
+
+    Use as a context manager, or call close() when done; the directory can
+    be read once it is closed.
+    """
+
+    def __init__(self, path, chunk_rows=DEFAULT_CHUNK_ROWS):
+        os.makedirs(path, exist_ok=True)
+        meta_path = os.path.join(path, META_FILE)
+        if os.path.exists(meta_path):
+            os.remove(meta_path)
+        self.path = path
+        self.chunk_rows = chunk_rows
+        self.currencies = []
+        self.rows = 0
+        self.columns = {name: _ColumnFile(os.path.join(path, f"{name}.npy"), dtype)
+                        for name, dtype in {**ROW_COLUMNS, **LOAN_COLUMNS}.items()}
+        self.columns['offset'].append([0])
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def append(self, loan_amount, interest_rate, principal_payment, extra_payment=0.0,
+               monthly_fee=0.0, extra_start_month=1, loan_ids=None, currency=""):
+        """Compute and append the schedules of a batch of loans
+
+        Arguments broadcast like calculate_batch(); currency is one code or
+        one per loan. loan_ids default to numbering the loans from 1 on.
+        Returns the number of rows appended.
+        """
+        from mortgage_engine import broadcast_inputs
+
+        loan_amount, interest_rate, principal_payment, extra_payment, monthly_fee, \
+            extra_start_month = (np.atleast_1d(column) for column in broadcast_inputs(
+                loan_amount, interest_rate, principal_payment, extra_payment,
+                monthly_fee, extra_start_month))
+        if np.any(principal_payment <= 0):
+            raise ValueError("Principal payment must be greater than 0")
+        count = len(loan_amount)
+        first = self.columns['loan'].length + 1
+        loans = {
+            'loan': np.arange(first, first + count) if loan_ids is None else loan_ids,
+            'loan_amount': to_cents(loan_amount),
+            'interest_rate': to_rate_units(interest_rate),
+            'principal_payment': to_cents(principal_payment),
+            'extra_payment': to_cents(extra_payment),
+            'monthly_fee': to_cents(monthly_fee),
+            'extra_start_month': extra_start_month.astype(np.int64),
+            'currency': self._currency_codes(currency, count),
+        }
+        months = schedule_months(loans['loan_amount'], loans['principal_payment'],
+                                 loans['extra_payment'], loans['extra_start_month'])
+
+        # Loans in groups of about chunk_rows rows, at least one loan each
+        ends = np.cumsum(months)
+        start = 0
+        while start < count:
+            end = max(start + 1, int(np.searchsorted(
+                ends, ends[start] - months[start] + self.chunk_rows, side='right')))
+            self._append_chunk({name: np.asarray(column)[start:end]
+                                for name, column in loans.items()})
+            start = end
+        return int(ends[-1]) if count else 0
+
+    def _currency_codes(self, currency, count):
+        """Indexes into self.currencies for one code or a list of codes"""
+        if isinstance(currency, str):
+            currency = [currency] * count
+        indexes = {code: index for index, code in enumerate(self.currencies)}
+        codes = []
+        for code in currency:
+            if code not in indexes:
+                indexes[code] = len(self.currencies)
+                self.currencies.append(code)
+            codes.append(indexes[code])
+        return np.array(codes, dtype=np.int16)
+
+    def _append_chunk(self, loans):
+        schedules = schedule_columns(loans['loan_amount'], loans['interest_rate'],
+                                     loans['principal_payment'], loans['extra_payment'],
+                                     loans['extra_start_month'])
+        for name in ROW_COLUMNS:
+            self.columns[name].append(schedules[name])
+        for name, column in loans.items():
+            self.columns[name].append(column)
+        self.columns['offset'].append(self.rows + np.cumsum(schedules['months']))
+        self.rows += int(schedules['months'].sum())
+
+    def close(self):
+        """Finish every column file and write the directory's description"""
+        if self.columns is None:
+            return
+        for column in self.columns.values():
+            column.close()
+        meta = {
+            'version': FORMAT_VERSION,
+            'loans': self.columns['loan'].length,
+            'rows': self.rows,
+            'currencies': self.currencies,
+            'row_columns': list(ROW_COLUMNS),
+            'loan_columns': list(LOAN_COLUMNS),
+        }
+        self.columns = None
+        with open(os.path.join(self.path, META_FILE), 'w', encoding='utf-8') as meta_file:
+            json.dump(meta, meta_file, indent=1)
+
+
+def write_schedules(path, loan_amount, interest_rate, principal_payment, extra_payment=0.0,
+                    monthly_fee=0.0, extra_start_month=1, loan_ids=None, currency="",
+                    chunk_rows=DEFAULT_CHUNK_ROWS):
+    """Write the schedules of a batch of loans to a new schedule directory
+
+    Returns the number of rows written.
+    """
+    with ColumnarScheduleWriter(path, chunk_rows) as writer:
+        return writer.append(loan_amount, interest_rate, principal_payment, extra_payment,
+                             monthly_fee, extra_start_month, loan_ids, currency)
+
+
+# STEP 4: Reading
+class ColumnarSchedule(Sequence):
+    """One loan's schedule as ScheduleRows, read from the mapped columns
+
+    Works wherever a list of ScheduleRows does, e.g. ScheduleTable.set_rows()
+    or SchedulePdfWriter.add_schedule(). cents() returns a column as a view.
+    """
+
+    def __init__(self, columns, start, stop, loan_amount, fee):
+        self.columns = columns
+        self.start = start
+        self.stop = stop
+        self.loan_amount = loan_amount
+        self.fee = fee
+
+    def __len__(self):
+        return self.stop - self.start
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._row(position) for position in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("schedule index out of range")
+        return self._row(index)
+
+    def __iter__(self):
+        rows = [self.cents(name).tolist() for name in ROW_COLUMNS]
+        for values in zip(*rows):
+            yield self._make_row(*values)
+
+    def cents(self, name):
+        """A row column of this loan, as a view of the mapped file"""
+        return self.columns[name][self.start:self.stop]
+
+    def _row(self, index):
+        position = self.start + index
+        return self._make_row(*(int(self.columns[name][position]) for name in ROW_COLUMNS))
+
+    def _make_row(self, month, principal, extra, interest, balance, total_interest):
+        fee = self.fee
+        # Everything paid so far: the loan repaid, interest and fees
+        total_paid = self.loan_amount - balance + total_interest + fee * month
+        return ScheduleRow(month, (principal + extra + interest + fee) / 100,
+                           principal / 100, extra / 100, interest / 100, fee / 100,
+                           balance / 100, total_interest / 100, total_paid / 100)
+
+
+class ColumnarSchedules(Sequence):
+    """A schedule directory opened memory-mapped; one ColumnarSchedule per loan"""
+
+    def __init__(self, path):
+        meta_path = os.path.join(path, META_FILE)
+        if not os.path.exists(meta_path):
+            raise ValueError(f"{path} is not a complete schedule directory")
+        with open(meta_path, encoding='utf-8') as meta_file:
+            meta = json.load(meta_file)
+        if meta['version'] != FORMAT_VERSION:
+            raise ValueError(f"Unsupported schedule directory version: {meta['version']}")
+        self.path = path
+        self.rows = meta['rows']
+        self.currencies = meta['currencies']
+        self.columns = {name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode='r')
+                        for name in meta['row_columns'] + meta['loan_columns']}
+        self.offsets = self.columns['offset']
+
+    def __len__(self):
+        return len(self.columns['loan'])
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[position] for position in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("loan index out of range")
+        return ColumnarSchedule(self.columns, int(self.offsets[index]),
+                                int(self.offsets[index + 1]),
+                                int(self.columns['loan_amount'][index]),
+                                int(self.columns['monthly_fee'][index]))
+
+    def find(self, loan_id):
+        """Index of the loan with id loan_id"""
+        positions = np.flatnonzero(self.columns['loan'] == loan_id)
+        if not len(positions):
+            raise KeyError(loan_id)
+        return int(positions[0])
+
+    def currency(self, index):
+        """Currency code of the loan at index"""
+        return self.currencies[int(self.columns['currency'][index])]
+
+    def month(self, month):
+        """Row columns for one month of every loan still running then
+
+        Returns a dict of arrays with the row columns plus 'loan' (the ids)
+        and 'index' (the loan positions). Reads one row per loan.
+        """
+        months = np.diff(self.offsets)
+        index = np.flatnonzero(months >= month)
+        rows = self.offsets[index] + (month - 1)
+        result = {name: self.columns[name][rows] for name in ROW_COLUMNS}
+        result.update(loan=self.columns['loan'][index], index=index)
+        return result
+
+    def monthly_totals(self, chunk_rows=DEFAULT_CHUNK_ROWS, fx=None, to_currency=None):
+        """Sum the portfolio by month, reading the files in chunks
+
+        Returns a dict of TOTAL_FIELDS arrays, amounts in cents and one entry
+        per month from month 1 to the longest schedule. With a
+        mortgage_fx.FXTable, every loan is converted into to_currency first;
+        otherwise loans in different currencies are added as they are.
+        """
+        months = np.diff(self.offsets)
+        length = int(months.max(initial=0))
+        factor = None
+        if fx is not None:
+            # One factor per currency, looked up for each loan by its code
+            factor = fx.factors(self.currencies, to_currency)[self.columns['currency']]
+        totals = {name: np.zeros(length, dtype=np.float64) for name in TOTAL_FIELDS}
+        totals['month'] = np.arange(1, length + 1)
+        # Every loan pays its fee in each of its months
+        fees = np.asarray(self.columns['monthly_fee'], dtype=np.float64)
+        totals['loans'] = np.bincount(months, minlength=length + 1)[::-1].cumsum()[::-1][1:]
+        totals['fee'] = np.bincount(months, weights=fees if factor is None else fees * factor,
+                                    minlength=length + 1)[::-1].cumsum()[::-1][1:]
+        for start in range(0, self.rows, chunk_rows):
+            stop = min(start + chunk_rows, self.rows)
+            month = self.columns['month'][start:stop] - 1
+            if factor is not None:
+                owner = np.searchsorted(self.offsets, np.arange(start, stop), side='right') - 1
+                row_factor = factor[owner]
+            for name in ('principal', 'extra', 'interest', 'balance'):
+                # float64 sums of cents are exact below 2**53
+                weights = self.columns[name][start:stop]
+                if factor is not None:
+                    weights = weights * row_factor
+                totals[name] += np.bincount(month, weights=weights, minlength=length)
+        for name in ('principal', 'extra', 'interest', 'fee', 'balance'):
+            totals[name] = np.round(totals[name]).astype(np.int64)
+        totals['payment'] = (totals['principal'] + totals['extra'] + totals['interest']
+                             + totals['fee'])
+        return totals
+
+
+# STEP 5: Export
+def write_columnar_csv(output, schedules, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """Write every schedule row with the columns of write_schedule_csv()
+
+    Rows are formatted in chunks straight from the mapped columns. Returns
+    the number of rows written.
+    """
+    if isinstance(output, str):
+        with open(output, 'w', newline='', encoding='utf-8') as output_file:
+            return write_columnar_csv(output_file, schedules, chunk_rows)
+
+    columns, offsets = schedules.columns, schedules.offsets
+    loan_ids, loan_amounts, fees = (np.asarray(columns[name]) for name in (
+        'loan', 'loan_amount', 'monthly_fee'))
+    output.write(','.join(PORTFOLIO_FIELDS) + '\r\n')
+    row_format = '%d,%d' + ',%d.%02d' * 8 + '\r\n'
+    for start in range(0, schedules.rows, chunk_rows):
+        stop = min(start + chunk_rows, schedules.rows)
+        owner = np.searchsorted(offsets, np.arange(start, stop), side='right') - 1
+        principal, extra, interest, balance, total_interest = (
+            np.asarray(columns[name][start:stop]) for name in (
+                'principal', 'extra', 'interest', 'balance', 'total_interest'))
+        month = np.asarray(columns['month'][start:stop], dtype=np.int64)
+        fee = fees[owner]
+        payment = principal + extra + interest + fee
+        total_paid = loan_amounts[owner] - balance + total_interest + fee * month
+        amounts = [payment, principal, extra, interest, fee, balance, total_interest,
+                   total_paid]
+        table = np.column_stack([loan_ids[owner], month]
+                                + [part for amount in amounts
+                                   for part in np.divmod(amount, 100)])
+        output.write(''.join([row_format % row for row in map(tuple, table.tolist())]))
+    return schedules.rows
+
+
+def write_columnar_pdf(filename, schedules, title="Amortization Schedule", loans=None):
+    """Write schedules (all of them, or the positions in loans) to one PDF
+
+    Returns (pages, rows) written.
+    """
+    writer = SchedulePdfWriter(filename, title)
+    for index in (range(len(schedules)) if loans is None else loans):
+        writer.add_schedule(schedules[index], int(schedules.columns['loan'][index]),
+                            schedules.currency(index))
+    writer.save()
+    return writer.pages, writer.rows
+
+
+def write_totals_csv(output, totals):
+    """Write monthly_totals() with amounts in major units"""
+    if isinstance(output, str):
+        with open(output, 'w', newline='', encoding='utf-8') as output_file:
+            return write_totals_csv(output_file, totals)
+    writer = csv.writer(output)
+    writer.writerow(TOTAL_FIELDS)
+    columns = [totals[name].tolist() for name in TOTAL_FIELDS]
+    for month, loans, *amounts in zip(*columns):
+        writer.writerow([month, loans] + [f"{amount / 100:.2f}" for amount in amounts])
+
+
+# STEP 6: Command Line Interface
+def main(argv=None):
+    """Export or summarize a schedule directory"""
+    parser = argparse.ArgumentParser(description="Export or summarize columnar schedules")
+    parser.add_argument('schedules', help="Schedule directory, e.g. from --batch --schedules")
+    parser.add_argument('--csv', help="Write every schedule row to this CSV file")
+    parser.add_argument('--pdf', help="Write schedules to this PDF file")
+    parser.add_argument('--loans', help="Loan ids to put in the PDF, e.g. 2,15,40")
+    parser.add_argument('--totals', help="Write the portfolio's monthly totals to this CSV file")
+    parser.add_argument('--report-currency', metavar='CODE',
+                        help="Convert the monthly totals into this currency, e.g. SEK")
+    parser.add_argument('--fx', metavar='JSON',
+                        help="FX rate file for --report-currency (default: fx_rates.json)")
+    args = parser.parse_args(argv)
+
+    try:
+        schedules = ColumnarSchedules(args.schedules)
+        loans = None
+        if args.loans:
+            loans = [schedules.find(int(loan_id)) for loan_id in args.loans.split(',')]
+        fx = None
+        if args.report_currency:
+            from mortgage_fx import DEFAULT_FX_PATH, load_fx_table
+            fx = load_fx_table(args.fx or DEFAULT_FX_PATH)
+            fx.factors(schedules.currencies, args.report_currency)
+        elif args.totals and len(schedules.currencies) > 1:
+            raise ValueError("The loans are in several currencies; "
+                             "give --report-currency to total them")
+    except (ValueError, KeyError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    print(f"{len(schedules):,} loans, {schedules.rows:,} schedule rows")
+    if args.csv:
+        write_columnar_csv(args.csv, schedules)
+        print(f"Wrote {args.csv}")
+    if args.pdf:
+        pages, rows = write_columnar_pdf(args.pdf, schedules, loans=loans)
+        print(f"Wrote {args.pdf} ({pages:,} pages, {rows:,} rows)")
+    if args.totals:
+        write_totals_csv(args.totals, schedules.monthly_totals(
+            fx=fx, to_currency=args.report_currency))
+        print(f"Wrote {args.totals}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
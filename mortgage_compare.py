@@ -0,0 +1,271 @@
+# Side-by-side comparison of mortgage offers.
+#
+# Each offer is a full set of Step 2 inputs, typically one per bank. Every
+# offer goes through the calculation engine in one broadcast call and is
+# ranked by monthly cost, total interest, total cost and payoff time, so
+# comparing hundreds of offers takes milliseconds. The ranked comparison is
+# exported as one CSV or PDF.
+#
+# Usage:
+#     python mortgage_compare.py offers.csv --rank-by interest_paid --out comparison.pdf
+import argparse
+import csv
+import sys
+
+import numpy as np
+
+from mortgage_engine import calculate_batch, validate_batch
+from mortgage_inputs import format_months
+
+# STEP 1: Constants
+# Values offers can be ranked by, lowest first, with their captions
+RANKINGS = {
+    'monthly_payment': "Monthly cost",
+    'interest_paid': "Total interest",
+    'total_cost': "Total cost",
+    'payoff_months': "Payoff time",
+}
+DEFAULT_RANKING = 'total_cost'
+
+OFFER_FIELDS = [
+    'loan_seeking', 'down_payment', 'interest_rate', 'principal_payment',
+    'extra_payment', 'monthly_fee', 'extra_start_month',
+]
+COMPARISON_FIELDS = [
+    'rank', 'name', 'currency', 'loan_amount', 'interest_rate', 'principal_payment',
+    'extra_payment', 'monthly_fee', 'extra_start_month', 'monthly_payment',
+    'interest_paid', 'total_cost', 'payoff_months', 'loan_payoff',
+] + [f'rank_{name}' for name in RANKINGS]
+# Written with two decimals in the CSV
+AMOUNT_FIELDS = {'loan_amount', 'principal_payment', 'extra_payment', 'monthly_fee',
+                 'monthly_payment', 'interest_paid', 'total_cost'}
+
+
+# STEP 2: Comparison
+def offer_name(offer, position):
+    """Display name of an offer, e.g. its bank, or 'Offer 3'"""
+    return (offer.get('name') or '').strip() or f"Offer {position + 1}"
+
+
+def rank_values(values):
+    """Rank of each value, lowest first; equal values share the best rank"""
+    ordered = np.sort(values)
+    return np.searchsorted(ordered, values, side='left') + 1
+
+
+def compare_offers(offers):
+    """Price and rank offers side by side
+
+    offers are dicts of Step 2 inputs as parse_inputs() returns them, with an
+    optional 'name'. Returns a dict with the offer 'names' and 'currency', the
+    engine results and 'total_cost' as arrays in the order given, and a
+    'rank_<name>' array (1 is best) for each name in RANKINGS.
+    """
+    if not offers:
+        raise ValueError("Add at least one offer to compare")
+    currencies = {offer['currency'] for offer in offers}
+    if len(currencies) > 1:
+        raise ValueError("Offers must all be in the same currency")
+
+    columns = {field: np.array([offer.get(field, 1 if field == 'extra_start_month' else 0.0)
+                                for offer in offers], dtype=np.float64)
+               for field in OFFER_FIELDS}
+    names = [offer_name(offer, position) for position, offer in enumerate(offers)]
+    errors = validate_batch(*(columns[field] for field in OFFER_FIELDS[:-1]))
+    for name, error in zip(names, errors.tolist()):
+        if error:
+            raise ValueError(f"{name}: {error}")
+
+    comparison = calculate_batch(columns['loan_seeking'] - columns['down_payment'],
+                                 columns['interest_rate'], columns['principal_payment'],
+                                 columns['extra_payment'], columns['monthly_fee'],
+                                 columns['extra_start_month'])
+    comparison.update(
+        names=names,
+        currency=currencies.pop(),
+        loan_seeking=columns['loan_seeking'],
+        down_payment=columns['down_payment'],
+        interest_rate=columns['interest_rate'],
+        extra_start_month=columns['extra_start_month'].astype(np.int64),
+        total_cost=(comparison['loan_amount'] + comparison['interest_paid']
+                    + comparison['monthly_fee'] * comparison['payoff_months']),
+    )
+    for name in RANKINGS:
+        comparison[f'rank_{name}'] = rank_values(comparison[name])
+    return comparison
+
+
+def ranked_order(comparison, rank_by=DEFAULT_RANKING):
+    """Offer positions from best to worst by rank_by, ties by total cost"""
+    if rank_by not in RANKINGS:
+        raise ValueError(f"Cannot rank by {rank_by}")
+    return np.lexsort((np.arange(len(comparison['names'])), comparison['total_cost'],
+                       comparison[rank_by]))
+
+
+def comparison_rows(comparison, rank_by=DEFAULT_RANKING):
+    """One dict of COMPARISON_FIELDS per offer, best first, plus the
+    offer's 'position' in the order compared"""
+    columns = {name: comparison[name].tolist() for name in COMPARISON_FIELDS
+               if isinstance(comparison.get(name), np.ndarray)}
+    rows = []
+    for rank, position in enumerate(ranked_order(comparison, rank_by).tolist(), start=1):
+        row = {name: column[position] for name, column in columns.items()}
+        row.update(rank=rank, position=position, name=comparison['names'][position],
+                   currency=comparison['currency'],
+                   loan_payoff=format_months(row['payoff_months']))
+        rows.append(row)
+    return rows
+
+
+# STEP 3: Offer Files
+def read_offers(input_file, decimal=None):
+    """Read offers from a CSV with the batch input columns plus an optional
+    'name' column
+
+    Returns (offers, errors): the valid offers as compare_offers() takes them,
+    and a dict mapping the spreadsheet row number of every rejected row to its
+    error message.
+    """
+    from mortgage_batch import NUMERIC_FIELDS, parse_columns
+
+    rows = list(csv.DictReader(input_file))
+    columns, errors = parse_columns(rows, decimal)
+    rule_errors = validate_batch(*(columns[field] for field in NUMERIC_FIELDS))
+    for position, error in enumerate(rule_errors.tolist()):
+        if error:
+            errors.setdefault(position, error)
+
+    lists = {field: columns[field].tolist()
+             for field in NUMERIC_FIELDS + ['extra_start_month']}
+    offers = []
+    for position, row in enumerate(rows):
+        if position in errors:
+            continue
+        offer = {field: column[position] for field, column in lists.items()}
+        offer.update(name=offer_name(row, position), currency=columns['currency'][position])
+        offers.append(offer)
+    # Row numbers count the header as row 1, like a spreadsheet
+    return offers, {position + 2: message for position, message in sorted(errors.items())}
+
+
+# STEP 4: Export
+def write_comparison_csv(output, comparison, rank_by=DEFAULT_RANKING):
+    """Write one row per offer, best first"""
+    if isinstance(output, str):
+        with open(output, 'w', newline='', encoding='utf-8') as output_file:
+            return write_comparison_csv(output_file, comparison, rank_by)
+
+    writer = csv.DictWriter(output, fieldnames=COMPARISON_FIELDS, extrasaction='ignore')
+    writer.writeheader()
+    for row in comparison_rows(comparison, rank_by):
+        writer.writerow({name: f"{value:.2f}" if name in AMOUNT_FIELDS else value
+                         for name, value in row.items()})
+
+
+def write_comparison_pdf(filename, comparison, rank_by=DEFAULT_RANKING, title=None,
+                         rows_per_page=40):
+    """Write the comparison as a ranked PDF table, repeating the header on
+    every page; the best value of each ranking is shown in bold
+
+    Returns the number of pages written.
+    """
+    from reportlab.lib.pagesizes import landscape, letter
+    from reportlab.pdfgen import canvas
+
+    pagesize = landscape(letter)
+    c = canvas.Canvas(filename, pagesize=pagesize, pageCompression=1)
+    width, height = pagesize
+    currency = comparison['currency']
+    title = title or f"Offer Comparison: ranked by {RANKINGS[rank_by].lower()}"
+    # (caption, right edge, row -> text, ranking shown in bold at rank 1)
+    columns = [
+        ("#", 70, lambda row: str(row['rank']), None),
+        ("Offer", 80, lambda row: row['name'][:24], None),
+        ("Loan", 260, lambda row: f"{currency}{row['loan_amount']:,.0f}", None),
+        ("Rate", 300, lambda row: f"{row['interest_rate']:g}%", None),
+        ("Principal", 360, lambda row: f"{row['principal_payment']:,.0f}", None),
+        ("Extra", 410, lambda row: f"{row['extra_payment']:,.0f}", None),
+        ("Fee", 450, lambda row: f"{row['monthly_fee']:,.0f}", None),
+        ("Monthly", 510, lambda row: f"{row['monthly_payment']:,.0f}", 'monthly_payment'),
+        ("Interest", 580, lambda row: f"{row['interest_paid']:,.0f}", 'interest_paid'),
+        ("Total cost", 650, lambda row: f"{row['total_cost']:,.0f}", 'total_cost'),
+        ("Payoff", width - 50, lambda row: row['loan_payoff'], 'payoff_months'),
+    ]
+    rows = comparison_rows(comparison, rank_by)
+    pages = 0
+
+    for start in range(0, len(rows), rows_per_page):
+        pages += 1
+        c.setFont("Helvetica-Bold", 14)
+        c.drawString(50, height - 50, title)
+        c.line(50, height - 58, width - 50, height - 58)
+        c.setFont("Helvetica", 8)
+        c.drawString(50, height - 72, f"{len(rows)} offers, amounts in {currency}")
+        c.drawRightString(width - 50, height - 72, f"Page {pages}")
+
+        y = height - 92
+        c.setFont("Helvetica-Bold", 8)
+        for caption, x, _, _ in columns:
+            if caption == "Offer":
+                c.drawString(x, y, caption)
+            else:
+                c.drawRightString(x, y, caption)
+        c.line(50, y - 4, width - 50, y - 4)
+
+        for row in rows[start:start + rows_per_page]:
+            y -= 12
+            for caption, x, text, ranking in columns:
+                bold = ranking is not None and row[f'rank_{ranking}'] == 1
+                c.setFont("Helvetica-Bold" if bold else "Helvetica", 8)
+                if caption == "Offer":
+                    c.drawString(x, y, text(row))
+                else:
+                    c.drawRightString(x, y, text(row))
+        c.showPage()
+
+    c.save()
+    return pages
+
+
+def render_comparison_pdf(comparison, filename, rank_by=DEFAULT_RANKING):
+    """write_comparison_pdf() as an ExportQueue render function"""
+    write_comparison_pdf(filename, comparison, rank_by)
+    return filename
+
+
+# STEP 5: Command Line Interface
+def main(argv=None):
+    """Compare the offers in a CSV file and export the ranking"""
+    from mortgage_batch import DECIMAL_SEPARATORS
+
+    parser = argparse.ArgumentParser(description="Compare mortgage offers side by side")
+    parser.add_argument('offers', help="CSV file with one offer per row")
+    parser.add_argument('--rank-by', choices=list(RANKINGS), default=DEFAULT_RANKING)
+    parser.add_argument('--decimal', choices=sorted(DECIMAL_SEPARATORS), default='auto',
+                        help="Decimal separator of the amounts")
+    parser.add_argument('--out', required=True, help="Output .csv or .pdf file")
+    args = parser.parse_args(argv)
+
+    with open(args.offers, newline='', encoding='utf-8-sig') as input_file:
+        offers, errors = read_offers(input_file, DECIMAL_SEPARATORS[args.decimal])
+    for row_number, message in errors.items():
+        print(f"Row {row_number}: {message}", file=sys.stderr)
+    try:
+        comparison = compare_offers(offers)
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+
+    if args.out.lower().endswith('.pdf'):
+        write_comparison_pdf(args.out, comparison, args.rank_by)
+    else:
+        write_comparison_csv(args.out, comparison, args.rank_by)
+    best = comparison_rows(comparison, args.rank_by)[0]
+    print(f"Compared {len(offers)} offers ({len(errors)} rejected); best by "
+          f"{RANKINGS[args.rank_by].lower()}: {best['name']}. Wrote {args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,269 @@
+# Headless amortization engine for the mortgage calculator.
+#
+# All of the math behind MortgageCalculator.calculate() lives here, written
+# against NumPy arrays so that one loan or a million loans go through the same
+# code path. Nothing in this module imports tkinter.
+import numpy as np
+
+from mortgage_inputs import AUTO_DOWN_PAYMENT_RATE, VALIDATION_RULES
+
+# STEP 1: Constants
+TERM_MONTHS = 360  # Fixed 30 year term used by the calculator
+
+
+# STEP 2: Input Handling
+def as_array(value):
+    """Convert a scalar or sequence of numbers to a float64 array"""
+    return np.asarray(value, dtype=np.float64)
+
+
+def broadcast_inputs(*values):
+    """Convert inputs to float64 arrays with a common shape"""
+    return np.broadcast_arrays(*[as_array(value) for value in values])
+
+
+def auto_down_payment(loan_seeking):
+    """Down payment used in the Auto (15%) down payment mode"""
+    return as_array(loan_seeking) * AUTO_DOWN_PAYMENT_RATE
+
+
+# STEP 3: Input Validation
+def validate_batch(loan_seeking, down_payment, interest_rate, principal_payment,
+                   extra_payment=0.0, monthly_fee=0.0):
+    """Check a batch of inputs against the Step 2 rules
+
+    Returns an array of error messages, with an empty string for every loan
+    that passed all rules.
+    """
+    names = ['loan_seeking', 'down_payment', 'interest_rate', 'principal_payment',
+             'extra_payment', 'monthly_fee']
+    values = dict(zip(names, broadcast_inputs(
+        loan_seeking, down_payment, interest_rate, principal_payment,
+        extra_payment, monthly_fee)))
+    conditions = [check(values) for _, check, _ in VALIDATION_RULES]
+    messages = [message for _, _, message in VALIDATION_RULES]
+    return np.select(conditions, messages, default='')
+
+
+# STEP 4: Closed-form Payoff Solvers
+def _ceil_months(months):
+    """Round a fractional month count up, ignoring float noise near integers"""
+    return np.ceil(months - 1e-9).astype(np.int64)
+
+
+def annuity_payment(loan_amount, interest_rate, term_months=TERM_MONTHS):
+    """Level monthly payment that repays the loan over term_months"""
+    loan_amount, interest_rate, term_months = broadcast_inputs(
+        loan_amount, interest_rate, term_months)
+    monthly_rate = interest_rate / 100 / 12
+    with np.errstate(divide='ignore', invalid='ignore'):
+        payment = (loan_amount * monthly_rate) / (1 - (1 + monthly_rate) ** -term_months)
+    return np.where(monthly_rate > 0, payment, loan_amount / term_months)
+
+
+def solve_fixed_principal(loan_amount, interest_rate, principal_payment):
+    """Solve a loan that repays a fixed amount of principal every month
+
+    The balance falls linearly, so the interest paid is an arithmetic series
+    and everything is O(1) per loan. Returns payoff_months, total_interest and
+    final_payment (the last, partial principal payment plus its interest).
+    """
+    loan_amount, interest_rate, principal_payment = broadcast_inputs(
+        loan_amount, interest_rate, principal_payment)
+    monthly_rate = interest_rate / 100 / 12
+
+    months = _ceil_months(loan_amount / principal_payment)
+    months = np.maximum(months, 0)
+
+    # sum of (loan - k * payment) * rate for k < months
+    total_interest = monthly_rate * (
+        months * loan_amount - principal_payment * months * (months - 1) / 2
+    )
+
+    last_principal = loan_amount - (months - 1) * principal_payment
+    final_payment = np.where(months > 0, last_principal * (1 + monthly_rate), 0.0)
+
+    return {
+        'payoff_months': months,
+        'total_interest': total_interest,
+        'final_payment': final_payment,
+    }
+
+
+def solve_annuity(loan_amount, interest_rate, monthly_payment):
+    """Solve a loan repaid with a level payment that includes interest
+
+    Uses the closed-form balance B(k) = L(1+r)^k - A((1+r)^k - 1) / r, so no
+    month-by-month stepping is needed. Loans whose payment does not cover the
+    first month's interest never pay off and get payoff_months of -1 and
+    infinite interest. Returns payoff_months, total_interest and final_payment.
+    """
+    loan_amount, interest_rate, monthly_payment = broadcast_inputs(
+        loan_amount, interest_rate, monthly_payment)
+    monthly_rate = interest_rate / 100 / 12
+    growth = 1 + monthly_rate
+    has_rate = monthly_rate > 0
+    pays_off = monthly_payment > loan_amount * monthly_rate
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        exact_months = np.where(
+            has_rate,
+            -np.log1p(-monthly_rate * loan_amount / monthly_payment) / np.log1p(monthly_rate),
+            loan_amount / monthly_payment,
+        )
+        months = np.where(pays_off, _ceil_months(np.where(pays_off, exact_months, 0)), -1)
+
+        # Balance left after months - 1 full payments
+        prior = np.maximum(months - 1, 0)
+        compounded = growth ** prior
+        annuity_factor = np.where(has_rate, (compounded - 1) / monthly_rate, prior)
+        remaining = loan_amount * compounded - monthly_payment * annuity_factor
+        final_payment = np.where(months > 0, remaining * growth, 0.0)
+
+    total_interest = np.where(
+        pays_off, prior * monthly_payment + final_payment - loan_amount, np.inf)
+    final_payment = np.where(pays_off, final_payment, np.nan)
+
+    return {
+        'payoff_months': months,
+        'total_interest': total_interest,
+        'final_payment': final_payment,
+    }
+
+
+# STEP 5: Batch Calculation
+ENGINE_INPUTS = ['loan_amount', 'interest_rate', 'principal_payment', 'extra_payment',
+                 'monthly_fee', 'extra_start_month']
+# Inputs each result depends on, so an edit only recomputes what it changes
+PAYOFF_INPUTS = {'loan_amount', 'interest_rate', 'principal_payment', 'extra_payment',
+                 'extra_start_month'}
+RESULT_DEPENDENCIES = {
+    'loan_amount': {'loan_amount'},
+    'principal_payment': {'principal_payment'},
+    'extra_payment': {'extra_payment'},
+    'monthly_fee': {'monthly_fee'},
+    'total_principal': {'principal_payment', 'extra_payment'},
+    'monthly_interest': {'loan_amount', 'interest_rate'},
+    'monthly_payment': {'loan_amount', 'interest_rate', 'principal_payment',
+                        'extra_payment', 'monthly_fee'},
+    'base_monthly': {'loan_amount', 'interest_rate'},
+    'total_interest': {'loan_amount', 'interest_rate'},
+    'base_months': {'loan_amount', 'principal_payment'},
+    'payoff_months': PAYOFF_INPUTS,
+    'final_payment': PAYOFF_INPUTS,
+    'time_saved_months': PAYOFF_INPUTS,
+    'interest_saved': PAYOFF_INPUTS,
+    'interest_paid': PAYOFF_INPUTS,
+}
+
+
+def calculate_batch(loan_amount, interest_rate, principal_payment,
+                    extra_payment=0.0, monthly_fee=0.0, extra_start_month=1):
+    """Calculate every result shown by the calculator for a batch of loans
+
+    All arguments accept scalars or array-likes and are broadcast together.
+    Interest rates are yearly percentages (4.5 means 4.5%). Extra payments
+    are made from extra_start_month on (1 is the first month). Returns a dict
+    of NumPy arrays keyed by result name.
+    """
+    loan_amount, interest_rate, principal_payment, extra_payment, monthly_fee, \
+        extra_start_month = broadcast_inputs(loan_amount, interest_rate, principal_payment,
+                                             extra_payment, monthly_fee, extra_start_month)
+
+    if np.any(principal_payment <= 0):
+        raise ValueError("Principal payment must be greater than 0")
+
+    # Calculate monthly rate and base annuity payment
+    monthly_rate = interest_rate / 100 / 12
+    base_monthly = annuity_payment(loan_amount, interest_rate)
+
+    # Interest on the full loan amount for the first month
+    monthly_interest = loan_amount * monthly_rate
+
+    # Total monthly payment (principal, extra payment, interest and fees)
+    monthly_payment = principal_payment + extra_payment + monthly_interest + monthly_fee
+
+    # Total interest over the full annuity term
+    total_interest = (base_monthly * TERM_MONTHS) - loan_amount
+
+    # Base payoff time without extra payments
+    total_principal = principal_payment + extra_payment
+    base = solve_fixed_principal(loan_amount, interest_rate, principal_payment)
+    base_months = base['payoff_months']
+
+    # Months paid with principal only before extra payments start, then the
+    # rest of the loan from the same solver, so both scenarios count the final
+    # partial month the same way
+    prefix = np.clip(extra_start_month - 1, 0, base_months).astype(np.int64)
+    prefix_interest = monthly_rate * (
+        prefix * loan_amount - principal_payment * prefix * (prefix - 1) / 2)
+    with_extra = solve_fixed_principal(loan_amount - prefix * principal_payment,
+                                       interest_rate, total_principal)
+    has_extra = (extra_payment > 0) & (with_extra['payoff_months'] > 0)
+    months_with_extra = np.where(has_extra, prefix + with_extra['payoff_months'], base_months)
+
+    time_saved = np.where(has_extra, base_months - months_with_extra, 0)
+    interest_saved = np.where(
+        has_extra, total_interest - (prefix_interest + with_extra['total_interest']), 0.0)
+
+    # Interest actually paid on the fixed principal (and extra) payments
+    interest_paid = np.where(has_extra, prefix_interest + with_extra['total_interest'],
+                             base['total_interest'])
+
+    return {
+        'loan_amount': loan_amount,
+        'principal_payment': principal_payment,
+        'extra_payment': extra_payment,
+        'monthly_fee': monthly_fee,
+        'total_principal': total_principal,
+        'monthly_interest': monthly_interest,
+        'monthly_payment': monthly_payment,
+        'base_monthly': base_monthly,
+        'total_interest': total_interest,
+        'base_months': base_months,
+        'payoff_months': months_with_extra,
+        'final_payment': np.where(has_extra, with_extra['final_payment'], base['final_payment']),
+        'time_saved_months': time_saved.astype(np.int64),
+        'interest_saved': interest_saved,
+        'interest_paid': interest_paid,
+    }
+
+
+def calculate_loan(loan_amount, interest_rate, principal_payment,
+                   extra_payment=0.0, monthly_fee=0.0, extra_start_month=1):
+    """Calculate a single loan and return plain Python numbers"""
+    results = calculate_batch(loan_amount, interest_rate, principal_payment,
+                              extra_payment, monthly_fee, extra_start_month)
+    return {key: value.item() for key, value in results.items()}
+
+
+# STEP 6: Incremental Recalculation
+def stale_results(previous_inputs, inputs):
+    """Names of the results an edit from previous_inputs to inputs changes
+
+    Both arguments are dicts keyed by ENGINE_INPUTS names.
+    """
+    changed = {name for name in ENGINE_INPUTS
+               if inputs.get(name) != previous_inputs.get(name)}
+    return {name for name, depends_on in RESULT_DEPENDENCIES.items() if depends_on & changed}
+
+
+def update_loan(previous_inputs, previous_results, loan_amount, interest_rate,
+                principal_payment, extra_payment=0.0, monthly_fee=0.0, extra_start_month=1):
+    """calculate_loan() for inputs that differ from an earlier calculation
+
+    previous_results is what calculate_loan() returned for previous_inputs.
+    Unchanged inputs return previous_results itself, and a fee edit only
+    updates the fee and the monthly payment without solving the loan again.
+    """
+    inputs = dict(zip(ENGINE_INPUTS, (loan_amount, interest_rate, principal_payment,
+                                      extra_payment, monthly_fee, extra_start_month)))
+    stale = stale_results(previous_inputs, inputs)
+    if not stale:
+        return previous_results
+    if stale <= {'monthly_fee', 'monthly_payment'}:
+        # Same operations, in the same order, as calculate_batch()
+        return dict(previous_results, monthly_fee=float(monthly_fee), monthly_payment=(
+            principal_payment + extra_payment + previous_results['monthly_interest']
+            + monthly_fee))
+    return calculate_loan(**inputs)
@@ -0,0 +1,464 @@
+# Irregular prepayments and payment changes, priced from dated events.
+#
+# A loan's events are (month, kind, amount) tuples:
+#
+#     lump_sum    a one-off amount paid on top of that month's payments
+#     principal   the monthly principal payment from that month on; 0 pauses
+#                 repayment (the interest is still paid)
+#     extra       the monthly extra payment from that month on
+#     rate        the yearly interest rate, in percent, from that month on
+#
+# Between two events the payments are the same every month, so the opening
+# balance falls linearly and the stretch is one closed-form segment however
+# long it is; a lump sum is a one-month segment whose extra payment includes
+# it. Interest accrues exactly at each segment's rate and every month charges
+# the whole cents accrued so far, as in mortgage_money, so a loan without
+# events has the same rows as schedule_rows(). Where the segments start only
+# depends on the event months, so a batch lays out the segments of all its
+# loans at once: each opens with the loan less a running sum of the payments
+# before it, and the interest is summed per loan, without a Python loop over
+# the loans, months or events.
+#
+# Usage:
+#     python mortgage_events.py book.csv --events events.csv --out results.csv
+import argparse
+import bisect
+import csv
+import sys
+from collections import namedtuple
+from collections.abc import Sequence
+
+import numpy as np
+
+from mortgage_engine import broadcast_inputs
+from mortgage_money import INTEREST_DIVISOR, from_cents, interest_on, to_cents, to_rate_units
+from mortgage_schedule import ScheduleRow
+
+# STEP 1: Constants
+EVENT_KINDS = ['lump_sum', 'principal', 'extra', 'rate']
+LUMP_SUM, PRINCIPAL, EXTRA, RATE = range(len(EVENT_KINDS))  # Event codes
+# Loans still owing after this many months count as never repaid
+MAX_MONTHS = 12 * 1000
+
+# Columns of the events CSV; loan is the portfolio's CSV row number, as in
+# the batch results
+EVENT_FIELDS = ['loan', 'month', 'event', 'amount']
+RESULT_FIELDS = ['row', 'events', 'payoff_months', 'total_interest', 'lump_sums',
+                 'interest_saved', 'time_saved_months', 'error']
+
+EventTable = namedtuple('EventTable', ['loan', 'month', 'kind', 'amount'])
+
+
+# STEP 2: Events
+def _kind_code(kind):
+    try:
+        return EVENT_KINDS.index(kind)
+    except ValueError:
+        raise ValueError(f"Unknown event: {kind}") from None
+
+
+def event_table(event_lists):
+    """EventTable of flat arrays from one list of (month, kind, amount) per loan"""
+    loans, months, kinds, amounts = [], [], [], []
+    for index, events in enumerate(event_lists):
+        for month, kind, amount in events:
+            loans.append(index)
+            months.append(month)
+            kinds.append(kind)
+            amounts.append(amount)
+    return EventTable(np.array(loans, dtype=np.int64), np.array(months, dtype=np.int64),
+                      np.array(kinds, dtype=object), np.array(amounts, dtype=np.float64))
+
+
+def _event_units(months, kinds, amounts):
+    """Check events and convert them to (month, kind code, cents or rate units)"""
+    months = np.asarray(months, dtype=np.int64)
+    kinds = np.asarray(kinds)
+    if kinds.dtype.kind in 'iu' or not kinds.size:
+        codes = kinds.astype(np.int64)
+        if np.any((codes < LUMP_SUM) | (codes > RATE)):
+            raise ValueError("Unknown event code")
+    else:
+        codes = np.full(kinds.shape, -1, dtype=np.int64)
+        for code, kind in enumerate(EVENT_KINDS):
+            codes[kinds == kind] = code
+        if np.any(codes < 0):
+            _kind_code(kinds[codes < 0][0])
+    amounts = np.asarray(amounts, dtype=np.float64)
+    if np.any(months < 1):
+        raise ValueError("Event months must be 1 or later")
+    if np.any(amounts < 0) or not np.all(np.isfinite(amounts)):
+        raise ValueError("Event amounts must be 0 or greater")
+    units = np.where(codes == RATE, to_rate_units(amounts), to_cents(amounts))
+    return months, codes, units
+
+
+# STEP 3: One Loan
+def event_segments(loan, rate, principal, extra, events):
+    """Segments of one loan in cents and rate units, from month 1 on
+
+    events are (month, kind code, cents or rate units), sorted by month.
+    Returns (segments, last month), each segment being (first month, opening
+    balance, rate-weighted balance-months accrued before it, principal,
+    extra including any lump sum, rate). Raises ValueError if the payments
+    stop before the loan is repaid.
+    """
+    segments = []
+    month, balance, accrued = 1, loan, 0
+    position = 0
+    while balance > 0:
+        lump = 0
+        while position < len(events) and events[position][0] <= month:
+            _, kind, amount = events[position]
+            if kind == LUMP_SUM:
+                lump += amount
+            elif kind == PRINCIPAL:
+                principal = amount
+            elif kind == EXTRA:
+                extra = amount
+            elif kind == RATE:
+                rate = amount
+            position += 1
+        step = principal + extra + lump
+        length = None
+        if lump:
+            length = 1
+        elif position < len(events):
+            length = events[position][0] - month
+        if step > 0:
+            payoff = -(-balance // step)
+            length = payoff if length is None else min(length, payoff)
+        if length is None or month + length - 1 > MAX_MONTHS:
+            raise ValueError(f"Payments stop in month {month}, before the loan is repaid")
+        segments.append((month, balance, accrued, principal, extra + lump, rate))
+        accrued += rate * (length * balance - step * length * (length - 1) // 2)
+        balance = max(balance - length * step, 0)
+        month += length
+    return segments, month - 1
+
+
+class EventSchedule(Sequence):
+    """One loan's schedule under events, as a read-only sequence of ScheduleRows
+
+    Like mortgage_schedule.Schedule, any row is built in O(1) from the
+    segment it falls in.
+    """
+
+    def __init__(self, loan, fee, segments, months):
+        """loan and fee are in cents, segments as event_segments() returns them"""
+        self.loan = loan
+        self.fee = fee
+        self.segments = segments
+        self.months = months
+        self.starts = [segment[0] for segment in segments]
+
+    def __len__(self):
+        return self.months
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._row(position) for position in range(*index.indices(self.months))]
+        if index < 0:
+            index += self.months
+        if not 0 <= index < self.months:
+            raise IndexError("schedule index out of range")
+        return self._row(index)
+
+    def __iter__(self):
+        for index in range(self.months):
+            yield self._row(index)
+
+    def _row(self, index):
+        """Build the row for 0-based month index"""
+        month = index + 1
+        start, opening, accrued, principal_payment, extra_payment, rate = \
+            self.segments[bisect.bisect_right(self.starts, month) - 1]
+        elapsed = month - start
+        step = principal_payment + extra_payment
+        accrued += rate * (elapsed * opening - step * elapsed * (elapsed - 1) // 2)
+        opening -= elapsed * step
+        charged_before = interest_on(accrued, 1)
+        charged = interest_on(accrued + rate * opening, 1)
+        principal = min(principal_payment, opening)
+        extra = min(extra_payment, opening - principal)
+        balance = opening - principal - extra
+        fee = self.fee
+        return ScheduleRow(month, (principal + extra + charged - charged_before + fee) / 100,
+                           principal / 100, extra / 100, (charged - charged_before) / 100,
+                           fee / 100, balance / 100, charged / 100,
+                           (self.loan - balance + charged + fee * month) / 100)
+
+
+def event_schedule(loan_amount, interest_rate, principal_payment, extra_payment=0.0,
+                   monthly_fee=0.0, events=()):
+    """Build the EventSchedule of one loan
+
+    events are (month, kind, amount) tuples with kinds from EVENT_KINDS,
+    amounts in major units and rates in percent. Events in the same month
+    apply in the order given.
+    """
+    loan, principal, extra, fee = (int(to_cents(amount)) for amount in (
+        loan_amount, principal_payment, extra_payment, monthly_fee))
+    if events:
+        months, codes, units = _event_units(*zip(*events))
+        order = np.argsort(months, kind='stable')
+        events = list(zip(months[order].tolist(), codes[order].tolist(), units[order].tolist()))
+    segments, months = event_segments(loan, int(to_rate_units(interest_rate)), principal,
+                                      extra, events)
+    return EventSchedule(loan, fee, segments, months)
+
+
+# STEP 4: Batches
+def _without_events(loan, rate, principal, extra, extra_start_month):
+    """Payoff months and total interest in cents of loans without events,
+    with extra payments from extra_start_month on"""
+    step = np.maximum(principal + extra, 1)
+    prefix = np.minimum(np.maximum(extra_start_month - 1, 0),
+                        -(-loan // np.maximum(principal, 1)))
+    rest = np.maximum(loan - prefix * principal, 0)
+    later = -(-rest // step)
+    balance_months = (prefix * loan - principal * (prefix * (prefix - 1) // 2)
+                      + later * rest - step * (later * (later - 1) // 2))
+    return prefix + later, interest_on(balance_months, rate)
+
+
+def price_events(loan_amount, interest_rate, principal_payment, extra_payment=0.0,
+                 monthly_fee=0.0, events=None, extra_start_month=1):
+    """Price a batch of loans, each with its own events
+
+    events is an EventTable (see event_table()) whose loan column holds the
+    position of each event's loan in the batch. Extra payments are made from
+    extra_start_month on, unless an event changes them. Returns a dict of arrays:
+    'repaid' (false where the payments stop before the loan is repaid, whose
+    amounts are then NaN), 'payoff_months', 'total_interest', 'lump_sums'
+    (as far as they were needed), 'total_paid', and 'interest_saved' and
+    'time_saved_months' against the same loan without events.
+    """
+    loan_amount, interest_rate, principal_payment, extra_payment, monthly_fee, \
+        extra_start_month = broadcast_inputs(loan_amount, interest_rate, principal_payment,
+                                             extra_payment, monthly_fee, extra_start_month)
+    loan = np.atleast_1d(to_cents(loan_amount))
+    rate = np.atleast_1d(to_rate_units(interest_rate))
+    principal = np.atleast_1d(to_cents(principal_payment))
+    extra = np.atleast_1d(to_cents(extra_payment))
+    fee = np.atleast_1d(to_cents(monthly_fee))
+    start_month = np.atleast_1d(extra_start_month).astype(np.int64)
+    count = len(loan)
+    if events is None:
+        events = EventTable((), (), (), ())
+    owner = np.asarray(events.loan, dtype=np.int64)
+    if len({len(column) for column in events}) > 1:
+        raise ValueError("Every event column must have the same length")
+    if np.any((owner < 0) | (owner >= count)):
+        raise ValueError("Event for a loan outside the batch")
+    months, codes, units = _event_units(events.month, events.kind, events.amount)
+    # A later start for the extra payments is an extra event ahead of the
+    # loan's own, so those still win in the same month
+    plain_extra = extra
+    delayed = np.flatnonzero((start_month > 1) & (extra > 0))
+    if len(delayed):
+        owner = np.concatenate([delayed, owner])
+        months = np.concatenate([start_month[delayed], months])
+        codes = np.concatenate([np.full(len(delayed), EXTRA), codes])
+        units = np.concatenate([extra[delayed], units])
+        extra = extra.copy()
+        extra[delayed] = 0
+
+    # STEP 4a: Segments. Each loan's segments start in month 1, in every
+    # month with an event and in the month after each lump sum; months past
+    # MAX_MONTHS all count as MAX_MONTHS + 1, which no repaid loan reaches
+    width = MAX_MONTHS + 3
+    keys = owner * width + np.minimum(months, MAX_MONTHS + 1)
+    if np.any(keys[1:] < keys[:-1]):
+        # By loan and month, keeping the given order within a month
+        order = np.argsort(keys, kind='stable')
+        keys, codes, units = keys[order], codes[order], units[order]
+    lumps = codes == LUMP_SUM
+    loans = np.arange(count)
+    # Three sorted runs, which a stable (merge) sort joins in linear time
+    bounds = np.sort(np.concatenate([loans * width + 1, keys, keys[lumps] + 1]), kind='stable')
+    bounds = bounds[np.diff(bounds, prepend=-1) != 0]
+    first = np.searchsorted(bounds, loans * width + 1)  # Each loan's first segment
+    segment_loan = np.repeat(loans, np.diff(first, append=len(bounds)))
+    start = bounds - segment_loan * width
+    segment = np.searchsorted(bounds, keys)  # Segment each event starts
+    # A segment runs until the next one of its loan, the last one past MAX_MONTHS
+    last = np.diff(segment_loan, append=count) != 0
+    length = np.where(last, MAX_MONTHS + 2, np.append(start[1:], 0)) - start
+
+    # STEP 4b: Payments and rate in force in each segment: the loan's own
+    # terms at its first segment and each event's amount from its segment on
+    # (the last one in a month wins). Placing the change from one setting to
+    # the next at each segment, a running sum gives every segment's value
+    terms = {}
+    for code, initial in ((PRINCIPAL, principal), (EXTRA, extra), (RATE, rate)):
+        changed = segment[codes == code]
+        where = np.concatenate([first, changed])
+        order = np.argsort(where, kind='stable')
+        where = where[order]
+        values = np.concatenate([initial, units[codes == code]])[order]
+        final = np.diff(where, append=-1) != 0
+        changes = np.zeros(len(bounds), dtype=np.int64)
+        changes[where[final]] = np.diff(values[final], prepend=0)
+        terms[code] = np.cumsum(changes)
+    lump = np.zeros(len(bounds), dtype=np.int64)
+    np.add.at(lump, segment[lumps], units[lumps])
+    regular = terms[PRINCIPAL] + terms[EXTRA]
+    step = regular + lump
+
+    # STEP 4c: Opening balances: the loan less everything paid in the loan's
+    # earlier segments. The running sum may wrap around in int64, but the
+    # difference of two of its values is still exact
+    owed = loan[segment_loan]
+    paid = np.minimum(step * length, owed)
+    paid_before = np.cumsum(paid) - paid
+    opening = owed - (paid_before - paid_before[first][segment_loan])
+    active = opening > 0
+    opening = np.maximum(opening, 0)
+    length = np.where(step > 0, np.minimum(length, -(-opening // np.maximum(step, 1))),
+                      length)
+    length[~active] = 0
+
+    # STEP 4d: Interest per loan. Each segment's rate-weighted balance-months
+    # are split by INTEREST_DIVISOR into whole cents and a remainder, so the
+    # sums stay exact in int64
+    balance_months = length * opening - step * (length * (length - 1) // 2)
+    quotient, remainder = np.divmod(balance_months, INTEREST_DIVISOR)
+    whole = np.add.reduceat(terms[RATE] * quotient, first)
+    rest = np.add.reduceat(terms[RATE] * remainder, first)
+    total_interest = whole + (2 * rest + INTEREST_DIVISOR) // (2 * INTEREST_DIVISOR)
+    lump_sums = np.add.reduceat(np.minimum(lump, np.maximum(opening - regular, 0)), first)
+
+    # A loan is repaid in the segment whose payments reach the balance
+    closing = opening - length * step
+    ends = active & (closing <= 0)
+    payoff_months = np.zeros(count, dtype=np.int64)
+    payoff_months[segment_loan[ends]] = (start + length - 1)[ends]
+    repaid = loan <= 0
+    repaid[segment_loan[ends]] = True
+    repaid &= payoff_months <= MAX_MONTHS
+
+    # STEP 4e: Totals, and the same loans without events to compare with
+    payoff_months[~repaid] = 0
+    plain_months, plain_interest = _without_events(loan, rate, principal, plain_extra,
+                                                   start_month)
+    missing = np.where(repaid, 1.0, np.nan)
+    return {
+        'repaid': repaid,
+        'payoff_months': payoff_months,
+        'total_interest': from_cents(total_interest) * missing,
+        'lump_sums': from_cents(lump_sums) * missing,
+        'total_paid': from_cents(loan + total_interest + fee * payoff_months) * missing,
+        'interest_saved': from_cents(plain_interest - total_interest) * missing,
+        'time_saved_months': np.where(repaid, plain_months - payoff_months, 0),
+    }
+
+
+# STEP 5: Command Line
+def read_events(path, rows, decimal=None):
+    """Read an events CSV into an EventTable, given the portfolio's CSV row
+    numbers; returns (EventTable, errors by portfolio position)"""
+    from mortgage_inputs import parse_amount
+
+    positions = {row: position for position, row in enumerate(rows)}
+    table = ([], [], [], [])
+    errors = {}
+    with open(path, newline='', encoding='utf-8-sig') as events_file:
+        reader = csv.DictReader(events_file)
+        missing = [field for field in EVENT_FIELDS if field not in (reader.fieldnames or [])]
+        if missing:
+            raise ValueError(f"{path} is missing the columns: {', '.join(missing)}")
+        for line, event in enumerate(reader, start=2):
+            try:
+                loan = int(event['loan'] or '')
+                month = int(event['month'] or '')
+            except ValueError:
+                raise ValueError(f"{path} line {line}: loan and month must be whole numbers") \
+                    from None
+            try:
+                kind = (event['event'] or '').strip().lower()
+                _kind_code(kind)
+                amount = parse_amount((event['amount'] or '').strip(), decimal)
+            except ValueError as e:
+                raise ValueError(f"{path} line {line}: {e}") from None
+            if loan not in positions:
+                raise ValueError(f"{path} line {line}: no loan in row {loan}")
+            if month < 1 or amount < 0:
+                errors.setdefault(positions[loan],
+                                  f"Invalid {kind} event in month {month}")
+                continue
+            for column, value in zip(table, (positions[loan], month, kind, amount)):
+                column.append(value)
+    return EventTable(*(np.array(column, dtype=dtype) for column, dtype in zip(
+        table, (np.int64, np.int64, object, np.float64)))), errors
+
+
+def main(argv=None):
+    """Price every loan in a batch CSV under the events in an events CSV"""
+    from mortgage_batch import DECIMAL_SEPARATORS, NUMERIC_FIELDS, parse_columns
+    from mortgage_engine import validate_batch
+
+    parser = argparse.ArgumentParser(
+        description="Price loans with lump sums, payment changes and rate resets")
+    parser.add_argument('portfolio', help="CSV file with the batch mode columns")
+    parser.add_argument('--events', required=True,
+                        help="CSV file with loan (portfolio row), month, event and amount")
+    parser.add_argument('--decimal', choices=sorted(DECIMAL_SEPARATORS), default='auto')
+    parser.add_argument('--out', required=True, help="Output CSV file")
+    args = parser.parse_args(argv)
+
+    decimal = DECIMAL_SEPARATORS[args.decimal]
+    with open(args.portfolio, newline='', encoding='utf-8-sig') as input_file:
+        rows = list(csv.DictReader(input_file))
+    row_numbers = range(2, len(rows) + 2)  # Counting the header as row 1
+    columns, errors = parse_columns(rows, decimal)
+    rule_errors = validate_batch(*(columns[field] for field in NUMERIC_FIELDS))
+    for position, message in enumerate(rule_errors.tolist()):
+        if message:
+            errors.setdefault(position, message)
+    try:
+        events, event_errors = read_events(args.events, row_numbers, decimal)
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    for position, message in event_errors.items():
+        errors.setdefault(position, message)
+
+    # Price the valid loans only, renumbering their events
+    kept = np.array([position not in errors for position in range(len(rows))], dtype=bool)
+    kept_index = np.cumsum(kept) - 1
+    with_event = kept[events.loan]
+    results = price_events(
+        (columns['loan_seeking'] - columns['down_payment'])[kept],
+        columns['interest_rate'][kept], columns['principal_payment'][kept],
+        columns['extra_payment'][kept], columns['monthly_fee'][kept],
+        EventTable(kept_index[events.loan[with_event]], events.month[with_event],
+                   events.kind[with_event], events.amount[with_event]),
+        columns['extra_start_month'][kept])
+    event_counts = np.bincount(events.loan, minlength=len(rows))
+
+    priced = 0
+    with open(args.out, 'w', newline='', encoding='utf-8') as output_file:
+        writer = csv.DictWriter(output_file, fieldnames=RESULT_FIELDS)
+        writer.writeheader()
+        for position, row_number in enumerate(row_numbers):
+            record = {'row': row_number, 'events': int(event_counts[position])}
+            index = kept_index[position]
+            if position in errors:
+                record['error'] = errors[position]
+            elif not results['repaid'][index]:
+                record['error'] = "Payments stop before the loan is repaid"
+            else:
+                priced += 1
+                record.update(payoff_months=int(results['payoff_months'][index]),
+                              time_saved_months=int(results['time_saved_months'][index]),
+                              **{name: f"{results[name][index]:.2f}" for name in (
+                                  'total_interest', 'lump_sums', 'interest_saved')})
+            writer.writerow(record)
+    print(f"Priced {priced:,} of {len(rows):,} loans with {len(events.loan):,} events; "
+          f"wrote {args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
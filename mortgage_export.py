@@ -0,0 +1,227 @@
+# Background PDF export for the calculator results.
+#
+# Exports are described by plain dicts of text (see build_summary_report) so
+# they can be rendered in worker processes. Filenames are claimed with an
+# exclusive create, starting from a persisted per-name counter, so picking a
+# name costs one attempt in the common case and never races another writer.
+import json
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime
+
+import mortgage_metrics as metrics
+
+# STEP 1: Constants
+EXPORT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'exports')
+COUNTER_FILE = '.export_counters.json'
+
+_counter_lock = threading.Lock()
+
+
+# STEP 2: Unique Filename Allocation
+def _load_counters(export_dir):
+    """Read the persisted next-index hints for export_dir"""
+    try:
+        with open(os.path.join(export_dir, COUNTER_FILE), encoding='utf-8') as counter_file:
+            return json.load(counter_file)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_counters(export_dir, counters):
+    """Persist the next-index hints, replacing the file atomically"""
+    path = os.path.join(export_dir, COUNTER_FILE)
+    temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(temp_path, 'w', encoding='utf-8') as counter_file:
+            json.dump(counters, counter_file)
+        os.replace(temp_path, path)
+    except OSError:
+        pass  # The counter is only a hint; exclusive create keeps names unique
+
+
+def allocate_filename(base_filename, extension='.pdf', export_dir=EXPORT_DIR):
+    """Claim a new, unused export filename and return its path
+
+    Names follow base.pdf, base_1.pdf, base_2.pdf, ... The file is created
+    empty with O_EXCL, so two exporters can never receive the same name.
+    """
+    os.makedirs(export_dir, exist_ok=True)
+    with _counter_lock:
+        counters = _load_counters(export_dir)
+        index = counters.get(base_filename, 0)
+        while True:
+            suffix = f'_{index}' if index else ''
+            filename = os.path.join(export_dir, f'{base_filename}{suffix}{extension}')
+            try:
+                os.close(os.open(filename, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+                break
+            except FileExistsError:
+                index += 1
+        counters[base_filename] = index + 1
+        _save_counters(export_dir, counters)
+    return filename
+
+
+def default_base_filename(when=None):
+    """Export filename stem for a date, e.g. mortgage_calculation_24-12-2024"""
+    when = when or datetime.now()
+    return f'mortgage_calculation_{when.strftime("%d-%m-%Y")}'
+
+
+# STEP 3: PDF Rendering
+def build_summary_report(details, breakdown, extra_payments, generated=None):
+    """Describe a results summary PDF as plain, picklable data"""
+    generated = generated or datetime.now()
+    return {
+        'base_filename': default_base_filename(generated),
+        'generated': generated.strftime('%Y-%m-%d %H:%M:%S'),
+        'details': list(details),
+        'breakdown': list(breakdown),
+        'extra_payments': list(extra_payments),
+    }
+
+
+@metrics.timed('export.render_summary_pdf')
+def render_summary_pdf(report, export_dir=EXPORT_DIR):
+    """Allocate a filename and draw the results summary PDF, returning the path"""
+    from reportlab.lib.pagesizes import letter
+    from reportlab.pdfgen import canvas
+
+    filename = allocate_filename(report['base_filename'], '.pdf', export_dir)
+    try:
+        _draw_summary(canvas.Canvas(filename, pagesize=letter), letter, report)
+    except Exception:
+        # Do not leave the claimed, empty file behind
+        os.remove(filename)
+        raise
+    return filename
+
+
+def _draw_summary(c, pagesize, report):
+    """Draw the results summary page onto canvas c and save it"""
+    width, height = pagesize
+
+    # Add title
+    c.setFont("Helvetica-Bold", 16)
+    c.drawString(50, height - 50, "Mortgage Calculator Results")
+
+    # Add line under title
+    c.line(50, height - 60, width - 50, height - 60)
+
+    # Add subtitle with timestamp
+    c.setFont("Helvetica", 10)
+    c.drawString(50, height - 80, f"Generated on: {report['generated']}")
+
+    # Add loan details
+    c.setFont("Helvetica-Bold", 12)
+    c.drawString(50, height - 100, "Loan Details")
+
+    c.setFont("Helvetica", 10)
+    y = height - 120
+    for detail in report['details']:
+        y -= 20
+        c.drawString(70, y, detail)
+
+    # Add Monthly Payment Breakdown
+    y -= 40
+    c.setFont("Helvetica-Bold", 12)
+    c.drawString(50, y, "Monthly Payment Breakdown")
+
+    c.setFont("Helvetica", 10)
+    y -= 20
+    for item in report['breakdown']:
+        y -= 20
+        c.drawString(70, y, item)
+
+    # Add Extra Payments Impact
+    y -= 40
+    c.setFont("Helvetica-Bold", 12)
+    c.drawString(50, y, "With Extra Payments")
+
+    c.setFont("Helvetica", 10)
+    y -= 20
+    for item in report['extra_payments']:
+        y -= 20
+        c.drawString(70, y, item)
+
+    c.save()
+
+
+# STEP 4: Export Queue
+class ExportQueue:
+    """Run PDF exports in the background with progress and completion callbacks
+
+    Jobs run on a pool of worker processes (or threads), several at a time.
+    Callbacks are not called from the workers: they are queued and run by
+    process_events() on the caller's thread, which lets a Tk window deliver
+    them from root.after. wait() blocks and delivers everything.
+    """
+
+    def __init__(self, max_workers=None, use_processes=True, on_progress=None):
+        """Create the worker pool; on_progress(done, total) follows every job"""
+        executor_class = ProcessPoolExecutor if use_processes else ThreadPoolExecutor
+        self._executor = executor_class(max_workers=max_workers or os.cpu_count() or 1)
+        self._events = queue.Queue()
+        self.on_progress = on_progress
+        self.submitted = 0
+        self.completed = 0
+        self._outstanding = set()
+
+    @property
+    def busy(self):
+        """True while submitted jobs have not been delivered yet"""
+        return bool(self._outstanding)
+
+    def submit(self, report, on_done=None, render=render_summary_pdf, **render_args):
+        """Queue one export; on_done(filename, error) runs when it finishes"""
+        self.submitted += 1
+        started = time.perf_counter()
+        future = self._executor.submit(render, report, **render_args)
+        future.started = started
+        self._outstanding.add(future)
+        future.add_done_callback(lambda done: self._events.put((done, on_done)))
+        return future
+
+    def submit_many(self, reports, on_done=None, **render_args):
+        """Queue several exports to run in parallel"""
+        return [self.submit(report, on_done, **render_args) for report in reports]
+
+    def process_events(self):
+        """Run callbacks for finished jobs on this thread; returns how many ran"""
+        delivered = 0
+        while True:
+            try:
+                future, on_done = self._events.get_nowait()
+            except queue.Empty:
+                return delivered
+            self._deliver(future, on_done)
+            delivered += 1
+
+    def wait(self):
+        """Block until every submitted job has finished and been delivered"""
+        while self._outstanding:
+            future, on_done = self._events.get()
+            self._deliver(future, on_done)
+
+    def shutdown(self, wait=True):
+        """Stop the worker pool"""
+        self._executor.shutdown(wait=wait, cancel_futures=not wait)
+
+    def _deliver(self, future, on_done):
+        """Run the callbacks for one finished job"""
+        self._outstanding.discard(future)
+        self.completed += 1
+        error = future.exception()
+        filename = None if error else future.result()
+        # Jobs may run in other processes, so metrics are recorded here
+        metrics.record('export.job', time.perf_counter() - future.started, error is not None)
+        if filename:
+            metrics.add_bytes('export.job', os.path.getsize(filename))
+        if on_done is not None:
+            on_done(filename, error)
+        if self.on_progress is not None:
+            self.on_progress(self.completed, self.submitted)
@@ -0,0 +1,211 @@
+# Currency conversion and per-currency portfolio totals.
+#
+# Rates come from a local JSON file, never from the network:
+#
+#     {"base": "SEK", "as_of": "2026-10-01",
+#      "rates": {"USD": 10.52, "EUR": 11.41, "GBP": 13.20}}
+#
+# Each rate is the price of one unit of that currency in the base currency.
+# Currencies may be given as ISO codes or as the calculator's symbols ("kr",
+# "$", ...). A file is parsed once and kept until it changes on disk or is
+# refreshed or invalidated explicitly. Conversion works on arrays: loans are
+# grouped by currency with one np.unique() call, every group gets one factor
+# and the amounts are multiplied by the factor of their group, so millions of
+# loans are converted without a Python loop over the loans.
+#
+# Usage:
+#     python mortgage_calculator_new.py --batch book.csv --out results.csv \
+#         --report-currency SEK --fx fx_rates.json
+import csv
+import json
+import os
+
+import numpy as np
+
+from mortgage_inputs import CURRENCY_CODES
+
+# STEP 1: Constants
+DEFAULT_FX_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fx_rates.json')
+# Portfolio amounts summed per currency: the amount lent, the monthly
+# payment (cash flow) and the interest paid until payoff
+TOTAL_AMOUNTS = ['loan_amount', 'monthly_payment', 'interest_paid']
+SUMMARY_FIELDS = ['currency', 'loans'] + TOTAL_AMOUNTS + ['fx_rate'] + [
+    f'{name}_reported' for name in TOTAL_AMOUNTS]
+
+
+def currency_code(currency):
+    """ISO code for a currency symbol or code, e.g. 'kr' -> 'SEK'"""
+    currency = currency.strip()
+    return CURRENCY_CODES.get(currency, currency.upper())
+
+
+# STEP 2: Rate Table
+class FXTable:
+    """Exchange rates against one base currency
+
+    rates maps currency codes (or symbols) to the price of one unit in the
+    base currency.
+    """
+
+    def __init__(self, base, rates, as_of=None, source=None):
+        self.base = currency_code(base)
+        self.as_of = as_of
+        self.source = source
+        self.rates = {currency_code(currency): float(rate) for currency, rate in rates.items()}
+        self.rates[self.base] = 1.0
+        for currency, rate in self.rates.items():
+            if not rate > 0:
+                raise ValueError(f"FX rate for {currency} must be greater than 0")
+
+    @classmethod
+    def from_file(cls, path):
+        """Read a rate file in the format described at the top of this module"""
+        try:
+            with open(path, encoding='utf-8') as rate_file:
+                data = json.load(rate_file)
+            return cls(data['base'], data['rates'], data.get('as_of'), source=path)
+        except (KeyError, TypeError, AttributeError, json.JSONDecodeError) as e:
+            raise ValueError(f"Invalid FX rate file {path}: {e}") from None
+
+    def rate(self, from_currency, to_currency):
+        """Units of to_currency per unit of from_currency"""
+        return self._base_price(from_currency) / self._base_price(to_currency)
+
+    def factors(self, currencies, to_currency):
+        """Conversion factor into to_currency for each of a list of currencies"""
+        target = self._base_price(to_currency)
+        return np.array([self._base_price(currency) / target for currency in currencies])
+
+    def convert(self, amounts, currencies, to_currency):
+        """Convert amounts, each in the currency at the same position, into
+        to_currency; currencies is an array-like of codes or symbols"""
+        labels, index = group_currencies(currencies)
+        return np.asarray(amounts, dtype=np.float64) * self.factors(labels, to_currency)[index]
+
+    def _base_price(self, currency):
+        code = currency_code(currency)
+        try:
+            return self.rates[code]
+        except KeyError:
+            where = f" in {self.source}" if self.source else ""
+            raise ValueError(f"No FX rate for {code}{where}") from None
+
+
+# STEP 3: Cached Rate Files
+_cache = {}  # Absolute path -> (modification stamp, FXTable)
+
+
+def _stamp(path):
+    status = os.stat(path)
+    return status.st_mtime_ns, status.st_size
+
+
+def load_fx_table(path=DEFAULT_FX_PATH, refresh=False):
+    """The FXTable for a rate file, parsed once and cached
+
+    The cached table is reused until the file's modification time or size
+    changes, or refresh is true.
+    """
+    path = os.path.abspath(path)
+    try:
+        stamp = _stamp(path)
+    except OSError as e:
+        raise ValueError(f"Cannot read FX rate file {path}: {e.strerror}") from None
+    cached = _cache.get(path)
+    if cached is not None and not refresh and cached[0] == stamp:
+        return cached[1]
+    table = FXTable.from_file(path)
+    _cache[path] = (stamp, table)
+    return table
+
+
+def invalidate_fx_cache(path=None):
+    """Forget the cached table for path, or every cached table"""
+    if path is None:
+        _cache.clear()
+    else:
+        _cache.pop(os.path.abspath(path), None)
+
+
+# STEP 4: Portfolio Totals
+def group_currencies(currencies):
+    """(labels, index): the distinct currencies and each loan's position in
+    them, from one vectorized np.unique()"""
+    currencies = np.asarray(currencies, dtype=str).reshape(-1)
+    if currencies.dtype.itemsize > 12:
+        labels, index = np.unique(currencies, return_inverse=True)
+        return labels.tolist(), index.reshape(-1)
+    # Codes and symbols of up to three characters pack exactly into one
+    # integer (21 bits per code point), and integers are much faster to sort
+    points = currencies.astype('U3').view(np.uint32).reshape(-1, 3).astype(np.uint64)
+    keys = (points[:, 0] << np.uint64(42)) | (points[:, 1] << np.uint64(21)) | points[:, 2]
+    unique, index = np.unique(keys, return_inverse=True)
+    labels = [''.join(chr(key >> shift & 0x1FFFFF) for shift in (42, 21, 0)).rstrip('\0')
+              for key in unique.tolist()]
+    return labels, index.reshape(-1)
+
+
+class CurrencyTotals:
+    """Per-currency sums of TOTAL_AMOUNTS, added to a batch at a time"""
+
+    def __init__(self):
+        self.loans = {}
+        self.sums = {}  # Currency -> array of TOTAL_AMOUNTS sums
+
+    def add(self, currencies, amounts):
+        """Add loans: currencies per loan and a dict of TOTAL_AMOUNTS arrays"""
+        labels, index = group_currencies(currencies)
+        counts = np.bincount(index, minlength=len(labels))
+        sums = np.stack([np.bincount(index, weights=amounts[name], minlength=len(labels))
+                         for name in TOTAL_AMOUNTS], axis=1)
+        for position, label in enumerate(labels):
+            code = currency_code(label)
+            self.loans[code] = self.loans.get(code, 0) + int(counts[position])
+            self.sums[code] = self.sums.get(code, 0.0) + sums[position]
+
+    def report(self, fx, to_currency):
+        """Summary rows per currency plus a last 'Total' row in to_currency
+
+        Amounts are in each row's own currency; the *_reported amounts are
+        converted into to_currency.
+        """
+        to_code = currency_code(to_currency)
+        currencies = sorted(self.sums)
+        factors = fx.factors(currencies, to_code)
+        rows = []
+        total = np.zeros(len(TOTAL_AMOUNTS))
+        for currency, factor in zip(currencies, factors.tolist()):
+            reported = self.sums[currency] * factor
+            total += reported
+            row = {'currency': currency, 'loans': self.loans[currency], 'fx_rate': factor}
+            row.update(zip(TOTAL_AMOUNTS, self.sums[currency].tolist()))
+            row.update(zip((f'{name}_reported' for name in TOTAL_AMOUNTS), reported.tolist()))
+            rows.append(row)
+        summary = {'currency': f"Total ({to_code})", 'loans': sum(self.loans.values())}
+        summary.update(zip((f'{name}_reported' for name in TOTAL_AMOUNTS), total.tolist()))
+        rows.append(summary)
+        return rows
+
+
+def portfolio_totals(results, currencies, fx, to_currency):
+    """Per-currency and converted totals for calculate_batch() results
+
+    currencies holds each loan's currency. Returns CurrencyTotals.report()
+    rows.
+    """
+    totals = CurrencyTotals()
+    totals.add(currencies, results)
+    return totals.report(fx, to_currency)
+
+
+def write_summary_csv(output, rows):
+    """Write report() rows with amounts to two decimals"""
+    if isinstance(output, str):
+        with open(output, 'w', newline='', encoding='utf-8') as output_file:
+            return write_summary_csv(output_file, rows)
+    writer = csv.DictWriter(output, fieldnames=SUMMARY_FIELDS)
+    writer.writeheader()
+    for row in rows:
+        writer.writerow({name: (f"{value:.6g}" if name == 'fx_rate' else
+                                f"{value:.2f}" if isinstance(value, float) else value)
+                         for name, value in row.items()})
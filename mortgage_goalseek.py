@@ -0,0 +1,359 @@
+# Goal seek: the payment or rate that reaches a payoff date or interest budget.
+#
+# Inverts the engine's fixed-principal amortization instead of trying values
+# by hand. The payoff month is ceil(balance / monthly principal), and the
+# interest paid is the monthly rate times the sum of the monthly balances, a
+# continuous, piecewise linear function of the monthly principal. So most
+# targets have a closed-form answer. The one that does not (the principal for
+# an interest budget when extra payments start later) uses a bracketed false
+# position search that needs a handful of evaluations. Everything works on
+# arrays like calculate_batch(), so a whole portfolio is solved in one call.
+# Payments are rounded up to the cent and rates down to the rate units of
+# mortgage_money, then checked against calculate_batch().
+#
+# Usage:
+#     python mortgage_goalseek.py portfolio.csv --solve extra_payment \
+#         --payoff-years 15 --out solved.csv
+import argparse
+import csv
+import sys
+
+import numpy as np
+
+from mortgage_engine import broadcast_inputs, calculate_batch, solve_fixed_principal
+from mortgage_money import RATE_UNITS_PER_PERCENT
+
+# STEP 1: Constants
+# Inputs that can be solved for, with their captions
+SOLVE_FOR = {
+    'extra_payment': "Extra payment",
+    'principal_payment': "Principal payment",
+    'interest_rate': "Interest rate",
+}
+MIN_PAYMENT = 0.01  # Principal payments must stay above 0
+MAX_CORRECTIONS = 3  # Cent adjustments after rounding, should float error need them
+
+
+# STEP 2: Shared Helpers
+def _ceil_cents(amount):
+    """Round amounts up to the cent, ignoring float noise just above a cent"""
+    return np.ceil(np.round(amount * 100, 6)) / 100
+
+
+def _prefix(loan_amount, interest_rate, principal_payment, extra_start_month):
+    """Months paid before extra payments start, the balance left after them and
+    the interest paid on them, as calculate_batch() counts them"""
+    base_months = solve_fixed_principal(loan_amount, interest_rate,
+                                        principal_payment)['payoff_months']
+    months = np.clip(extra_start_month - 1, 0, base_months)
+    monthly_rate = interest_rate / 100 / 12
+    interest = monthly_rate * (months * loan_amount
+                               - principal_payment * months * (months - 1) / 2)
+    return months, loan_amount - months * principal_payment, interest
+
+
+def _monthly_for_budget(balance, monthly_rate, budget):
+    """Smallest monthly principal repaying balance with at most budget interest
+
+    Paying d a month takes n = ceil(balance / d) months and costs
+    rate * (n * balance - d * n * (n - 1) / 2). That is continuous and falls
+    as d grows, and at d = balance / n it is rate * balance * (n + 1) / 2. So
+    the answer lies on the stretch with n = floor(2 * budget / (rate *
+    balance)) months, where the cost is linear in d. Budgets below one
+    month's interest on the balance give NaN.
+    """
+    with np.errstate(divide='ignore', invalid='ignore'):
+        months = np.floor(np.round(2 * budget / (monthly_rate * balance), 9))
+        months = np.maximum(months, 2)
+        monthly = 2 * (months * balance - budget / monthly_rate) / (months * (months - 1))
+    feasible = budget >= monthly_rate * balance
+    return np.where(feasible, np.clip(monthly, balance / months, balance), np.nan)
+
+
+def bracketed_search(function, low, high, tolerance=0.001, max_evaluations=100):
+    """Smallest x in [low, high] with function(x, rows) <= 0, elementwise
+
+    function(x, rows) evaluates the rows at positions rows (an index array)
+    at x and must not increase in x. Rows already met at low return low.
+    Uses false position with the Illinois modification, which converges in a
+    few evaluations on piecewise linear functions, and only evaluates the rows
+    whose bracket is still wider than tolerance. Returns the upper end of
+    each bracket.
+    """
+    low, high = np.array(low, dtype=np.float64), np.array(high, dtype=np.float64)
+    rows = np.arange(low.size)
+    f_low = function(low, rows)
+    high = np.where(f_low <= 0, low, high)
+    f_high = function(high, rows)
+    kept = np.zeros(low.shape, dtype=np.int8)  # Side kept by the last step
+    for _ in range(max_evaluations):
+        rows = np.flatnonzero(high - low > tolerance)
+        if not rows.size:
+            break
+        a, b, fa, fb = low[rows], high[rows], f_low[rows], f_high[rows]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            guess = b - fb * (b - a) / (fb - fa)
+        inside = np.isfinite(guess) & (guess > a) & (guess < b)
+        guess = np.where(inside, guess, (a + b) / 2)
+        value = function(guess, rows)
+        met = value <= 0
+        # Illinois: halve the value at an end kept twice in a row
+        side = kept[rows]
+        f_low[rows] = np.where(met & (side == -1), fa / 2, np.where(met, fa, value))
+        f_high[rows] = np.where(~met & (side == 1), fb / 2, np.where(met, value, fb))
+        low[rows] = np.where(met, a, guess)
+        high[rows] = np.where(met, guess, b)
+        kept[rows] = np.where(met, -1, 1)
+    return high
+
+
+def _round_up(solved, meets, lowest=0.0, step=0.01):
+    """Round payments up to the cent, then take the smallest cent amount
+    near it, not below lowest, for which meets(payment) is true"""
+    solved = _ceil_cents(solved)
+    solvable = np.isfinite(solved)
+    fill = np.where(solvable, solved, MIN_PAYMENT)
+    # A searched payment can be up to a cent too high after rounding up
+    lower = np.maximum(fill - step, lowest)
+    solved = np.where(solvable & (lower < fill) & meets(lower), lower, solved)
+    for _ in range(MAX_CORRECTIONS):
+        missed = solvable & ~meets(np.where(solvable, solved, MIN_PAYMENT))
+        if not missed.any():
+            break
+        solved = np.where(missed, solved + step, solved)
+    return solved
+
+
+def _target_met(results, target_months, interest_budget):
+    """True where calculate_batch() results reach the targets"""
+    met = np.ones(np.shape(results['payoff_months']), dtype=bool)
+    if target_months is not None:
+        met &= results['payoff_months'] <= target_months
+    if interest_budget is not None:
+        # Relative slack for float sums of very large loans
+        met &= results['interest_paid'] <= interest_budget * (1 + 1e-12) + 1e-9
+    return met
+
+
+def _check_targets(target_months, interest_budget):
+    """Exactly one target must be given"""
+    if (target_months is None) == (interest_budget is None):
+        raise ValueError("Give either a target payoff month or an interest budget")
+
+
+def _targets(target, target_months):
+    """(target_months, interest_budget) for a broadcast target array"""
+    return (target, None) if target_months is not None else (None, target)
+
+
+# STEP 3: Solvers
+def required_extra_payment(loan_amount, interest_rate, principal_payment,
+                           target_months=None, interest_budget=None, extra_start_month=1):
+    """Smallest extra payment that pays the loan off within target_months, or
+    keeps the interest paid within interest_budget
+
+    Arguments broadcast like calculate_batch(). Returns the extra payments,
+    0 where the principal payment alone reaches the target, and NaN where no
+    extra payment can (e.g. the target month is before extra payments start).
+    """
+    _check_targets(target_months, interest_budget)
+    target = target_months if target_months is not None else interest_budget
+    loan_amount, interest_rate, principal_payment, target, extra_start_month = \
+        broadcast_inputs(loan_amount, interest_rate, principal_payment, target,
+                         extra_start_month)
+    months, balance, prefix_interest = _prefix(loan_amount, interest_rate,
+                                               principal_payment, extra_start_month)
+    base = calculate_batch(loan_amount, interest_rate, principal_payment, 0.0, 0.0)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        if target_months is not None:
+            reached = base['payoff_months'] <= target
+            # Pay the balance left when extra payments start in the months remaining
+            monthly = np.where(target > months, balance / (target - months), np.nan)
+        else:
+            reached = base['interest_paid'] <= target
+            monthly = _monthly_for_budget(balance, interest_rate / 100 / 12,
+                                          target - prefix_interest)
+    extra = np.where(reached, 0.0, np.maximum(monthly - principal_payment, 0.0))
+
+    def meets(candidate):
+        return _target_met(calculate_batch(loan_amount, interest_rate, principal_payment,
+                                           candidate, 0.0, extra_start_month),
+                           *_targets(target, target_months))
+    return np.where(reached, 0.0, _round_up(extra, meets))
+
+
+def required_principal_payment(loan_amount, interest_rate, extra_payment=0.0,
+                               target_months=None, interest_budget=None,
+                               extra_start_month=1):
+    """Smallest principal payment that pays the loan off within target_months,
+    or keeps the interest paid within interest_budget
+
+    Arguments broadcast like calculate_batch(). Returns NaN where the budget
+    is below one month's interest on the whole loan.
+    """
+    _check_targets(target_months, interest_budget)
+    target = target_months if target_months is not None else interest_budget
+    loan_amount, interest_rate, extra_payment, target, extra_start_month = \
+        broadcast_inputs(loan_amount, interest_rate, extra_payment, target,
+                         extra_start_month)
+    has_extra = extra_payment > 0
+    starts_later = has_extra & (extra_start_month > 1)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        if target_months is not None:
+            # The principal repays the loan alone, or with extra payments from
+            # extra_start_month for the rest of the target
+            with_extra = (loan_amount
+                          - np.maximum(target - extra_start_month + 1, 0) * extra_payment) / target
+            principal = np.where(has_extra, np.minimum(with_extra, loan_amount / target),
+                                 loan_amount / target)
+        else:
+            monthly_rate = interest_rate / 100 / 12
+            monthly = _monthly_for_budget(loan_amount, monthly_rate, target)
+            principal = np.where(has_extra, monthly - extra_payment, monthly)
+            if starts_later.any():
+                # Between paying the extra from the first month and not at all
+                search = np.flatnonzero(starts_later & np.isfinite(monthly))
+
+                def over_budget(candidate, rows):
+                    rows = search[rows]
+                    return calculate_batch(
+                        loan_amount[rows], interest_rate[rows], candidate,
+                        extra_payment[rows], 0.0, extra_start_month[rows],
+                    )['interest_paid'] - target[rows]
+                principal[search] = bracketed_search(
+                    over_budget, np.maximum(principal[search], MIN_PAYMENT), monthly[search])
+    principal = np.where(np.isfinite(principal), np.maximum(principal, MIN_PAYMENT), np.nan)
+
+    def meets(candidate):
+        return _target_met(calculate_batch(loan_amount, interest_rate, candidate,
+                                           extra_payment, 0.0, extra_start_month),
+                           *_targets(target, target_months))
+    return _round_up(principal, meets, MIN_PAYMENT)
+
+
+def max_interest_rate(loan_amount, principal_payment, interest_budget, extra_payment=0.0,
+                      extra_start_month=1):
+    """Highest yearly rate (in %) that keeps the interest paid within budget
+
+    The payments do not depend on the rate, so the interest paid is the
+    monthly rate times a fixed sum of monthly balances and the answer is
+    exact. Rates are rounded down to the rate units of mortgage_money and
+    kept below 100%, the highest rate the calculator accepts, so a budget
+    that any such rate keeps within gives the last rate unit below 100.
+    Budgets too small for the lowest rate unit give NaN.
+    """
+    loan_amount, principal_payment, interest_budget, extra_payment, extra_start_month = \
+        broadcast_inputs(loan_amount, principal_payment, interest_budget, extra_payment,
+                         extra_start_month)
+    # A monthly rate of 1 (1200% a year) makes interest_paid the balance sum
+    balance_months = calculate_batch(loan_amount, 1200.0, principal_payment, extra_payment,
+                                     0.0, extra_start_month)['interest_paid']
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rate = 1200 * interest_budget / balance_months
+        units = np.minimum(np.floor(np.round(rate * RATE_UNITS_PER_PERCENT, 6)),
+                           100 * RATE_UNITS_PER_PERCENT - 1)
+    return np.where(units >= 1, units / RATE_UNITS_PER_PERCENT, np.nan)
+
+
+def goal_seek(solve_for, loan_amount, interest_rate, principal_payment, extra_payment=0.0,
+              target_months=None, interest_budget=None, extra_start_month=1):
+    """Solve for one input of a batch of loans, keeping the others
+
+    solve_for is a SOLVE_FOR name; the current value of that input is
+    ignored. Returns the solved values as an array.
+    """
+    if solve_for == 'extra_payment':
+        return required_extra_payment(loan_amount, interest_rate, principal_payment,
+                                      target_months, interest_budget, extra_start_month)
+    if solve_for == 'principal_payment':
+        return required_principal_payment(loan_amount, interest_rate, extra_payment,
+                                          target_months, interest_budget, extra_start_month)
+    if solve_for == 'interest_rate':
+        if interest_budget is None:
+            raise ValueError("The interest rate does not change when a fixed principal "
+                             "payment pays the loan off; give an interest budget")
+        return max_interest_rate(loan_amount, principal_payment, interest_budget,
+                                 extra_payment, extra_start_month)
+    raise ValueError(f"Cannot solve for {solve_for}")
+
+
+# STEP 4: Command Line Interface
+def main(argv=None):
+    """Goal-seek every loan in a batch CSV and write the solved values"""
+    from mortgage_batch import DECIMAL_SEPARATORS, INPUT_FIELDS, NUMERIC_FIELDS, parse_columns
+    from mortgage_engine import validate_batch
+
+    parser = argparse.ArgumentParser(
+        description="Solve for the payment or rate that reaches a payoff date or interest budget")
+    parser.add_argument('portfolio', help="CSV file with the batch mode columns")
+    parser.add_argument('--solve', choices=list(SOLVE_FOR), default='extra_payment')
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument('--payoff-years', type=float, help="Pay every loan off within this")
+    target.add_argument('--interest-budget', type=float,
+                        help="Most interest to pay on each loan")
+    parser.add_argument('--extra-start-year', type=int, default=1,
+                        help="Year extra payments start in, for rows with no extra_start_year")
+    parser.add_argument('--decimal', choices=sorted(DECIMAL_SEPARATORS), default='auto')
+    parser.add_argument('--out', required=True, help="Output CSV file")
+    args = parser.parse_args(argv)
+
+    with open(args.portfolio, newline='', encoding='utf-8-sig') as input_file:
+        rows = list(csv.DictReader(input_file))
+    columns, errors = parse_columns(rows, DECIMAL_SEPARATORS[args.decimal])
+    # The column solved for is replaced, so any valid value stands in for it
+    checked = dict(columns, **{args.solve: np.ones(len(rows))})
+    rule_errors = validate_batch(*(checked[field] for field in NUMERIC_FIELDS))
+    for position, message in enumerate(rule_errors.tolist()):
+        if message:
+            errors.setdefault(position, message)
+    kept = np.array([position not in errors for position in range(len(rows))], dtype=bool)
+    inputs = {field: checked[field][kept] for field in NUMERIC_FIELDS}
+
+    target_months = None if args.payoff_years is None else round(args.payoff_years * 12)
+    blank = np.array([not (row.get('extra_start_year') or '').strip() for row in rows],
+                     dtype=bool)
+    extra_start_month = np.where(blank, (args.extra_start_year - 1) * 12 + 1,
+                                 columns['extra_start_month'])[kept]
+    try:
+        solved = goal_seek(args.solve, inputs['loan_seeking'] - inputs['down_payment'],
+                           inputs['interest_rate'], inputs['principal_payment'],
+                           inputs['extra_payment'], target_months, args.interest_budget,
+                           extra_start_month)
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    reached = np.isfinite(solved)
+    inputs[args.solve] = np.where(reached, solved, 1.0)
+    results = calculate_batch(inputs['loan_seeking'] - inputs['down_payment'],
+                              inputs['interest_rate'], inputs['principal_payment'],
+                              inputs['extra_payment'], inputs['monthly_fee'], extra_start_month)
+    # Position of each row among the kept rows
+    kept_index = np.cumsum(kept) - 1
+
+    fields = ['row'] + INPUT_FIELDS + ['solved', 'payoff_months', 'interest_paid', 'error']
+    solved_rows = 0
+    with open(args.out, 'w', newline='', encoding='utf-8') as output_file:
+        writer = csv.DictWriter(output_file, fieldnames=fields)
+        writer.writeheader()
+        for position, row in enumerate(rows):
+            record = {field: row.get(field, '') for field in INPUT_FIELDS}
+            record['row'] = position + 2  # Counting the header as row 1
+            if position in errors:
+                record['error'] = errors[position]
+            elif not reached[kept_index[position]]:
+                record['error'] = "The target cannot be reached"
+            else:
+                index = kept_index[position]
+                solved_rows += 1
+                record.update(solved=f"{solved[index]:.4f}".rstrip('0').rstrip('.'),
+                              payoff_months=int(results['payoff_months'][index]),
+                              interest_paid=f"{results['interest_paid'][index]:.2f}")
+            writer.writerow(record)
+    print(f"Solved {args.solve} for {solved_rows:,} of {len(rows):,} loans; wrote {args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
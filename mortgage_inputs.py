@@ -0,0 +1,266 @@
+# Step 2 input handling shared by the GUI, the engine and batch mode.
+#
+# Pure Python on purpose: the window imports this module at startup, and it
+# must not pull in NumPy or any other heavy dependency.
+
+import re
+
+# STEP 1: Constants
+AUTO_DOWN_PAYMENT_RATE = 0.15  # Down payment used in "Auto (15%)" mode
+
+# Currency symbols offered in the currency panel
+CURRENCY_NAMES = {
+    "kr": "Swedish Krona (SEK)",
+    "$": "US Dollar (USD)",
+    "€": "Euro (EUR)",
+    "C$": "Canadian Dollar (CAD)",
+    "A$": "Australian Dollar (AUD)",
+    "₹": "Indian Rupee (INR)",
+    "¥": "Japanese Yen (JPY)",
+    "£": "British Pound (GBP)"
+}
+
+
+# STEP 2: Parsing
+# Currency symbols and ISO codes ("SEK", "USD", ...) accepted before or after
+# an amount, longest first so "C$" is not read as "$"
+CURRENCY_CODES = {symbol: name[name.index('(') + 1:name.index(')')]
+                  for symbol, name in CURRENCY_NAMES.items()}
+_CURRENCY_TOKENS = '|'.join(re.escape(token) for token in sorted(
+    {*CURRENCY_NAMES, *CURRENCY_CODES.values()}, key=len, reverse=True))
+_CURRENCY_SYMBOLS = {code: symbol for symbol, code in CURRENCY_CODES.items()}
+
+# Non-breaking and thin spaces are used as thousands separators too
+_SPACES = str.maketrans({'\u00a0': ' ', '\u202f': ' ', '\u2009': ' ', '\u2007': ' '})
+_MINUS_SIGNS = ('-', '\u2212')
+_DIGITS = str.maketrans('', '', '0123456789')
+
+_AMOUNT = re.compile(
+    rf"(?P<sign>[-+\u2212]?) *(?:{_CURRENCY_TOKENS})? *(?P<inner_sign>[-+\u2212]?) *"
+    rf"(?P<number>[.,]?\d(?:[\d.,' ]*\d)?) *(?:{_CURRENCY_TOKENS})?",
+    re.IGNORECASE)
+# Integer parts grouped in thousands, one pattern per separator. Commas may
+# also group Indian style, in lakhs and crores ("1,00,00,000")
+_GROUPED = {separator: re.compile(rf"\d{{1,3}}(?:{re.escape(separator)}\d{{3}})+")
+            for separator in ",. '"}
+_GROUPED[','] = re.compile(r"\d{1,3}(?:,\d{3})+|\d{1,2}(?:,\d{2})+,\d{3}")
+
+# Results of the slow path kept by parse_amounts() for repeated values
+BULK_MEMO_SIZE = 100_000
+# Formatted amounts remembered by parse_amount(), per decimal argument; the
+# window parses every entry again on each keystroke, and most have not changed
+PARSE_CACHE_SIZE = 1024
+_PARSED = {None: {}, ',': {}, '.': {}}
+
+
+def parse_amount(value_str, decimal=None):
+    """Convert an amount typed or pasted in any supported format to a float
+
+    Accepts the currency symbols and codes of CURRENCY_NAMES before or after
+    the number, thousands separated by commas, points, apostrophes or
+    (non-breaking) spaces, and a decimal point or comma: "kr 1 250 000,50",
+    "€1.250.000,50", "C$1,250,000.50" and "1250000.5" are all the same.
+    A single comma followed by exactly three digits, as in "1,250", is read
+    as a thousands separator, and a single point as the decimal separator,
+    unless decimal (',' or '.') says which character is the decimal
+    separator. Blank input is 0.0.
+
+    Plain numbers go straight to float(). Formatted text goes through a
+    regular expression, about 20x slower, so its results are cached.
+    """
+    parsed = _PARSED[decimal]
+    number = parsed.get(value_str)
+    if number is not None:
+        return number
+    try:
+        number = float(value_str)
+    except ValueError:
+        pass
+    else:
+        # float() also takes "nan", "inf" and "1_000", which are not amounts
+        if (number - number == 0 and '_' not in value_str
+                and (decimal != ',' or '.' not in value_str)):
+            return number
+    number = _parse_text(value_str, decimal)
+    if len(parsed) >= PARSE_CACHE_SIZE:
+        parsed.clear()
+    parsed[value_str] = number
+    return number
+
+
+def parse_amounts(values, decimal=None, default=0.0):
+    """Parse many amounts at once, e.g. a column of a CSV file
+
+    Returns (amounts, errors): a list with one float per value, holding
+    default where a value could not be parsed, and a dict mapping the index
+    of each such value to its error message.
+    """
+    amounts = []
+    errors = {}
+    memo = {}
+    append = amounts.append
+    for index, value in enumerate(values):
+        # Same fast path as parse_amount(), inlined for throughput
+        try:
+            number = float(value)
+            if number - number == 0 and '_' not in value and (decimal != ',' or '.' not in value):
+                append(number)
+                continue
+        except ValueError:
+            pass
+
+        result = memo.get(value)
+        if result is None:
+            try:
+                result = _parse_text(value, decimal)
+            except ValueError as e:
+                result = e
+            if len(memo) < BULK_MEMO_SIZE:
+                memo[value] = result
+        if isinstance(result, ValueError):
+            errors[index] = str(result)
+            append(default)
+        else:
+            append(result)
+    return amounts, errors
+
+
+def _parse_text(value_str, decimal):
+    """Slow path of parse_amount() for text that float() does not accept"""
+    text = (value_str if value_str.isascii() else value_str.translate(_SPACES)).strip()
+    if not text:
+        return 0.0
+    match = _AMOUNT.fullmatch(text)
+    if match is None:
+        raise _invalid(value_str, "not a number")
+    sign, inner_sign, number = match.group('sign', 'inner_sign', 'number')
+    if sign and inner_sign:
+        raise _invalid(value_str, "more than one sign")
+
+    separator = _decimal_separator(number, decimal)
+    if separator:
+        whole, _, fraction = number.rpartition(separator)
+        if not fraction.isdigit():
+            raise _invalid(value_str, "digits after the decimal separator are grouped")
+    else:
+        whole, fraction = number, '0'
+
+    if whole and not whole.isdigit():
+        grouping = set(whole.translate(_DIGITS))
+        if len(grouping) > 1:
+            raise _invalid(value_str, "mixed thousands separators")
+        separator = grouping.pop()
+        if not _GROUPED[separator].fullmatch(whole):
+            raise _invalid(value_str, "misplaced thousands separator")
+        whole = whole.replace(separator, '')
+
+    value = float(f"{whole or '0'}.{fraction}")
+    return -value if (sign or inner_sign) in _MINUS_SIGNS else value
+
+
+def _decimal_separator(number, decimal):
+    """The decimal separator used in number (',' or '.'), or None"""
+    last_comma = number.rfind(',')
+    last_point = number.rfind('.')
+    if last_comma >= 0 and last_point >= 0:
+        # Both used: the last one is the decimal separator
+        return ',' if last_comma > last_point else '.'
+    if last_comma < 0 and last_point < 0:
+        return None
+    mark, position = (',', last_comma) if last_comma >= 0 else ('.', last_point)
+    if number.count(mark) > 1:
+        return None  # Repeated, so it groups thousands
+    if decimal is not None:
+        return mark if mark == decimal else None
+    # "1,250" and "1.250" are ambiguous; a single comma before exactly three
+    # digits is taken as a thousands separator, as the calculator always did
+    whole = number[:position]
+    if (mark == ',' and len(number) - position - 1 == 3
+            and whole.isdigit() and len(whole) <= 3 and not whole.startswith('0')):
+        return None
+    return mark
+
+
+def _invalid(value_str, reason):
+    """ValueError for a value that is not an amount"""
+    return ValueError(f"Invalid number format: {value_str!r} ({reason})")
+
+
+def currency_symbol(currency):
+    """Symbol of CURRENCY_NAMES for a currency symbol or ISO code
+
+    "SEK", "sek" and "kr" all give "kr". Raises ValueError for other currencies.
+    """
+    currency = currency.strip()
+    if currency in CURRENCY_NAMES:
+        return currency
+    symbol = _CURRENCY_SYMBOLS.get(currency.upper())
+    if symbol is None:
+        raise ValueError(f"Unsupported currency: {currency}")
+    return symbol
+
+
+# STEP 3: Validation
+# Rules checked in order; the first one that fails is reported for a loan.
+# The checks work on plain floats and on NumPy arrays alike.
+VALIDATION_RULES = [
+    ('loan_seeking', lambda v: v['loan_seeking'] <= 0,
+     "Loan seeking amount must be greater than 0"),
+    ('down_payment', lambda v: v['down_payment'] < 0,
+     "Down payment cannot be negative"),
+    ('down_payment', lambda v: v['down_payment'] >= v['loan_seeking'],
+     "Down payment must be less than loan seeking amount"),
+    ('interest_rate', lambda v: (v['interest_rate'] <= 0) | (v['interest_rate'] >= 100),
+     "Interest rate must be between 0 and 100"),
+    ('principal_payment', lambda v: v['principal_payment'] <= 0,
+     "Principal payment must be greater than 0"),
+    ('extra_payment', lambda v: v['extra_payment'] < 0,
+     "Extra payment cannot be negative"),
+    ('monthly_fee', lambda v: v['monthly_fee'] < 0,
+     "Monthly house fee cannot be negative"),
+]
+
+
+def validate_loan(loan_seeking, down_payment, interest_rate, principal_payment,
+                  extra_payment=0.0, monthly_fee=0.0):
+    """Check one loan's inputs, returning an error message or None"""
+    values = {
+        'loan_seeking': loan_seeking,
+        'down_payment': down_payment,
+        'interest_rate': interest_rate,
+        'principal_payment': principal_payment,
+        'extra_payment': extra_payment,
+        'monthly_fee': monthly_fee,
+    }
+    for _, check, message in VALIDATION_RULES:
+        if check(values):
+            return message
+    return None
+
+
+def parse_start_year(value_str):
+    """First month of extra payments for an "Extra Payments From Year" entry
+
+    Blank means year 1, so extra payments start with the first month.
+    """
+    value_str = value_str.strip()
+    if not value_str:
+        return 1
+    year = value_str.lstrip('0') if value_str.isdigit() else ''
+    if not year:
+        raise ValueError("Extra payment start year must be a whole number of at least 1")
+    if len(year) > 4:
+        raise ValueError("Extra payment start year is too large")
+    return (int(year) - 1) * 12 + 1
+
+
+# STEP 4: Formatting Helpers
+def split_months(months):
+    """Split a month count into (years, months)"""
+    return months // 12, months % 12
+
+
+def format_months(months):
+    """Format a month count the way the results panel shows it"""
+    years, months = split_months(int(months))
+    return f"{years} years, {months} months"
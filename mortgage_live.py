@@ -0,0 +1,97 @@
+# Debounced live recalculation for the calculator window.
+#
+# Input changes restart a short timer; when it fires the latest inputs are
+# sent to a single worker thread. Completed work is picked up from the Tk
+# mainloop with root.after, so widgets are only ever touched from the main
+# thread, and results for inputs that have since changed are dropped.
+import importlib
+from concurrent.futures import ThreadPoolExecutor
+
+# STEP 1: Constants
+DEFAULT_DELAY_MS = 250  # Quiet period before a burst of edits is computed
+POLL_MS = 15  # How often the mainloop checks for finished work
+
+
+# STEP 2: Live Recalculator
+class LiveRecalculator:
+    """Coalesce input changes and compute them off the Tk mainloop
+
+    snapshot() runs on the main thread and returns the current inputs,
+    compute(inputs) runs on the worker thread, and on_result(inputs, result)
+    runs back on the main thread for the newest inputs only. Exceptions
+    raised by compute are passed to on_error(inputs, error) if given.
+    """
+
+    def __init__(self, root, snapshot, compute, on_result, on_error=None,
+                 delay_ms=DEFAULT_DELAY_MS):
+        """Set up the debounce timer and the worker thread"""
+        self.root = root
+        self.snapshot = snapshot
+        self.compute = compute
+        self.on_result = on_result
+        self.on_error = on_error
+        self.delay_ms = delay_ms
+
+        self.generation = 0
+        self.submitted = 0
+        self.dropped = 0
+        self._last_inputs = None
+        self._timer = None
+        self._executor = ThreadPoolExecutor(max_workers=1,
+                                            thread_name_prefix='live-recalc')
+
+    def schedule(self, *args):
+        """Restart the debounce timer; usable directly as a trace callback"""
+        if self._timer is not None:
+            self.root.after_cancel(self._timer)
+        self._timer = self.root.after(self.delay_ms, self._fire)
+
+    def warm_up(self, module_name):
+        """Import a module on the worker thread before it is first needed"""
+        return self._executor.submit(importlib.import_module, module_name)
+
+    def invalidate(self):
+        """Forget the last inputs so the next change is always recomputed"""
+        self._last_inputs = None
+        self.generation += 1  # Results still in flight are for the old inputs
+
+    def mark_computed(self, inputs):
+        """Treat inputs as already computed, e.g. after showing saved results"""
+        self._last_inputs = inputs
+        self.generation += 1  # Drop anything still in flight
+
+    def shutdown(self):
+        """Cancel pending work and stop the worker thread"""
+        if self._timer is not None:
+            self.root.after_cancel(self._timer)
+            self._timer = None
+        self.generation += 1
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _fire(self):
+        """Send the latest inputs to the worker unless they are unchanged"""
+        self._timer = None
+        inputs = self.snapshot()
+        if inputs == self._last_inputs:
+            return
+        self._last_inputs = inputs
+
+        self.generation += 1
+        self.submitted += 1
+        future = self._executor.submit(self.compute, inputs)
+        self.root.after(POLL_MS, self._collect, future, self.generation, inputs)
+
+    def _collect(self, future, generation, inputs):
+        """Deliver a finished result on the main thread, dropping stale ones"""
+        if not future.done():
+            self.root.after(POLL_MS, self._collect, future, generation, inputs)
+            return
+        if generation != self.generation or future.cancelled():
+            self.dropped += 1
+            return
+
+        error = future.exception()
+        if error is None:
+            self.on_result(inputs, future.result())
+        elif self.on_error is not None:
+            self.on_error(inputs, error)
@@ -0,0 +1,186 @@
+# Lightweight hot-path instrumentation.
+#
+# Call counts, latency histograms (p50/p95/p99) and bytes written, recorded by
+# name. Recording is off unless enabled with enable() or the MORTGAGE_METRICS
+# environment variable; while off, an instrumented call costs one attribute
+# check on top of the call itself.
+import json
+import math
+import os
+import threading
+import time
+from functools import wraps
+
+# STEP 1: Constants
+# Histogram buckets grow by 10% per step from 1 microsecond, so percentiles are
+# accurate to within 10% and memory per metric stays fixed
+BUCKET_GROWTH = 1.1
+BUCKET_MIN_SECONDS = 1e-6
+BUCKET_COUNT = 240  # Up to about 1e-6 * 1.1**240 = 8.5 hours
+
+
+class _State:
+    """Global on/off switch, read on every instrumented call"""
+    enabled = os.environ.get('MORTGAGE_METRICS', '') not in ('', '0')
+
+
+_state = _State()
+_lock = threading.Lock()
+_metrics = {}
+
+
+# STEP 2: Recording
+class Metric:
+    """Call count, latency histogram and byte counter for one name"""
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+        self.bytes_written = 0
+        self.buckets = [0] * (BUCKET_COUNT + 1)
+
+    def observe(self, seconds):
+        """Add one latency sample"""
+        self.calls += 1
+        self.total_seconds += seconds
+        if seconds > self.max_seconds:
+            self.max_seconds = seconds
+        if seconds <= BUCKET_MIN_SECONDS:
+            index = 0
+        else:
+            index = min(BUCKET_COUNT,
+                        int(math.log(seconds / BUCKET_MIN_SECONDS, BUCKET_GROWTH)) + 1)
+        self.buckets[index] += 1
+
+    def percentile(self, fraction):
+        """Approximate latency percentile in seconds (upper bucket bound)"""
+        if not self.calls:
+            return 0.0
+        rank = fraction * self.calls
+        seen = 0
+        for index, count in enumerate(self.buckets):
+            seen += count
+            if seen >= rank:
+                return min(BUCKET_MIN_SECONDS * BUCKET_GROWTH ** index, self.max_seconds)
+        return self.max_seconds
+
+    def summary(self):
+        """Plain dict of the recorded figures, times in milliseconds"""
+        return {
+            'calls': self.calls,
+            'errors': self.errors,
+            'mean_ms': self.total_seconds / self.calls * 1000 if self.calls else 0.0,
+            'p50_ms': self.percentile(0.50) * 1000,
+            'p95_ms': self.percentile(0.95) * 1000,
+            'p99_ms': self.percentile(0.99) * 1000,
+            'max_ms': self.max_seconds * 1000,
+            'bytes_written': self.bytes_written,
+        }
+
+
+def _metric(name):
+    """Get or create the metric for name (caller holds _lock)"""
+    metric = _metrics.get(name)
+    if metric is None:
+        metric = _metrics[name] = Metric()
+    return metric
+
+
+def record(name, seconds, error=False):
+    """Record one call of name that took seconds"""
+    if not _state.enabled:
+        return
+    with _lock:
+        metric = _metric(name)
+        metric.observe(seconds)
+        if error:
+            metric.errors += 1
+
+
+def add_bytes(name, count):
+    """Add count bytes written to the metric for name"""
+    if not _state.enabled:
+        return
+    with _lock:
+        _metric(name).bytes_written += count
+
+
+def timed(name):
+    """Decorator recording the call count and latency of a function"""
+    def decorate(function):
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            if not _state.enabled:
+                return function(*args, **kwargs)
+            start = time.perf_counter()
+            failed = True
+            try:
+                result = function(*args, **kwargs)
+                failed = False
+                return result
+            finally:
+                record(name, time.perf_counter() - start, failed)
+        return wrapper
+    return decorate
+
+
+class Timer:
+    """Context manager recording the latency of a block"""
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter() if _state.enabled else None
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        if self.start is not None:
+            record(self.name, time.perf_counter() - self.start, exc_type is not None)
+
+
+# STEP 3: Control and Reporting
+def enable(enabled=True):
+    """Turn recording on or off"""
+    _state.enabled = enabled
+
+
+def is_enabled():
+    """True while recording"""
+    return _state.enabled
+
+
+def reset():
+    """Drop everything recorded so far"""
+    with _lock:
+        _metrics.clear()
+
+
+def snapshot():
+    """Summaries of every metric, keyed by name"""
+    with _lock:
+        return {name: metric.summary() for name, metric in sorted(_metrics.items())}
+
+
+def dump_json(path=None):
+    """Return the snapshot as JSON, also writing it to path if given"""
+    text = json.dumps({'enabled': _state.enabled, 'metrics': snapshot()}, indent=2)
+    if path:
+        with open(path, 'w', encoding='utf-8') as metrics_file:
+            metrics_file.write(text)
+    return text
+
+
+def format_table(metrics=None):
+    """Snapshot as aligned text lines for the diagnostics panel"""
+    metrics = snapshot() if metrics is None else metrics
+    if not metrics:
+        return "No calls recorded yet"
+    lines = [f"{'name':<30}{'calls':>7}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'bytes':>11}"]
+    for name, summary in metrics.items():
+        lines.append(f"{name:<30}{summary['calls']:>7}{summary['p50_ms']:>9.2f}"
+                     f"{summary['p95_ms']:>9.2f}{summary['p99_ms']:>9.2f}"
+                     f"{summary['bytes_written']:>11,}")
+    return "\n".join(lines)
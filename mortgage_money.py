@@ -0,0 +1,202 @@
+# Exact money arithmetic in integer minor units.
+#
+# Amounts are held as int64 cents (öre, pence, ...) and interest rates as
+# integer units of 1/10000 of a percent, so a schedule is built from exact
+# integers and always repays the loan to the cent. The one rounding rule:
+# interest accrues exactly, and each month charges the whole cents accrued so
+# far (rounded half up) less what was already charged. Every month is within
+# a cent of the exact interest, rounding never piles up, and the total is the
+# exact total rounded once, so batches are priced in closed form.
+import numpy as np
+
+from mortgage_engine import TERM_MONTHS, annuity_payment, broadcast_inputs
+
+# STEP 1: Constants
+CENTS_PER_UNIT = 100
+RATE_UNITS_PER_PERCENT = 10_000  # Rates are kept to 4 decimals, like the cache keys
+# balance (cents) * rate (units) / INTEREST_DIVISOR = monthly interest (cents)
+INTEREST_DIVISOR = 100 * RATE_UNITS_PER_PERCENT * 12
+# Largest amount handled, 10 billion in major units; keeps every int64
+# intermediate below 2**63 for rates up to 100%
+MAX_CENTS = 10 ** 12
+# Added before flooring: half up, nudged so 0.285 (stored as 0.28499...) gives
+# 29 cents
+HALF_UP = 0.5 + 1e-7
+
+
+# STEP 2: Conversion
+def to_cents(amount):
+    """Convert major-unit amounts (floats) to int64 cents, rounding half up"""
+    amount = np.asarray(amount, dtype=np.float64)
+    cents = np.floor(np.abs(amount) * CENTS_PER_UNIT + HALF_UP)
+    if np.any(cents > MAX_CENTS):
+        raise ValueError("Amount is too large")
+    return np.copysign(cents, amount).astype(np.int64)
+
+
+def to_rate_units(interest_rate):
+    """Convert yearly percentages to integer rate units (1/10000 percent)"""
+    rate = np.asarray(interest_rate, dtype=np.float64)
+    return np.rint(rate * RATE_UNITS_PER_PERCENT).astype(np.int64)
+
+
+def from_cents(cents):
+    """Convert cents back to major-unit floats"""
+    return np.asarray(cents) / CENTS_PER_UNIT
+
+
+def interest_on(balance_months, rate_units):
+    """Interest in cents on a sum of monthly balances, rounded half up
+
+    balance_months is balance x months in cents, e.g. the sum of the opening
+    balances of every month so far. Works on Python ints and int64 arrays;
+    arrays whose product with the rate could overflow int64 are split by
+    INTEREST_DIVISOR first.
+    """
+    if isinstance(balance_months, np.ndarray) and (
+            int(balance_months.max(initial=0)) * int(np.max(rate_units, initial=0)) >= 2 ** 62):
+        whole, rest = np.divmod(balance_months, INTEREST_DIVISOR)
+        return whole * rate_units + interest_on(rest, rate_units)
+    return (2 * balance_months * rate_units + INTEREST_DIVISOR) // (2 * INTEREST_DIVISOR)
+
+
+# STEP 3: Exact Schedules
+def schedule_months(loan_cents, principal_cents, extra_cents=0, extra_start_month=1):
+    """Months each loan's schedule runs, with extra payments from
+    extra_start_month on, as int64"""
+    loan, principal, extra, start = np.broadcast_arrays(
+        *(np.atleast_1d(np.asarray(value, dtype=np.int64)) for value in (
+            loan_cents, principal_cents, extra_cents, extra_start_month)))
+    before = np.maximum(start - 1, 0)  # Months paid before extra payments start
+    plain = -(-loan // principal)
+    with_extra = before + -(-(loan - before * principal) // (principal + extra))
+    return np.where(plain <= before, plain, with_extra)
+
+
+def schedule_columns(loan_cents, rate_units, principal_cents, extra_cents=0,
+                     extra_start_month=1):
+    """Exact schedules for a batch of loans as flat int64 columns
+
+    The rows of every loan are stored back to back, the same rows
+    mortgage_schedule.schedule_rows() yields. Returns a dict with 'months'
+    per loan and the row columns 'month', 'principal', 'extra', 'interest',
+    'balance' (after the month's payments) and 'total_interest' in cents.
+    """
+    loan, rate, principal, extra, start = np.broadcast_arrays(
+        *(np.atleast_1d(np.asarray(value, dtype=np.int64)) for value in (
+            loan_cents, rate_units, principal_cents, extra_cents, extra_start_month)))
+    months = schedule_months(loan, principal, extra, start)
+    starts = np.cumsum(months) - months  # Row of each loan's first month
+    owner = np.repeat(np.arange(len(months)), months)
+    step = np.arange(int(months.sum()), dtype=np.int64) - starts[owner]
+
+    # Opening balance: the loan less every payment made in earlier months
+    before = np.maximum(start - 1, 0)[owner]
+    opening = (loan[owner] - step * principal[owner]
+               - np.maximum(step - before, 0) * extra[owner])
+    paid_principal = np.minimum(principal[owner], opening)
+    paid_extra = np.where(step >= before,
+                          np.minimum(extra[owner], opening - paid_principal), 0)
+
+    # Interest charged so far, on each loan's running sum of opening balances
+    running = np.cumsum(opening)
+    running -= (running - opening)[starts][owner]
+    total_interest = interest_on(running, rate[owner])
+    interest = np.diff(total_interest, prepend=0)
+    interest[starts[months > 0]] = total_interest[starts[months > 0]]
+    return {
+        'months': months,
+        'month': step + 1,
+        'principal': paid_principal,
+        'extra': paid_extra,
+        'interest': interest,
+        'balance': opening - paid_principal - paid_extra,
+        'total_interest': total_interest,
+    }
+
+
+# STEP 4: Exact Batch Totals
+def solve_fixed_principal_cents(loan_cents, rate_units, payment_cents):
+    """Exact payoff months, total interest and final payment in cents
+
+    The opening balances fall linearly, so their sum over the whole loan is
+    an arithmetic series and the total interest charged by schedule_columns()
+    is that sum's interest rounded once.
+    """
+    months = np.maximum(-(-loan_cents // payment_cents), 0)
+    full_months = np.maximum(months - 1, 0)
+    balance_months = months * loan_cents - payment_cents * ((months * full_months) >> 1)
+    last_balance = loan_cents - full_months * payment_cents
+    total_interest = interest_on(balance_months, rate_units)
+    final_interest = total_interest - interest_on(balance_months - last_balance, rate_units)
+    return {
+        'payoff_months': months,
+        'total_interest': total_interest,
+        'final_payment': last_balance + final_interest,
+    }
+
+
+def _cents_inputs(loan_amount, interest_rate, *amounts):
+    """Broadcast inputs and convert them to cents and rate units"""
+    loan_amount, interest_rate, *amounts = broadcast_inputs(loan_amount, interest_rate, *amounts)
+    return (to_cents(loan_amount), to_rate_units(interest_rate),
+            *(to_cents(amount) for amount in amounts))
+
+
+def calculate_batch_cents(loan_amount, interest_rate, principal_payment,
+                          extra_payment=0.0, monthly_fee=0.0):
+    """Exact counterpart of mortgage_engine.calculate_batch()
+
+    Takes the same major-unit inputs, except that extra payments always start
+    in the first month, and returns the same results with every amount as
+    int64 cents.
+    """
+    return price_cents(*_cents_inputs(loan_amount, interest_rate, principal_payment,
+                                      extra_payment, monthly_fee))
+
+
+def price_cents(loan_cents, rate_units, principal_cents, extra_cents=0, fee_cents=0):
+    """Price a batch of loans already held as int64 cents and rate units
+
+    interest_paid is exactly what the month-by-month schedules charge;
+    total_interest, the annuity comparison, uses the annuity payment rounded
+    to cents.
+    """
+    loan, rate, principal, extra, fee = np.broadcast_arrays(
+        *(np.asarray(value, dtype=np.int64) for value in (
+            loan_cents, rate_units, principal_cents, extra_cents, fee_cents)))
+    if np.any(principal <= 0):
+        raise ValueError("Principal payment must be greater than 0")
+
+    # annuity_payment() is linear in the loan amount, so it works in cents too
+    base_monthly = np.floor(annuity_payment(loan, rate / RATE_UNITS_PER_PERCENT)
+                            + HALF_UP).astype(np.int64)
+    first_interest = interest_on(loan, rate)
+    total_interest = base_monthly * TERM_MONTHS - loan
+
+    total_principal = principal + extra
+    base = solve_fixed_principal_cents(loan, rate, principal)
+    has_extra = extra > 0
+    with_extra = solve_fixed_principal_cents(loan, rate, total_principal)
+    months_with_extra = np.where(has_extra, with_extra['payoff_months'], base['payoff_months'])
+
+    return {
+        'loan_amount': loan,
+        'principal_payment': principal,
+        'extra_payment': extra,
+        'monthly_fee': fee,
+        'total_principal': total_principal,
+        'monthly_interest': first_interest,
+        'monthly_payment': total_principal + first_interest + fee,
+        'base_monthly': base_monthly,
+        'total_interest': total_interest,
+        'base_months': base['payoff_months'],
+        'payoff_months': months_with_extra,
+        'final_payment': np.where(has_extra, with_extra['final_payment'],
+                                  base['final_payment']),
+        'time_saved_months': np.where(has_extra,
+                                      base['payoff_months'] - months_with_extra, 0),
+        'interest_saved': np.where(has_extra, total_interest - with_extra['total_interest'], 0),
+        'interest_paid': np.where(has_extra, with_extra['total_interest'],
+                                  base['total_interest']),
+    }
@@ -0,0 +1,478 @@
+# Refinance analysis: is it worth moving a loan to another lender?
+#
+# The current loan keeps its rate, principal and extra payments and monthly
+# fee. An offer takes over the outstanding balance at its own rate, with the
+# principal payment that repays it over the offer's term (or the current one
+# when the offer has no term), the same extra payment from the same month and
+# the offer's monthly fee, after one-off switching costs: the current lender's exit cost plus the
+# offer's fixed and percentage fees. Each month the cheaper loan saves its
+# difference in interest and fees; the break-even month is the first month in
+# which the savings so far cover the switching costs, and the net savings are
+# what is left over the life of the loans.
+#
+# Both loans repay a fixed amount every month, so the savings up to month m
+# are a quadratic in m between the months where either loan's payments
+# change: when the extra payments start and when each loan is repaid. The
+# break-even month is found from their roots rather than by stepping through
+# the months. Every loan x offer pair goes through
+# calculate_batch() in one broadcast call, so a whole portfolio is scanned
+# against a rate sheet in one run.
+#
+# Usage:
+#     python mortgage_refinance.py portfolio.csv --offers rate_sheet.csv --out refinance.csv
+import argparse
+import csv
+import sys
+
+import numpy as np
+
+from mortgage_engine import broadcast_inputs, calculate_batch
+from mortgage_inputs import format_months
+
+# STEP 1: Constants
+# Rate sheet columns; a blank term keeps the current principal payment and a
+# blank fee the current monthly fee, and currency limits an offer to loans in
+# that currency
+OFFER_FIELDS = ['name', 'interest_rate', 'term_years', 'monthly_fee', 'switching_cost',
+                'switching_percent', 'currency']
+# Portfolio columns besides the batch mode ones
+BALANCE_FIELDS = ['balance', 'exit_cost']
+REFINANCE_FIELDS = [
+    'rank', 'row', 'offer', 'currency', 'balance', 'current_rate', 'new_rate',
+    'principal_payment', 'new_principal_payment', 'switching_cost', 'break_even_month',
+    'break_even', 'interest_saved', 'net_savings', 'payoff_months', 'new_payoff_months',
+    'monthly_payment_change',
+]
+# Written with two decimals in the CSV
+AMOUNT_FIELDS = {'balance', 'principal_payment', 'new_principal_payment', 'switching_cost',
+                 'interest_saved', 'net_savings', 'monthly_payment_change'}
+NEVER = -1  # break_even_month of a switch that never pays for itself
+TOLERANCE = 1e-6  # Savings short of the costs by less than this count as covered
+
+
+# STEP 2: Break-even
+def _costs(balance, interest_rate, step, monthly_fee):
+    """(a, b): interest plus fees paid up to month m are a*m**2 + b*m until
+    the loan is repaid, for a loan repaying step a month"""
+    monthly_rate = interest_rate / 100 / 12
+    return (-monthly_rate * step / 2,
+            monthly_rate * balance + monthly_rate * step / 2 + monthly_fee)
+
+
+def _cost_pieces(balance, interest_rate, principal_payment, extra_payment, monthly_fee,
+                 prefix, total):
+    """(a, b, c) of each piece of a loan's costs: interest plus fees paid up to
+    month m are a*m**2 + b*m + c before extra payments start after month
+    prefix, after that, and (0, 0, total) once the loan is repaid"""
+    a, b = _costs(balance, interest_rate, principal_payment, monthly_fee)
+    # After the prefix: the costs of the rest of the loan, shifted by prefix
+    later_a, later_b = _costs(balance - prefix * principal_payment, interest_rate,
+                              principal_payment + extra_payment, monthly_fee)
+    later = (later_a, later_b - 2 * later_a * prefix,
+             (later_a * prefix - later_b) * prefix + (a * prefix + b) * prefix)
+    return (a, b, 0.0), later, (0.0, 0.0, total)
+
+
+def _piece(pieces, prefix, months, month):
+    """The (a, b, c) of _cost_pieces() that month is in"""
+    before, after, repaid = pieces
+    return tuple(np.where(month > months, done, np.where(month > prefix, later, early))
+                 for early, later, done in zip(before, after, repaid))
+
+
+def first_month_reached(a, b, c, low, high):
+    """Smallest whole month m in [low, high] with a*m**2 + b*m + c >= 0, or
+    NEVER; the quadratic is solved, not stepped
+
+    If the condition does not hold at low, the first month it holds is the
+    first whole month after a root, so only the months next to the roots
+    (and to the root of b*m + c where a is 0) need checking.
+    """
+    a, b, c, low, high = np.broadcast_arrays(*(np.asarray(value, dtype=np.float64)
+                                               for value in (a, b, c, low, high)))
+
+    def reached(month):
+        return ((a * month + b) * month + c >= -TOLERANCE) & (month >= low) & (month <= high)
+
+    found = np.where(reached(low), low, np.inf)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        root = np.sqrt(np.maximum(b * b - 4 * a * c, 0))
+        roots = [(-b - root) / (2 * a), (-b + root) / (2 * a), -c / b]
+    for candidate in roots:
+        candidate = np.ceil(np.where(np.isfinite(candidate), candidate, -1.0))
+        for month in (candidate - 1, candidate, candidate + 1):
+            found = np.where(reached(month), np.minimum(found, month), found)
+    return np.where(np.isfinite(found), found, NEVER).astype(np.int64)
+
+
+def refinance_batch(balance, interest_rate, principal_payment, extra_payment, monthly_fee,
+                    new_rate, new_principal_payment, new_monthly_fee, switching_cost,
+                    extra_start_month=1):
+    """Break-even month and savings of moving each balance to a new loan
+
+    Every argument is broadcast as in calculate_batch(). The current loan and
+    the new one both pay extra_payment on top of their principal payments,
+    from extra_start_month on.
+    Returns a dict of arrays: 'break_even_month' (NEVER if the savings never
+    cover the switching costs for good), 'interest_saved', 'fees_saved' and
+    'net_savings' over the life of the loans, 'payoff_months' and
+    'new_payoff_months', and the change in the first monthly payment.
+    """
+    balance, interest_rate, principal_payment, extra_payment, monthly_fee, new_rate, \
+        new_principal_payment, new_monthly_fee, switching_cost, extra_start_month = \
+        broadcast_inputs(balance, interest_rate, principal_payment, extra_payment, monthly_fee,
+                         new_rate, new_principal_payment, new_monthly_fee, switching_cost,
+                         extra_start_month)
+    current = calculate_batch(balance, interest_rate, principal_payment, extra_payment,
+                              monthly_fee, extra_start_month)
+    new = calculate_batch(balance, new_rate, new_principal_payment, extra_payment,
+                          new_monthly_fee, extra_start_month)
+    months = current['payoff_months']
+    new_months = new['payoff_months']
+    current_total = current['interest_paid'] + monthly_fee * months
+    new_total = new['interest_paid'] + new_monthly_fee * new_months
+
+    # Savings up to month m, the current loan's costs less the new loan's, on
+    # each stretch between the months where either loan's payments change;
+    # the first stretch where they cover the switching costs has the month
+    prefix = np.maximum(extra_start_month - 1, 0)
+    pieces = _cost_pieces(balance, interest_rate, principal_payment, extra_payment,
+                          monthly_fee, prefix, current_total)
+    new_pieces = _cost_pieces(balance, new_rate, new_principal_payment, extra_payment,
+                              new_monthly_fee, prefix, new_total)
+    break_even = np.full(balance.shape, NEVER, dtype=np.int64)
+    low = 1
+    for high in np.sort(np.stack([prefix, months, new_months]), axis=0):
+        if np.any(high >= low):  # Empty before extra payments made from month 1
+            a, b, c = _piece(pieces, prefix, months, high)
+            new_a, new_b, new_c = _piece(new_pieces, prefix, new_months, high)
+            found = first_month_reached(a - new_a, b - new_b, c - new_c - switching_cost,
+                                        low, high)
+            break_even = np.where(break_even == NEVER, found, break_even)
+        low = high + 1
+    # Savings that cover the costs early on but fall back below them by the
+    # end, as with a longer term at a lower rate, never pay for the switch
+    net_savings = current_total - new_total - switching_cost
+    break_even = np.where(net_savings >= -TOLERANCE, break_even, NEVER)
+    interest_saved = current['interest_paid'] - new['interest_paid']
+
+    return {
+        'break_even_month': break_even,
+        'interest_saved': interest_saved,
+        'fees_saved': current_total - new_total - interest_saved,
+        'net_savings': net_savings,
+        'switching_cost': switching_cost,
+        'payoff_months': months,
+        'new_payoff_months': new_months,
+        'new_principal_payment': new_principal_payment,
+        'monthly_payment_change': new['monthly_payment'] - current['monthly_payment'],
+    }
+
+
+def term_principal(balance, term_years):
+    """Principal payment, rounded up to the cent, that repays balance over
+    term_years"""
+    return np.ceil(np.asarray(balance) * 100 / (np.asarray(term_years) * 12) - 1e-9) / 100
+
+
+# STEP 3: Portfolio Scan
+def scan_portfolio(loans, offers):
+    """Price every loan against every offer and rank the offers per loan
+
+    loans is a dict of arrays with 'balance', 'interest_rate',
+    'principal_payment', 'extra_payment', 'monthly_fee', 'extra_start_month',
+    'exit_cost' and 'currency' (ISO codes); offers a dict of OFFER_FIELDS arrays, with NaN
+    for a blank term or fee and '' for an offer open to every currency.
+    Returns refinance_batch() results as (loans x offers) arrays plus
+    'eligible' and 'rank' (1 is the largest net savings; 0 where the offer
+    does not apply to the loan).
+    """
+    column = {name: np.asarray(loans[name])[:, None] for name in
+              ('balance', 'interest_rate', 'principal_payment', 'extra_payment', 'monthly_fee',
+               'extra_start_month', 'exit_cost', 'currency')}
+    row = {name: np.asarray(offers[name])[None, :] for name in OFFER_FIELDS[1:]}
+    if not len(row['interest_rate'][0]):
+        raise ValueError("The rate sheet has no offers")
+
+    term = row['term_years']
+    new_principal = np.where(np.isfinite(term) & (term > 0),
+                             term_principal(column['balance'], np.where(term > 0, term, 1)),
+                             column['principal_payment'])
+    new_fee = np.where(np.isfinite(row['monthly_fee']), row['monthly_fee'],
+                       column['monthly_fee'])
+    switching_cost = (column['exit_cost'] + row['switching_cost']
+                      + row['switching_percent'] / 100 * column['balance'])
+    results = refinance_batch(column['balance'], column['interest_rate'],
+                              column['principal_payment'], column['extra_payment'],
+                              column['monthly_fee'], row['interest_rate'], new_principal,
+                              new_fee, switching_cost, column['extra_start_month'])
+
+    eligible = (row['currency'] == '') | (row['currency'] == column['currency'])
+    # Best first: the largest net savings, ties by the earliest break-even
+    break_even = np.where(results['break_even_month'] == NEVER, np.inf,
+                          results['break_even_month'])
+    order = np.lexsort((break_even, -np.where(eligible, results['net_savings'], -np.inf)))
+    rank = np.empty_like(order)
+    np.put_along_axis(rank, order, np.arange(1, order.shape[1] + 1)[None, :], axis=1)
+    results.update(eligible=eligible, rank=np.where(eligible, rank, 0))
+    return results
+
+
+def refinance_rows(loans, offers, results, top=1):
+    """One dict of REFINANCE_FIELDS per loan and offer, for the top offers of
+    every loan (all eligible offers when top is 0), largest net savings first"""
+    keep = results['eligible'] & ((results['rank'] <= top) if top else True)
+    loan_index, offer_index = np.nonzero(keep)
+    order = np.lexsort((results['rank'][keep], loan_index, -results['net_savings'][keep]))
+    loan_index, offer_index = loan_index[order], offer_index[order]
+
+    columns = {
+        'rank': results['rank'][loan_index, offer_index],
+        'row': np.asarray(loans['row'])[loan_index],
+        'balance': np.asarray(loans['balance'])[loan_index],
+        'current_rate': np.asarray(loans['interest_rate'])[loan_index],
+        'new_rate': np.asarray(offers['interest_rate'])[offer_index],
+        'principal_payment': np.asarray(loans['principal_payment'])[loan_index],
+    }
+    for name in ('new_principal_payment', 'switching_cost', 'break_even_month',
+                 'interest_saved', 'net_savings', 'payoff_months', 'new_payoff_months',
+                 'monthly_payment_change'):
+        columns[name] = results[name][loan_index, offer_index]
+    columns = {name: column.tolist() for name, column in columns.items()}
+    names = [offers['name'][position] for position in offer_index.tolist()]
+    currencies = [loans['currency'][position] for position in loan_index.tolist()]
+
+    rows = []
+    for position, (name, currency) in enumerate(zip(names, currencies)):
+        row = {field: column[position] for field, column in columns.items()}
+        month = row['break_even_month']
+        row.update(offer=name, currency=currency,
+                   break_even="Never" if month == NEVER else format_months(month))
+        rows.append(row)
+    return rows
+
+
+# STEP 4: Portfolio and Rate Sheet Files
+def read_portfolio(input_file, decimal=None):
+    """Read loans from a CSV with the batch input columns plus optional
+    'balance' (the loan amount when blank) and 'exit_cost' columns
+
+    Returns (loans, errors): the valid loans as scan_portfolio() takes them,
+    with their spreadsheet 'row' numbers and currency symbols, and a dict
+    mapping the row number of every rejected row to its error message.
+    """
+    from mortgage_batch import NUMERIC_FIELDS, parse_columns
+    from mortgage_engine import validate_batch
+    from mortgage_fx import currency_code
+    from mortgage_inputs import parse_amounts
+
+    rows = list(csv.DictReader(input_file))
+    columns, errors = parse_columns(rows, decimal)
+    for field in BALANCE_FIELDS:
+        raw = [(row.get(field) or '').strip() for row in rows]
+        values, field_errors = parse_amounts(raw, decimal)
+        for position, message in field_errors.items():
+            errors.setdefault(position, message)
+        columns[field] = np.array(values, dtype=np.float64)
+        if field == 'balance' and rows:
+            columns[field] = np.where([not value for value in raw],
+                                      columns['loan_seeking'] - columns['down_payment'],
+                                      columns[field])
+    rule_errors = validate_batch(*(columns[field] for field in NUMERIC_FIELDS))
+    rule_errors = np.where(columns['balance'] <= 0, "Balance must be greater than 0",
+                           rule_errors)
+    rule_errors = np.where(columns['exit_cost'] < 0, "Exit cost cannot be negative",
+                           rule_errors)
+    for position, error in enumerate(rule_errors.tolist()):
+        if error:
+            errors.setdefault(position, error)
+
+    valid = np.array([position not in errors for position in range(len(rows))], dtype=bool)
+    loans = {field: columns[field][valid] for field in
+             ('balance', 'interest_rate', 'principal_payment', 'extra_payment', 'monthly_fee',
+              'extra_start_month', 'exit_cost')}
+    # Row numbers count the header as row 1, like a spreadsheet
+    loans['row'] = np.flatnonzero(valid) + 2
+    symbols = [currency for currency, ok in zip(columns['currency'], valid.tolist()) if ok]
+    loans['currency'] = np.array([currency_code(symbol) for symbol in symbols], dtype=object)
+    return loans, {position + 2: message for position, message in sorted(errors.items())}
+
+
+def read_rate_sheet(input_file, decimal=None):
+    """Read offers from a CSV with OFFER_FIELDS columns
+
+    Only interest_rate is required. Returns (offers, errors) like
+    read_portfolio(), with the offers as scan_portfolio() takes them.
+    """
+    from mortgage_fx import currency_code
+    from mortgage_inputs import CURRENCY_CODES, parse_amounts
+
+    rows = list(csv.DictReader(input_file))
+    errors = {}
+    columns = {}
+    for field in OFFER_FIELDS[1:-1]:
+        raw = [(row.get(field) or '').strip() for row in rows]
+        values, field_errors = parse_amounts(raw, decimal)
+        for position, message in field_errors.items():
+            errors.setdefault(position, message)
+        values = np.array(values, dtype=np.float64)
+        if field in ('term_years', 'monthly_fee'):
+            values[[not value for value in raw]] = np.nan  # Keep the current loan's
+        elif field == 'interest_rate':
+            for position, value in enumerate(raw):
+                if not value:
+                    errors.setdefault(position, "Interest rate is required")
+        columns[field] = values
+
+    checks = [
+        ((columns['interest_rate'] <= 0) | (columns['interest_rate'] >= 100),
+         "Interest rate must be between 0 and 100"),
+        (columns['term_years'] <= 0, "Term must be greater than 0 years"),
+        (columns['monthly_fee'] < 0, "Monthly house fee cannot be negative"),
+        (columns['switching_cost'] < 0, "Switching cost cannot be negative"),
+        (columns['switching_percent'] < 0, "Switching percent cannot be negative"),
+    ]
+    codes = set(CURRENCY_CODES.values())
+    currencies = []
+    for position, row in enumerate(rows):
+        currency = (row.get('currency') or '').strip()
+        code = currency_code(currency) if currency else ''
+        if code and code not in codes:
+            errors.setdefault(position, f"Unsupported currency: {currency}")
+        currencies.append(code)
+    for failed, message in checks:
+        for position in np.flatnonzero(failed).tolist():
+            errors.setdefault(position, message)
+
+    valid = np.array([position not in errors for position in range(len(rows))], dtype=bool)
+    offers = {field: columns[field][valid] for field in OFFER_FIELDS[1:-1]}
+    offers['name'] = [(row.get('name') or '').strip() or f"Offer {position + 1}"
+                      for position, row in enumerate(rows) if position not in errors]
+    offers['currency'] = np.array([code for code, ok in zip(currencies, valid.tolist()) if ok],
+                                  dtype=object)
+    return offers, {position + 2: message for position, message in sorted(errors.items())}
+
+
+# STEP 5: Export
+def write_refinance_csv(output, rows):
+    """Write the refinance rows, largest net savings first"""
+    if isinstance(output, str):
+        with open(output, 'w', newline='', encoding='utf-8') as output_file:
+            return write_refinance_csv(output_file, rows)
+
+    writer = csv.DictWriter(output, fieldnames=REFINANCE_FIELDS, extrasaction='ignore')
+    writer.writeheader()
+    for row in rows:
+        writer.writerow({name: f"{value:.2f}" if name in AMOUNT_FIELDS else value
+                         for name, value in row.items()})
+
+
+def write_refinance_pdf(filename, rows, title="Refinance Analysis", rows_per_page=40):
+    """Write the refinance rows as a ranked PDF table, repeating the header
+    on every page; switches that never pay off are shown in grey
+
+    Returns the number of pages written.
+    """
+    from reportlab.lib.pagesizes import landscape, letter
+    from reportlab.pdfgen import canvas
+
+    pagesize = landscape(letter)
+    c = canvas.Canvas(filename, pagesize=pagesize, pageCompression=1)
+    width, height = pagesize
+    # (caption, right edge, row -> text)
+    columns = [
+        ("Row", 80, lambda row: str(row['row'])),
+        ("Offer", 90, lambda row: row['offer'][:20]),
+        ("Balance", 270, lambda row: f"{row['currency']} {row['balance']:,.0f}"),
+        ("Rate", 310, lambda row: f"{row['current_rate']:g}%"),
+        ("New rate", 360, lambda row: f"{row['new_rate']:g}%"),
+        ("Payment change", 440, lambda row: f"{row['monthly_payment_change']:+,.0f}"),
+        ("Switching", 500, lambda row: f"{row['switching_cost']:,.0f}"),
+        ("Interest saved", 580, lambda row: f"{row['interest_saved']:,.0f}"),
+        ("Net savings", 650, lambda row: f"{row['net_savings']:,.0f}"),
+        ("Break-even", width - 50, lambda row: row['break_even']),
+    ]
+    pages = 0
+
+    for start in range(0, max(len(rows), 1), rows_per_page):
+        pages += 1
+        c.setFont("Helvetica-Bold", 14)
+        c.drawString(50, height - 50, title)
+        c.line(50, height - 58, width - 50, height - 58)
+        c.setFont("Helvetica", 8)
+        c.drawString(50, height - 72, f"{len(rows)} loan offers, largest net savings first")
+        c.drawRightString(width - 50, height - 72, f"Page {pages}")
+
+        y = height - 92
+        c.setFont("Helvetica-Bold", 8)
+        for caption, x, _ in columns:
+            if caption == "Offer":
+                c.drawString(x, y, caption)
+            else:
+                c.drawRightString(x, y, caption)
+        c.line(50, y - 4, width - 50, y - 4)
+
+        c.setFont("Helvetica", 8)
+        for row in rows[start:start + rows_per_page]:
+            y -= 12
+            c.setFillGray(0.5 if row['break_even_month'] == NEVER else 0)
+            for caption, x, text in columns:
+                if caption == "Offer":
+                    c.drawString(x, y, text(row))
+                else:
+                    c.drawRightString(x, y, text(row))
+        c.setFillGray(0)
+        c.showPage()
+
+    c.save()
+    return pages
+
+
+# STEP 6: Command Line Interface
+def main(argv=None):
+    """Scan a portfolio against a rate sheet and export the ranked offers"""
+    from mortgage_batch import DECIMAL_SEPARATORS
+
+    parser = argparse.ArgumentParser(description="Refinance break-even analysis")
+    parser.add_argument('portfolio', help="CSV file with one loan per row")
+    parser.add_argument('--offers', required=True, help="Rate sheet CSV with one offer per row")
+    parser.add_argument('--top', type=int, default=1,
+                        help="Best offers to list per loan (0 lists every offer)")
+    parser.add_argument('--decimal', choices=sorted(DECIMAL_SEPARATORS), default='auto',
+                        help="Decimal separator of the amounts")
+    parser.add_argument('--out', required=True, help="Output .csv or .pdf file")
+    args = parser.parse_args(argv)
+
+    decimal = DECIMAL_SEPARATORS[args.decimal]
+    with open(args.portfolio, newline='', encoding='utf-8-sig') as input_file:
+        loans, loan_errors = read_portfolio(input_file, decimal)
+    with open(args.offers, newline='', encoding='utf-8-sig') as input_file:
+        offers, offer_errors = read_rate_sheet(input_file, decimal)
+    for label, errors in (("Row", loan_errors), ("Rate sheet row", offer_errors)):
+        for row_number, message in errors.items():
+            print(f"{label} {row_number}: {message}", file=sys.stderr)
+    if args.top < 0:
+        print("Error: --top cannot be negative", file=sys.stderr)
+        return 1
+    try:
+        results = scan_portfolio(loans, offers)
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+
+    rows = refinance_rows(loans, offers, results, args.top)
+    if args.out.lower().endswith('.pdf'):
+        write_refinance_pdf(args.out, rows)
+    else:
+        write_refinance_csv(args.out, rows)
+    best = results['rank'] == 1
+    worth = int(np.count_nonzero(best & (results['net_savings'] > 0)
+                                 & (results['break_even_month'] != NEVER)))
+    print(f"Scanned {len(loans['row'])} loans against {len(offers['name'])} offers "
+          f"({len(loan_errors)} loans and {len(offer_errors)} offers rejected); "
+          f"{worth} loans save by switching. Wrote {args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
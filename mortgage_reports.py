@@ -0,0 +1,403 @@
+# Customer PDF reports for a whole portfolio, e.g. at month-end.
+#
+# Each report is the results summary of one loan, as "Export PDF" writes it,
+# plus balance-over-time charts without and with the extra payments. Whatever
+# is the same on every page (title, rules, section headings, labels, chart
+# frames and gridlines) is built once per process as a string of PDF
+# operators and placed in each document as a form XObject, so a document
+# only draws its own values and two chart lines. Balances are sampled at no
+# more than CHART_POINTS months, so a 40 year loan draws no more points than
+# a 5 year one. The portfolio is read in chunks that are rendered by a pool
+# of worker processes.
+#
+# Usage:
+#     python mortgage_reports.py portfolio.csv --out-dir reports --workers 8
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from mortgage_engine import broadcast_inputs
+from mortgage_inputs import format_months
+
+# STEP 1: Constants
+DEFAULT_CHUNK_SIZE = 250  # Reports per worker task
+DEFAULT_PREFIX = 'mortgage_report'
+CHART_POINTS = 60  # Most balance samples drawn per chart line
+
+PAGE_WIDTH, PAGE_HEIGHT = 612, 792  # Letter, in points
+# Fonts the layout uses, registered in this order in every document so the
+# layout's font names resolve the same way in all of them
+LAYOUT_FONTS = ['Helvetica', 'Helvetica-Bold']
+# (heading, x, y of the heading, labels); each label's value is drawn after it
+SECTIONS = [
+    ("Loan Details", 50, 690, ["Loan Seeking For:", "Down Payment:", "Loan Amount:",
+                               "Interest Rate:", "Extra Payments From:"]),
+    ("Monthly Payment Breakdown", 320, 690, [
+        "Principal Payment:", "Extra Payment:", "Total Principal:", "Interest Payment:",
+        "Monthly House Fee:", "Total Monthly Payment:"]),
+    ("With Extra Payments", 50, 540, ["Time Saved:", "Interest Saved:", "Loan Payoff Time:"]),
+]
+LABEL_INDENT = 20
+VALUE_OFFSET = 130  # From the label to its value
+LINE_HEIGHT = 18
+# (title, left, bottom) of the two charts, which share one scale
+CHARTS = [("Without Extra Payment", 50, 230), ("With Extra Payment", 326, 230)]
+CHART_WIDTH, CHART_HEIGHT = 236, 200
+
+
+# STEP 2: Page Layout
+def _layout_code(c):
+    """PDF operators for everything every report shares, drawn with c's fonts"""
+    text = c.beginText()
+    text.setFont("Helvetica-Bold", 16)
+    text.setTextOrigin(50, PAGE_HEIGHT - 50)
+    text.textOut("Mortgage Calculator Results")
+    text.setFont("Helvetica", 10)
+    text.setTextOrigin(50, PAGE_HEIGHT - 80)
+    text.textOut("Generated on:")
+    text.setTextOrigin(320, PAGE_HEIGHT - 80)
+    text.textOut("Prepared for:")
+    for heading, x, y, labels in SECTIONS:
+        text.setFont("Helvetica-Bold", 12)
+        text.setTextOrigin(x, y)
+        text.textOut(heading)
+        text.setFont("Helvetica", 10)
+        for position, label in enumerate(labels, start=1):
+            text.setTextOrigin(x + LABEL_INDENT, y - 6 - position * LINE_HEIGHT)
+            text.textOut(label)
+    for title, left, bottom in CHARTS:
+        text.setFont("Helvetica-Bold", 12)
+        text.setTextOrigin(left, bottom + CHART_HEIGHT + 12)
+        text.textOut(title)
+        text.setFont("Helvetica", 8)
+        text.setTextOrigin(left, bottom - 24)
+        text.textOut("Balance by year")
+
+    rules = c.beginPath()
+    rules.moveTo(50, PAGE_HEIGHT - 60)
+    rules.lineTo(PAGE_WIDTH - 50, PAGE_HEIGHT - 60)
+    frames = c.beginPath()
+    grid = c.beginPath()
+    for _, left, bottom in CHARTS:
+        frames.rect(left, bottom, CHART_WIDTH, CHART_HEIGHT)
+        for fraction in (0.25, 0.5, 0.75):
+            y = bottom + fraction * CHART_HEIGHT
+            grid.moveTo(left, y)
+            grid.lineTo(left + CHART_WIDTH, y)
+            x = left + fraction * CHART_WIDTH
+            grid.moveTo(x, bottom)
+            grid.lineTo(x, bottom + CHART_HEIGHT)
+    # Gridlines in light grey, then back to black
+    return ' '.join([text.getCode(), '0.85 G', grid.getCode(), 'S', '0 G',
+                     rules.getCode(), frames.getCode(), 'S'])
+
+
+class ReportLayout:
+    """The shared part of the report page, built once per process"""
+
+    _code = None
+
+    @classmethod
+    def code(cls):
+        """PDF operators of the layout, for a canvas with LAYOUT_FONTS registered"""
+        if cls._code is None:
+            from reportlab.pdfgen import canvas
+
+            scratch = canvas.Canvas(os.devnull, pagesize=(PAGE_WIDTH, PAGE_HEIGHT))
+            _register_fonts(scratch)
+            cls._code = _layout_code(scratch)
+        return cls._code
+
+    @classmethod
+    def place(cls, c):
+        """Add the layout to canvas c as a form XObject and draw it"""
+        _register_fonts(c)
+        c.beginForm('layout', 0, 0, PAGE_WIDTH, PAGE_HEIGHT)
+        c.addLiteral(cls.code())
+        c.endForm()
+        c.doForm('layout')
+
+
+def init_worker():
+    """Write binary PDF streams in this process
+
+    ASCII85 only keeps the compressed streams 7-bit clean, and without
+    reportlab's optional C accelerator its encoder takes longer than drawing
+    and compressing the whole report.
+    """
+    from reportlab import rl_config
+
+    rl_config.useA85 = 0
+
+
+class BinaryStreams:
+    """Write binary PDF streams inside a with block, as init_worker() does
+    for the whole of a worker process"""
+
+    def __enter__(self):
+        from reportlab import rl_config
+
+        self.saved = rl_config.useA85
+        rl_config.useA85 = 0
+        return self
+
+    def __exit__(self, *exc_info):
+        from reportlab import rl_config
+
+        rl_config.useA85 = self.saved
+
+
+def _register_fonts(c):
+    """Give the layout fonts their internal names in c's document"""
+    for font in LAYOUT_FONTS:
+        c.setFont(font, 10)
+
+
+# STEP 3: Balance Charts
+def balance_samples(loan_amount, principal_payment, extra_payment, extra_start_month,
+                    months, points=CHART_POINTS):
+    """Balances of a batch of loans at up to points months from 0 to months
+
+    Returns (month, without_extra, with_extra) arrays of shape (loans,
+    points). The balance falls by a fixed amount every month, so it is
+    evaluated in closed form at the sampled months rather than stepped; the
+    month extra payments start is always sampled, so each line keeps its
+    bend. Loans shorter than points months are sampled every month.
+    """
+    loan_amount, principal_payment, extra_payment, extra_start_month, months = (
+        value.reshape(-1, 1) for value in broadcast_inputs(
+            loan_amount, principal_payment, extra_payment, extra_start_month, months))
+    steps = np.minimum(months, points - 2)
+    fraction = np.minimum(np.arange(points - 1) / np.maximum(steps, 1), 1)
+    month = np.sort(np.concatenate(
+        [np.round(fraction * months), np.clip(extra_start_month - 1, 0, months)], axis=1),
+        axis=1)
+    without_extra = np.maximum(loan_amount - principal_payment * month, 0)
+    with_extra = np.maximum(without_extra - extra_payment * np.maximum(
+        month - extra_start_month + 1, 0), 0)
+    return month, without_extra, with_extra
+
+
+def chart_paths(left, bottom, month, balance, x_scale, y_scale):
+    """PDF operators stroking each loan's balance line in the chart at left,
+    bottom; all the points of a batch are scaled at once"""
+    x = left + month * np.asarray(x_scale)[:, None]
+    y = bottom + balance * np.asarray(y_scale)[:, None]
+    points = np.stack([x, y], axis=2).reshape(len(x), -1).tolist()
+    line = '%.1f %.1f m' + ' %.1f %.1f l' * (month.shape[1] - 1) + ' S'
+    return [line % tuple(row) for row in points]
+
+
+# STEP 4: Report Rendering
+def report_values(loans, results):
+    """Text of every report value, one list per loan in SECTIONS order"""
+    columns = {name: np.asarray(values).tolist() for name, values in results.items()}
+    inputs = {name: np.asarray(loans[name]).tolist() for name in (
+        'loan_seeking', 'down_payment', 'interest_rate', 'extra_start_month')}
+    values = []
+    for position, currency in enumerate(loans['currency']):
+        def money(amount):
+            return f"{currency}{amount:,.0f}"
+        values.append([
+            money(inputs['loan_seeking'][position]),
+            money(inputs['down_payment'][position]),
+            money(columns['loan_amount'][position]),
+            f"{inputs['interest_rate'][position]:g}%",
+            f"Year {int(inputs['extra_start_month'][position] - 1) // 12 + 1}",
+            money(columns['principal_payment'][position]),
+            money(columns['extra_payment'][position]),
+            money(columns['total_principal'][position]),
+            money(columns['monthly_interest'][position]),
+            money(columns['monthly_fee'][position]),
+            money(columns['monthly_payment'][position]),
+            format_months(columns['time_saved_months'][position]),
+            money(columns['interest_saved'][position]),
+            format_months(columns['payoff_months'][position]),
+        ])
+    return values
+
+
+def _value_columns():
+    """(x, y of the first value, count) of every section's values; each
+    column is drawn as lines of text, which skips measuring every value"""
+    return [(x + LABEL_INDENT + VALUE_OFFSET, y - 6 - LINE_HEIGHT, len(labels))
+            for _, x, y, labels in SECTIONS]
+
+
+def render_reports(loans, out_dir, prefix=DEFAULT_PREFIX, generated=None):
+    """Write one report PDF per loan and return the filenames
+
+    loans is a dict of arrays: 'row' (used in the filename), 'customer',
+    'currency', 'extra_start_month' and the batch mode numeric fields.
+    """
+    from reportlab.pdfgen import canvas
+
+    from mortgage_engine import calculate_batch
+
+    generated = generated or time.strftime('%Y-%m-%d %H:%M:%S')
+    loan_amount = np.asarray(loans['loan_seeking']) - np.asarray(loans['down_payment'])
+    results = calculate_batch(loan_amount, loans['interest_rate'], loans['principal_payment'],
+                              loans['extra_payment'], loans['monthly_fee'],
+                              loans['extra_start_month'])
+    month, without_extra, with_extra = balance_samples(
+        loan_amount, loans['principal_payment'], loans['extra_payment'],
+        loans['extra_start_month'], results['base_months'])
+    x_scale = CHART_WIDTH / np.maximum(results['base_months'], 1)
+    y_scale = CHART_HEIGHT / loan_amount
+    paths = [chart_paths(left, bottom, month, balance, x_scale, y_scale)
+             for (_, left, bottom), balance in zip(CHARTS, (without_extra, with_extra))]
+    value_columns = _value_columns()
+    os.makedirs(out_dir, exist_ok=True)
+
+    filenames = []
+    for position, values in enumerate(report_values(loans, results)):
+        filename = os.path.join(out_dir, f"{prefix}_{loans['row'][position]}.pdf")
+        c = canvas.Canvas(filename, pagesize=(PAGE_WIDTH, PAGE_HEIGHT))
+        ReportLayout.place(c)
+
+        text = c.beginText()
+        text.setFont("Helvetica", 10, LINE_HEIGHT)
+        text.setTextOrigin(120, PAGE_HEIGHT - 80)
+        text.textLine(generated)
+        text.setTextOrigin(386, PAGE_HEIGHT - 80)
+        text.textLine(loans['customer'][position] or f"Row {loans['row'][position]}")
+        first = 0
+        for x, y, count in value_columns:
+            text.setTextOrigin(x, y)
+            for value in values[first:first + count]:
+                text.textLine(value)
+            first += count
+        # Axis labels: the loan amount at the top, the years along the bottom
+        years = int(results['base_months'][position]) / 12
+        text.setFont("Helvetica", 8)
+        for _, left, bottom in CHARTS:
+            text.setTextOrigin(left + 3, bottom + CHART_HEIGHT - 10)
+            text.textLine(values[2])
+            for fraction in (0, 0.5, 1):
+                text.setTextOrigin(left + fraction * (CHART_WIDTH - 14), bottom - 11)
+                text.textLine(f"{years * fraction:.0f}")
+        c.drawText(text)
+
+        c.setLineWidth(1.5)
+        c.setStrokeColorRGB(0.13, 0.46, 0.85)
+        c.addLiteral(paths[0][position])
+        c.addLiteral(paths[1][position])
+        c.showPage()
+        c.save()
+        filenames.append(filename)
+    return filenames
+
+
+def render_chunk(chunk, out_dir, prefix=DEFAULT_PREFIX, decimal=None, generated=None):
+    """Parse, validate and render one chunk of (row number, raw row) pairs
+
+    Runs inside a worker process. Returns (filenames, rejects), with rejects
+    as (row number, error message) pairs.
+    """
+    from mortgage_batch import NUMERIC_FIELDS, parse_columns
+    from mortgage_engine import validate_batch
+
+    rows = [row for _, row in chunk]
+    columns, errors = parse_columns(rows, decimal)
+    rule_errors = validate_batch(*(columns[field] for field in NUMERIC_FIELDS))
+    for position, error in enumerate(rule_errors.tolist()):
+        if error:
+            errors.setdefault(position, error)
+
+    kept = [position for position in range(len(rows)) if position not in errors]
+    loans = {field: columns[field][kept] for field in NUMERIC_FIELDS}
+    loans.update(
+        row=[chunk[position][0] for position in kept],
+        customer=[(rows[position].get('customer') or '').strip() for position in kept],
+        currency=[columns['currency'][position] for position in kept],
+        extra_start_month=columns['extra_start_month'][kept].astype(np.float64),
+    )
+    filenames = render_reports(loans, out_dir, prefix, generated) if kept else []
+    rejects = [(chunk[position][0], message) for position, message in sorted(errors.items())]
+    return filenames, rejects
+
+
+def render_portfolio(input_path, out_dir, workers=None, chunk_size=DEFAULT_CHUNK_SIZE,
+                     prefix=DEFAULT_PREFIX, decimal=None):
+    """Render a report for every valid row of a portfolio CSV
+
+    Chunks are rendered by a pool of worker processes (all CPUs by default),
+    or in this process when workers is 1. Returns a stats dict with
+    'reports', 'rejects' (row number, message pairs), 'seconds' and
+    'reports_per_second'.
+    """
+    from mortgage_batch import read_chunks
+
+    start = time.perf_counter()
+    generated = time.strftime('%Y-%m-%d %H:%M:%S')
+    workers = workers or os.cpu_count() or 1
+    reports = 0
+    rejects = []
+    with open(input_path, newline='', encoding='utf-8-sig') as input_file:
+        chunks = read_chunks(input_file, chunk_size)
+        if workers == 1:
+            with BinaryStreams():
+                for chunk in chunks:
+                    filenames, chunk_rejects = render_chunk(chunk, out_dir, prefix, decimal,
+                                                            generated)
+                    reports += len(filenames)
+                    rejects.extend(chunk_rejects)
+        else:
+            with ProcessPoolExecutor(max_workers=workers, initializer=init_worker) as executor:
+                futures = [executor.submit(render_chunk, chunk, out_dir, prefix, decimal,
+                                           generated) for chunk in chunks]
+                for future in futures:
+                    filenames, chunk_rejects = future.result()
+                    reports += len(filenames)
+                    rejects.extend(chunk_rejects)
+
+    elapsed = time.perf_counter() - start
+    return {
+        'reports': reports,
+        'rejects': rejects,
+        'seconds': elapsed,
+        'reports_per_second': reports / elapsed if elapsed > 0 else 0.0,
+    }
+
+
+# STEP 5: Command Line Interface
+def main(argv=None):
+    """Render a customer report for every loan in a portfolio CSV"""
+    from mortgage_batch import DECIMAL_SEPARATORS
+
+    parser = argparse.ArgumentParser(description="Render customer PDF reports in bulk")
+    parser.add_argument('portfolio', help="CSV file with one loan per row")
+    parser.add_argument('--out-dir', required=True, help="Directory to write the reports to")
+    parser.add_argument('--prefix', default=DEFAULT_PREFIX,
+                        help="Report filename prefix, followed by the row number")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="Worker processes (default: all CPUs, 1 renders in-process)")
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE,
+                        help="Reports per worker task")
+    parser.add_argument('--decimal', choices=sorted(DECIMAL_SEPARATORS), default='auto',
+                        help="Decimal separator of the amounts")
+    args = parser.parse_args(argv)
+
+    if args.chunk_size < 1 or (args.workers is not None and args.workers < 1):
+        print("Error: --workers and --chunk-size must be at least 1", file=sys.stderr)
+        return 1
+    try:
+        stats = render_portfolio(args.portfolio, args.out_dir, args.workers, args.chunk_size,
+                                 args.prefix, DECIMAL_SEPARATORS[args.decimal])
+    except OSError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    for row_number, message in stats['rejects']:
+        print(f"Row {row_number}: {message}", file=sys.stderr)
+    print(f"Rendered {stats['reports']} reports ({len(stats['rejects'])} rows rejected) "
+          f"in {stats['seconds']:.2f}s, {stats['reports_per_second']:,.0f} reports/sec. "
+          f"Wrote {args.out_dir}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
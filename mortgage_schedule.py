@@ -0,0 +1,401 @@
+# Month-by-month amortization schedules and their CSV/PDF exporters.
+#
+# Rows come from generators, and both writers consume them one row at a time,
+# so exporting thousands of schedules never holds more than one page of rows.
+# A Schedule holds one loan's rows as a few closed-form segments instead, for
+# views that jump around in the schedule and for edits that reuse it.
+import csv
+import os
+from collections import namedtuple
+from collections.abc import Sequence
+
+import mortgage_metrics as metrics
+
+# STEP 1: Schedule Rows
+ScheduleRow = namedtuple('ScheduleRow', [
+    'month', 'payment', 'principal', 'extra', 'interest', 'fee', 'balance',
+    'total_interest', 'total_paid',
+])
+
+SCHEDULE_FIELDS = list(ScheduleRow._fields)
+PORTFOLIO_FIELDS = ['loan'] + SCHEDULE_FIELDS
+
+
+def schedule_rows(loan_amount, interest_rate, principal_payment,
+                  extra_payment=0.0, monthly_fee=0.0, extra_start_month=1):
+    """Yield one ScheduleRow per month until the loan is repaid
+
+    Each month interest is charged on the remaining balance, then the
+    principal and extra payments are applied. The last payment is capped at
+    the remaining balance, and extra payments start in extra_start_month. The
+    schedule is stepped in integer cents with the rounding rule of
+    mortgage_money, so the principal and extra payments add up to the loan
+    amount exactly and the interest to the exact total. Running totals of
+    interest and of everything paid are carried on every row. build_schedule()
+    returns the same rows as a Schedule that later edits can reuse.
+    """
+    from mortgage_money import INTEREST_DIVISOR, to_cents, to_rate_units
+
+    loan, principal_payment, extra_payment, monthly_fee = (
+        int(to_cents(amount)) for amount in (loan_amount, principal_payment,
+                                             extra_payment, monthly_fee))
+    if principal_payment + extra_payment <= 0:
+        raise ValueError("Principal payment must be greater than 0")
+
+    # interest_on() inlined: accrued interest rounded half up
+    double_rate = 2 * int(to_rate_units(interest_rate))
+    double_divisor = 2 * INTEREST_DIVISOR
+    balance = loan
+    balance_months = 0
+    total_interest = 0
+    total_paid = 0
+    month = 0
+    while balance > 0:
+        month += 1
+        balance_months += balance
+        due = (balance_months * double_rate + INTEREST_DIVISOR) // double_divisor
+        interest = due - total_interest
+        total_interest = due
+        principal = principal_payment if principal_payment < balance else balance
+        balance -= principal
+        if month >= extra_start_month:
+            extra = extra_payment if extra_payment < balance else balance
+            balance -= extra
+        else:
+            extra = 0
+        payment = principal + extra + interest + monthly_fee
+        total_paid += payment
+        yield ScheduleRow(month, payment / 100, principal / 100, extra / 100,
+                          interest / 100, monthly_fee / 100, balance / 100,
+                          total_interest / 100, total_paid / 100)
+
+
+class Schedule(Sequence):
+    """One loan's schedule as a read-only sequence of ScheduleRows
+
+    The months are held as a few segments in which the same principal and
+    extra payment are made. Within a segment the opening balance falls by
+    the same amount every month, so the balance and the interest accrued up
+    to any month have a closed form in integer cents, and any row is built
+    in O(1) on access, exactly as schedule_rows() would yield it. The fee
+    only enters when rows are built, so a new fee never steps the loan again.
+    """
+
+    def __init__(self, loan_inputs, terms, fee, segments, months):
+        """loan_inputs are the build_schedule() arguments other than the fee,
+        terms the same in cents and rate units, fee is in cents and segments
+        are (first month, opening balance, balance-months before it,
+        principal, extra) in cents"""
+        self.loan_inputs = loan_inputs
+        self.terms = terms
+        self.fee = fee
+        self.segments = segments
+        self.months = months
+
+    def __len__(self):
+        return self.months
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._row(position) for position in range(*index.indices(self.months))]
+        if index < 0:
+            index += self.months
+        if not 0 <= index < self.months:
+            raise IndexError("schedule index out of range")
+        return self._row(index)
+
+    def __iter__(self):
+        from mortgage_money import INTEREST_DIVISOR
+
+        loan, rate, _, _, _ = self.terms
+        fee = self.fee
+        double_rate = 2 * rate
+        double_divisor = 2 * INTEREST_DIVISOR
+        charged_before = 0
+        ends = [segment[0] - 1 for segment in self.segments[1:]] + [self.months]
+        for (month, balance, balance_months, principal_payment, extra_payment), end in zip(
+                self.segments, ends):
+            for month in range(month, end + 1):
+                balance_months += balance
+                charged = (balance_months * double_rate + INTEREST_DIVISOR) // double_divisor
+                principal = principal_payment if principal_payment < balance else balance
+                extra = extra_payment if extra_payment < balance - principal else balance - principal
+                balance -= principal + extra
+                interest = charged - charged_before
+                yield ScheduleRow(month, (principal + extra + interest + fee) / 100,
+                                  principal / 100, extra / 100, interest / 100, fee / 100,
+                                  balance / 100, charged / 100,
+                                  (loan - balance + charged + fee * month) / 100)
+                charged_before = charged
+
+    def _row(self, index):
+        """Build the row for 0-based month index"""
+        from mortgage_money import interest_on
+
+        loan, rate, _, _, _ = self.terms
+        month = index + 1
+        start, opening, balance_months, principal_payment, extra_payment = max(
+            segment for segment in self.segments if segment[0] <= month)
+        elapsed = month - start
+        step = principal_payment + extra_payment
+        opening -= elapsed * step
+        balance_months += (elapsed + 1) * (opening + elapsed * step) \
+            - step * (elapsed + 1) * elapsed // 2
+        charged = interest_on(balance_months, rate)
+        interest = charged - interest_on(balance_months - opening, rate)
+        principal = min(principal_payment, opening)
+        extra = min(extra_payment, opening - principal)
+        balance = opening - principal - extra
+        fee = self.fee
+        return ScheduleRow(month, (principal + extra + interest + fee) / 100,
+                           principal / 100, extra / 100, interest / 100, fee / 100,
+                           balance / 100, charged / 100,
+                           (loan - balance + charged + fee * month) / 100)
+
+    def opening_state(self, month):
+        """(opening balance, balance-months before it) of month, in cents"""
+        start, opening, balance_months, principal_payment, extra_payment = max(
+            segment for segment in self.segments if segment[0] <= month)
+        elapsed = month - start
+        step = principal_payment + extra_payment
+        return (opening - elapsed * step,
+                balance_months + elapsed * opening - step * elapsed * (elapsed - 1) // 2)
+
+    def months_unchanged(self, terms):
+        """Leading months this schedule shares with one for terms"""
+        if terms[:3] != self.terms[:3]:
+            return 0
+        if terms[3:] == self.terms[3:]:
+            return self.months
+        # Only the extra payment or its start month changed: every month
+        # before either schedule's first extra payment is the same
+        starts = [start for extra, start in (self.terms[3:], terms[3:]) if extra > 0]
+        return min(self.months, min(starts) - 1) if starts else self.months
+
+
+def payment_segments(month, balance, balance_months, principal_payment, extra_payment,
+                     extra_start_month):
+    """Segments of a loan from month on, given its opening balance and the
+    balance-months accrued before it; returns (segments, last month)"""
+    segments = []
+    while balance > 0:
+        extra = extra_payment if month >= extra_start_month else 0
+        step = principal_payment + extra
+        # Months until the loan is repaid, or until extra payments start
+        if month < extra_start_month and extra_payment > 0:
+            length = extra_start_month - month
+            if step > 0:
+                length = min(length, -(-balance // step))
+        else:
+            length = -(-balance // step)
+        segments.append((month, balance, balance_months, principal_payment, extra))
+        balance_months += length * balance - step * length * (length - 1) // 2
+        balance = max(balance - length * step, 0)
+        month += length
+    return segments, month - 1
+
+
+def build_schedule(loan_amount, interest_rate, principal_payment, extra_payment=0.0,
+                   monthly_fee=0.0, extra_start_month=1, previous=None):
+    """Build the Schedule for one loan, reusing what it shares with previous
+
+    When previous is the Schedule of an earlier edit, the segments before the
+    first month the edit changes are kept and only the rest of the loan is
+    solved again: a new fee keeps every segment, and a new extra payment from
+    month k keeps the months before k. Either way the work does not grow with
+    the length of the loan.
+    """
+    from mortgage_money import to_cents, to_rate_units
+
+    loan_inputs = (loan_amount, interest_rate, principal_payment, extra_payment,
+                   extra_start_month)
+    if previous is not None and previous.loan_inputs == loan_inputs:
+        return Schedule(loan_inputs, previous.terms, int(to_cents(monthly_fee)),
+                        previous.segments, previous.months)
+
+    loan, principal, extra = (int(to_cents(amount)) for amount in (
+        loan_amount, principal_payment, extra_payment))
+    if principal + extra <= 0:
+        raise ValueError("Principal payment must be greater than 0")
+    terms = (loan, int(to_rate_units(interest_rate)), principal, extra,
+             max(int(extra_start_month), 1))
+    fee = int(to_cents(monthly_fee))
+
+    reused = previous.months_unchanged(terms) if previous is not None else 0
+    if reused and reused == previous.months:
+        return Schedule(loan_inputs, terms, fee, previous.segments, previous.months)
+    if reused:
+        kept = [segment for segment in previous.segments if segment[0] <= reused]
+        balance, balance_months = previous.opening_state(reused + 1)
+    else:
+        kept = []
+        balance, balance_months = loan, 0
+    segments, months = payment_segments(reused + 1, balance, balance_months,
+                                        principal, extra, terms[4])
+    return Schedule(loan_inputs, terms, fee, kept + segments, months)
+
+
+def portfolio_rows(loans):
+    """Yield (loan label, ScheduleRow) for every month of every loan
+
+    loans is an iterable of dicts with the calculate_batch() input names and
+    an optional 'label' and 'currency'.
+    """
+    for index, loan in enumerate(loans, start=1):
+        label = loan.get('label', index)
+        for row in _rows_for(loan):
+            yield label, row
+
+
+def _rows_for(loan):
+    """Schedule generator for one loan dict"""
+    return schedule_rows(loan['loan_amount'], loan['interest_rate'],
+                         loan['principal_payment'], loan.get('extra_payment', 0.0),
+                         loan.get('monthly_fee', 0.0), loan.get('extra_start_month', 1))
+
+
+# STEP 2: CSV Export
+@metrics.timed('schedule.write_csv')
+def write_schedule_csv(output, loans):
+    """Stream the schedules for loans to a CSV file or path
+
+    Returns the number of rows written.
+    """
+    if isinstance(output, str):
+        with open(output, 'w', newline='', encoding='utf-8') as output_file:
+            rows = write_schedule_csv(output_file, loans)
+        metrics.add_bytes('schedule.write_csv', os.path.getsize(output))
+        return rows
+
+    writer = csv.writer(output)
+    writer.writerow(PORTFOLIO_FIELDS)
+    rows = 0
+    for label, row in portfolio_rows(loans):
+        writer.writerow([label, row.month, f"{row.payment:.2f}", f"{row.principal:.2f}",
+                         f"{row.extra:.2f}", f"{row.interest:.2f}", f"{row.fee:.2f}",
+                         f"{row.balance:.2f}", f"{row.total_interest:.2f}",
+                         f"{row.total_paid:.2f}"])
+        rows += 1
+    return rows
+
+
+# STEP 3: PDF Export
+# Table columns as (heading, ScheduleRow field, right edge x position)
+PDF_COLUMNS = [
+    ("Month", 'month', 85),
+    ("Payment", 'payment', 160),
+    ("Principal", 'principal', 230),
+    ("Extra", 'extra', 290),
+    ("Interest", 'interest', 355),
+    ("Fee", 'fee', 410),
+    ("Balance", 'balance', 485),
+    ("Total Interest", 'total_interest', 562),
+]
+ROW_HEIGHT = 13
+
+
+class SchedulePdfWriter:
+    """Lay out amortization schedules on as many PDF pages as needed
+
+    Every loan starts on a new page with its own title. Each page repeats the
+    table header and ends with the running totals carried to the next page.
+    """
+
+    def __init__(self, filename, title="Amortization Schedule"):
+        """Create the canvas for filename"""
+        from reportlab.lib.pagesizes import letter
+        from reportlab.pdfgen import canvas
+
+        self.canvas = canvas.Canvas(filename, pagesize=letter, pageCompression=1)
+        self.width, self.height = letter
+        self.title = title
+        self.filename = filename
+        self.pages = 0
+        self.rows = 0
+        self._page_open = False
+
+    def add_schedule(self, rows, label="", currency=""):
+        """Write one loan's schedule, starting on a fresh page"""
+        self._finish_page()
+        heading = f"{self.title} - Loan {label}" if label != "" else self.title
+        y = self._start_page(heading, currency)
+        last = None
+        for row in rows:
+            if y < 60:
+                self._draw_totals(last, currency, "Carried forward")
+                self._finish_page()
+                y = self._start_page(f"{heading} (continued)", currency)
+            self._draw_row(row, y)
+            y -= ROW_HEIGHT
+            last = row
+            self.rows += 1
+        self._draw_totals(last, currency, "Totals")
+
+    def save(self):
+        """Finish the last page and write the file"""
+        self._finish_page()
+        self.canvas.save()
+        return self.pages
+
+    def _start_page(self, heading, currency):
+        """Draw the page title and table header, returning the first row y"""
+        c = self.canvas
+        self.pages += 1
+        self._page_open = True
+
+        c.setFont("Helvetica-Bold", 14)
+        c.drawString(50, self.height - 50, heading)
+        c.line(50, self.height - 58, self.width - 50, self.height - 58)
+        c.setFont("Helvetica", 8)
+        if currency:
+            c.drawString(50, self.height - 72, f"Amounts in {currency}")
+        c.drawRightString(self.width - 50, self.height - 72, f"Page {self.pages}")
+
+        y = self.height - 92
+        c.setFont("Helvetica-Bold", 8)
+        for heading_text, _, x in PDF_COLUMNS:
+            c.drawRightString(x, y, heading_text)
+        c.line(50, y - 4, self.width - 50, y - 4)
+        c.setFont("Helvetica", 8)
+        return y - ROW_HEIGHT - 2
+
+    def _draw_row(self, row, y):
+        """Draw one schedule row at height y"""
+        c = self.canvas
+        for _, field, x in PDF_COLUMNS:
+            value = getattr(row, field)
+            c.drawRightString(x, y, str(value) if field == 'month' else f"{value:,.0f}")
+
+    def _draw_totals(self, row, currency, caption):
+        """Draw the running totals under the table"""
+        if row is None:
+            return
+        c = self.canvas
+        c.line(50, 52, self.width - 50, 52)
+        c.setFont("Helvetica-Bold", 8)
+        c.drawString(50, 40, f"{caption} after month {row.month}: "
+                             f"interest {currency}{row.total_interest:,.0f}, "
+                             f"paid {currency}{row.total_paid:,.0f}, "
+                             f"balance {currency}{row.balance:,.0f}")
+        c.setFont("Helvetica", 8)
+
+    def _finish_page(self):
+        """Close the current page if one is open"""
+        if self._page_open:
+            self.canvas.showPage()
+            self._page_open = False
+
+
+@metrics.timed('schedule.write_pdf')
+def write_schedule_pdf(filename, loans, title="Amortization Schedule"):
+    """Stream the schedules for loans into one multi-page PDF
+
+    Returns (pages, rows) written.
+    """
+    writer = SchedulePdfWriter(filename, title)
+    for index, loan in enumerate(loans, start=1):
+        writer.add_schedule(_rows_for(loan), loan.get('label', index),
+                            loan.get('currency', ''))
+    writer.save()
+    metrics.add_bytes('schedule.write_pdf', os.path.getsize(filename))
+    return writer.pages, writer.rows
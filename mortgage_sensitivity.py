@@ -0,0 +1,170 @@
+# Interest rate x extra payment sensitivity grids.
+#
+# The whole grid is one broadcast call into the calculation engine: rates run
+# down the rows and extra payments across the columns.
+#
+# Usage:
+#     python mortgage_sensitivity.py --loan 2000000 --principal 5000 \
+#         --rates 2:8:0.05 --extras 0:10000:50 --out grid.csv
+import argparse
+import csv
+import sys
+
+import numpy as np
+
+from mortgage_engine import calculate_batch, solve_fixed_principal
+
+# STEP 1: Constants
+# Grid values that can be exported, with their table captions
+METRICS = {
+    'interest_paid': "Total interest paid",
+    'interest_saved': "Interest saved",
+    'payoff_months': "Payoff time (months)",
+    'monthly_payment': "First monthly payment",
+}
+
+
+# STEP 2: Grid Calculation
+def grid_range(start, stop, step):
+    """Evenly spaced values from start to stop inclusive"""
+    if not (np.isfinite([start, stop, step]).all() and step > 0 and stop >= start):
+        raise ValueError("Expected step > 0 and stop >= start")
+    count = int(round((stop - start) / step)) + 1
+    return np.round(start + step * np.arange(count), 10)
+
+
+def sensitivity_grid(loan_amount, principal_payment, rates, extra_payments,
+                     monthly_fee=0.0):
+    """Evaluate every (rate, extra payment) pair for one loan
+
+    Returns a dict with the 'rates' and 'extra_payments' axes and a 2-D
+    array of shape (len(rates), len(extra_payments)) for each name in
+    METRICS.
+    """
+    rates = np.asarray(rates, dtype=np.float64)
+    extra_payments = np.asarray(extra_payments, dtype=np.float64)
+    rate_grid = rates[:, np.newaxis]
+    extra_grid = extra_payments[np.newaxis, :]
+
+    results = calculate_batch(loan_amount, rate_grid, principal_payment,
+                              extra_grid, monthly_fee)
+    paid = solve_fixed_principal(loan_amount, rate_grid, principal_payment + extra_grid)
+
+    return {
+        'rates': rates,
+        'extra_payments': extra_payments,
+        'interest_paid': paid['total_interest'],
+        'interest_saved': results['interest_saved'],
+        'payoff_months': results['payoff_months'],
+        'monthly_payment': results['monthly_payment'],
+    }
+
+
+# STEP 3: Export
+def _format_cell(metric, value):
+    """Format one grid value for export"""
+    return str(int(value)) if metric == 'payoff_months' else f"{value:.2f}"
+
+
+def write_grid_csv(output, grid, metric='interest_paid'):
+    """Write one metric as a table: a row per rate, a column per extra payment"""
+    if isinstance(output, str):
+        with open(output, 'w', newline='', encoding='utf-8') as output_file:
+            return write_grid_csv(output_file, grid, metric)
+
+    writer = csv.writer(output)
+    writer.writerow(['rate \\ extra_payment'] + [f"{extra:g}" for extra in grid['extra_payments']])
+    for rate, values in zip(grid['rates'], grid[metric]):
+        writer.writerow([f"{rate:g}"] + [_format_cell(metric, value) for value in values])
+
+
+def write_grid_pdf(filename, grid, metric='interest_paid', title=None,
+                   columns_per_page=8, rows_per_page=45):
+    """Write one metric as a PDF table split into page-sized tiles
+
+    Large grids are cut into blocks of rows_per_page rates by
+    columns_per_page extra payments; every page repeats both headers.
+    Returns the number of pages written.
+    """
+    from reportlab.lib.pagesizes import letter
+    from reportlab.pdfgen import canvas
+
+    c = canvas.Canvas(filename, pagesize=letter, pageCompression=1)
+    width, height = letter
+    title = title or f"Sensitivity: {METRICS[metric]}"
+    rates, extras, values = grid['rates'], grid['extra_payments'], grid[metric]
+    column_width = (width - 110) / columns_per_page
+    pages = 0
+
+    for column_start in range(0, len(extras), columns_per_page):
+        column_stop = min(column_start + columns_per_page, len(extras))
+        for row_start in range(0, len(rates), rows_per_page):
+            row_stop = min(row_start + rows_per_page, len(rates))
+            pages += 1
+
+            c.setFont("Helvetica-Bold", 14)
+            c.drawString(50, height - 50, title)
+            c.line(50, height - 58, width - 50, height - 58)
+            c.setFont("Helvetica", 8)
+            c.drawString(50, height - 72, "Rows: interest rate (%), columns: extra payment")
+            c.drawRightString(width - 50, height - 72, f"Page {pages}")
+
+            y = height - 92
+            c.setFont("Helvetica-Bold", 8)
+            c.drawRightString(90, y, "Rate")
+            for offset, extra in enumerate(extras[column_start:column_stop]):
+                c.drawRightString(90 + column_width * (offset + 1), y, f"{extra:,.0f}")
+            c.line(50, y - 4, width - 50, y - 4)
+
+            for row in range(row_start, row_stop):
+                y -= 14
+                c.setFont("Helvetica-Bold", 8)
+                c.drawRightString(90, y, f"{rates[row]:g}")
+                c.setFont("Helvetica", 8)
+                for offset, value in enumerate(values[row, column_start:column_stop]):
+                    text = f"{int(value)}" if metric == 'payoff_months' else f"{value:,.0f}"
+                    c.drawRightString(90 + column_width * (offset + 1), y, text)
+            c.showPage()
+
+    c.save()
+    return pages
+
+
+# STEP 4: Command Line Interface
+def _parse_range(text):
+    """Parse start:stop:step into grid values"""
+    try:
+        start, stop, step = (float(part) for part in text.split(':'))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Expected start:stop:step, got {text!r}")
+    try:
+        return grid_range(start, stop, step)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(f"{e}, got {text!r}")
+
+
+def main(argv=None):
+    """Build a sensitivity grid from the command line and export it"""
+    parser = argparse.ArgumentParser(description="Rate x extra payment sensitivity grid")
+    parser.add_argument('--loan', type=float, required=True, help="Loan amount")
+    parser.add_argument('--principal', type=float, required=True, help="Principal payment")
+    parser.add_argument('--fee', type=float, default=0.0, help="Monthly house fee")
+    parser.add_argument('--rates', type=_parse_range, default=grid_range(2, 8, 0.05),
+                        help="Interest rates as start:stop:step (default 2:8:0.05)")
+    parser.add_argument('--extras', type=_parse_range, required=True,
+                        help="Extra payments as start:stop:step")
+    parser.add_argument('--metric', choices=sorted(METRICS), default='interest_paid')
+    parser.add_argument('--out', required=True, help="Output .csv or .pdf file")
+    args = parser.parse_args(argv)
+
+    grid = sensitivity_grid(args.loan, args.principal, args.rates, args.extras, args.fee)
+    if args.out.lower().endswith('.pdf'):
+        write_grid_pdf(args.out, grid, args.metric)
+    else:
+        write_grid_csv(args.out, grid, args.metric)
+    print(f"Wrote {len(args.rates)} x {len(args.extras)} grid to {args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
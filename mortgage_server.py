@@ -0,0 +1,496 @@
+# Local HTTP/JSON service exposing the mortgage calculator to other systems.
+#
+# A small asyncio HTTP/1.1 server (standard library only) with keep-alive
+# connections. Loans are posted as JSON using the Step 2 field names and come
+# back with the same result fields the window keeps in current_values, plus an
+# optional month-by-month schedule. Small requests are priced on the event
+# loop; large batches and every schedule request go to a process pool so the
+# loop keeps answering other clients.
+#
+# Usage:
+#     python mortgage_calculator_new.py --serve [--host 127.0.0.1] [--port 8765]
+#
+#     POST /calculate   {"loan_seeking": 1500000, "principal_payment": 5000}
+#     POST /calculate   {"loans": [{...}, {...}], "schedule": true}
+#     GET  /health
+#     GET  /metrics
+import argparse
+import asyncio
+import json
+import math
+import os
+import signal
+import sys
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import mortgage_metrics as metrics
+from mortgage_batch import DEFAULT_CURRENCY, INPUT_FIELDS, NUMERIC_FIELDS, parse_row
+from mortgage_engine import calculate_batch, validate_batch
+from mortgage_inputs import (AUTO_DOWN_PAYMENT_RATE, currency_symbol, format_months,
+                             parse_start_year)
+
+# STEP 1: Constants
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+DEFAULT_MAX_CONNECTIONS = 256  # Further connections get 503 straight away
+DEFAULT_MAX_CONCURRENT = 32  # Requests being priced at the same time
+KEEPALIVE_TIMEOUT = 15  # Seconds an idle connection is kept open
+MAX_REQUESTS_PER_CONNECTION = 10000
+MAX_BODY_BYTES = 32 * 1024 * 1024
+MAX_LOANS = 200_000
+MAX_SCHEDULE_LOANS = 1000
+MAX_SCHEDULE_ROWS = 360_000  # Months over all schedules, 1000 30-year loans
+
+# Requests with at least this many loans are priced in the process pool;
+# requests with schedules always are
+OFFLOAD_THRESHOLD = 2000
+
+REASONS = {
+    200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+    408: 'Request Timeout', 413: 'Payload Too Large', 500: 'Internal Server Error',
+    503: 'Service Unavailable',
+}
+
+
+class RequestError(Exception):
+    """Request that is answered with an HTTP error status"""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+# STEP 2: Pricing
+def _field_text(value):
+    """JSON value as the text the batch row parser expects"""
+    if value is None:
+        return ''
+    if isinstance(value, bool) or not isinstance(value, (str, int, float)):
+        raise ValueError(f"Invalid number format: {value!r}")
+    return str(value)
+
+
+def _json_number(field, value):
+    """A JSON number as a float, refusing values too large for one"""
+    try:
+        return float(value)
+    except OverflowError:
+        raise ValueError(f"{field} is too large")
+
+
+def parse_loan(loan):
+    """Numbers for one loan object, with the same defaults as batch mode
+
+    JSON numbers are used as they are; loans with text amounts such as
+    "1,500,000" or "auto" go through the batch row parser. Raises ValueError
+    for fields of the wrong JSON type and for amounts that are not finite.
+    """
+    if not isinstance(loan, dict):
+        raise ValueError("Each loan must be a JSON object")
+    currency = loan.get('currency')
+    if currency is not None and not isinstance(currency, str):
+        raise ValueError("currency must be a string")
+
+    values = {}
+    for field in NUMERIC_FIELDS:
+        value = loan.get(field)
+        if type(value) is int or type(value) is float:
+            values[field] = _json_number(field, value)
+        elif value is None and field != 'loan_seeking':
+            values[field] = None
+        else:
+            values = parse_row({field: _field_text(loan.get(field)) for field in INPUT_FIELDS})
+            break
+    else:
+        if values['down_payment'] is None:
+            values['down_payment'] = values['loan_seeking'] * AUTO_DOWN_PAYMENT_RATE
+        if values['interest_rate'] is None:
+            values['interest_rate'] = 4.5  # Same default as the interest rate entry
+        for field in ('principal_payment', 'extra_payment', 'monthly_fee'):
+            if values[field] is None:
+                values[field] = 0.0
+
+        values['currency'] = currency_symbol(currency or DEFAULT_CURRENCY)
+        values['extra_start_month'] = parse_start_year(_field_text(loan.get('extra_start_year')))
+
+    for field in NUMERIC_FIELDS:
+        if not math.isfinite(values[field]):
+            raise ValueError(f"{field} is too large")
+    return values
+
+
+def price_loans(loans):
+    """Validate and price a list of loan dicts
+
+    Each loan uses the Step 2 field names; missing fields get the same
+    defaults as batch mode. Returns one dict per loan, either the
+    current_values fields or {'error': ...}.
+    """
+    results = [None] * len(loans)
+    positions = []
+    parsed = []
+    for position, loan in enumerate(loans):
+        try:
+            parsed.append(parse_loan(loan))
+            positions.append(position)
+        except ValueError as e:
+            results[position] = {'error': str(e)}
+
+    if not parsed:
+        return results
+
+    columns = {field: np.array([values[field] for values in parsed], dtype=float)
+               for field in NUMERIC_FIELDS}
+    columns['extra_start_month'] = np.array([values['extra_start_month'] for values in parsed],
+                                            dtype=np.int64)
+    errors = validate_batch(*(columns[field] for field in NUMERIC_FIELDS))
+    valid = np.flatnonzero(errors == '')
+    for index in np.flatnonzero(errors != ''):
+        results[positions[index]] = {'error': str(errors[index])}
+    if not len(valid):
+        return results
+
+    selected = {field: column[valid] for field, column in columns.items()}
+    with np.errstate(over='ignore', invalid='ignore'):
+        priced = calculate_batch(selected['loan_seeking'] - selected['down_payment'],
+                                 selected['interest_rate'], selected['principal_payment'],
+                                 selected['extra_payment'], selected['monthly_fee'],
+                                 selected['extra_start_month'])
+    # Amounts near the float limit overflow while pricing; JSON has no Infinity
+    finite = np.logical_and.reduce([np.isfinite(column) for column in priced.values()])
+    priced = {name: column.tolist() for name, column in priced.items()}
+
+    for offset, index in enumerate(valid.tolist()):
+        if not finite[offset]:
+            results[positions[index]] = {'error': "Amounts are too large to price"}
+            continue
+        values = parsed[index]
+        payoff = priced['payoff_months'][offset]
+        saved = priced['time_saved_months'][offset]
+        result = {
+            'loan_amount': priced['loan_amount'][offset],
+            'interest_rate': values['interest_rate'],
+            'currency_symbol': values['currency'],
+            'monthly_payment': priced['monthly_payment'][offset],
+            'total_interest': priced['total_interest'][offset],
+            'principal_payment': values['principal_payment'],
+            'extra_payment': values['extra_payment'],
+            'monthly_fee': values['monthly_fee'],
+            'extra_start_month': values['extra_start_month'],
+            'time_saved': format_months(saved),
+            'interest_saved': priced['interest_saved'][offset],
+            'loan_payoff': format_months(payoff),
+            'loan_seeking': values['loan_seeking'],
+            'down_payment': values['down_payment'],
+            'monthly_interest': priced['monthly_interest'][offset],
+            'payoff_months': payoff,
+            'time_saved_months': saved,
+        }
+        results[positions[index]] = result
+    return results
+
+
+def _schedule(result):
+    """Month-by-month schedule for a priced loan, amounts rounded to cents"""
+    from mortgage_schedule import schedule_rows
+
+    return [[row[0]] + [round(value, 2) for value in row[1:]]
+            for row in schedule_rows(result['loan_amount'], result['interest_rate'],
+                                     result['principal_payment'], result['extra_payment'],
+                                     result['monthly_fee'], result['extra_start_month'])]
+
+
+def calculate_response(loans, include_schedule, single):
+    """Price loans and encode the response body
+
+    Runs on the event loop or in a worker process, so the JSON encoding of
+    large responses happens off the loop as well. Schedules are only built
+    when their months add up to at most MAX_SCHEDULE_ROWS; larger requests
+    get 413.
+    """
+    results = price_loans(loans)
+    if include_schedule:
+        rows = sum(result['payoff_months'] for result in results if 'error' not in result)
+        if rows > MAX_SCHEDULE_ROWS:
+            return 413, _encode({'error': f"Schedules are limited to {MAX_SCHEDULE_ROWS:,} "
+                                          f"months per request, this one has {rows:,}"})
+        for result in results:
+            if 'error' not in result:
+                result['schedule'] = _schedule(result)
+    if single:
+        if 'error' in results[0]:
+            return 400, _encode(results[0])
+        body = results[0]
+    else:
+        body = {'results': results,
+                'errors': sum(1 for result in results if 'error' in result)}
+    if include_schedule:
+        from mortgage_schedule import SCHEDULE_FIELDS
+        body = dict(body, schedule_fields=SCHEDULE_FIELDS)
+    return 200, _encode(body)
+
+
+def _encode(body):
+    """Compact JSON encoding of a response body"""
+    return json.dumps(body, separators=(',', ':'), allow_nan=False).encode('utf-8')
+
+
+def _reject_constant(name):
+    """Refuse NaN and Infinity, which are not valid JSON numbers"""
+    raise ValueError(f"Invalid number: {name}")
+
+
+def parse_calculate_body(body):
+    """Return (loans, include_schedule, single) from a /calculate body"""
+    try:
+        payload = json.loads(body, parse_constant=_reject_constant)
+    except ValueError as e:
+        raise RequestError(400, f"Invalid JSON: {e}")
+
+    if isinstance(payload, list):
+        loans, include_schedule, single = payload, False, False
+    elif isinstance(payload, dict) and 'loans' in payload:
+        loans, single = payload['loans'], False
+        include_schedule = payload.get('schedule', False)
+    elif isinstance(payload, dict):
+        loans, single = [payload], True
+        include_schedule = payload.get('schedule', False)
+    else:
+        raise RequestError(400, "Expected a loan object, a list of loans or {\"loans\": [...]}")
+
+    if not isinstance(loans, list):
+        raise RequestError(400, "\"loans\" must be a list")
+    if not isinstance(include_schedule, bool):
+        raise RequestError(400, "\"schedule\" must be true or false")
+    if len(loans) > MAX_LOANS:
+        raise RequestError(413, f"At most {MAX_LOANS:,} loans per request")
+    if include_schedule and len(loans) > MAX_SCHEDULE_LOANS:
+        raise RequestError(413, f"Schedules are limited to {MAX_SCHEDULE_LOANS:,} loans per request")
+    return loans, include_schedule, single
+
+
+# STEP 3: HTTP Server
+class MortgageServer:
+    """asyncio HTTP/1.1 server for the calculator with keep-alive and limits"""
+
+    def __init__(self, host=DEFAULT_HOST, port=DEFAULT_PORT, workers=None,
+                 max_connections=DEFAULT_MAX_CONNECTIONS,
+                 max_concurrent=DEFAULT_MAX_CONCURRENT,
+                 keepalive_timeout=KEEPALIVE_TIMEOUT,
+                 offload_threshold=OFFLOAD_THRESHOLD):
+        """Configure the server; the process pool starts with start()"""
+        self.host = host
+        self.port = port
+        self.workers = workers or os.cpu_count() or 1
+        self.max_connections = max_connections
+        self.max_concurrent = max_concurrent
+        self.keepalive_timeout = keepalive_timeout
+        self.offload_threshold = offload_threshold
+
+        self.connections = 0
+        self.requests = 0
+        self.offloaded = 0
+        self._limit = None
+        self._pool = None
+        self._server = None
+
+    async def start(self):
+        """Start the process pool and begin listening"""
+        self._limit = asyncio.Semaphore(self.max_concurrent)
+        self._pool = ProcessPoolExecutor(max_workers=self.workers)
+        # Fork the workers before listening, so they hold no client sockets open
+        await asyncio.get_running_loop().run_in_executor(self._pool, int)
+        self._server = await asyncio.start_server(self._handle_connection,
+                                                  self.host, self.port)
+        # With port 0 the system picks a free port
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def serve_forever(self):
+        """Start if needed and serve until cancelled"""
+        if self._server is None:
+            await self.start()
+        try:
+            await self._server.serve_forever()
+        finally:
+            await self.close()
+
+    async def close(self):
+        """Stop listening and shut down the process pool"""
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        if self._pool is not None:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+            self._pool = None
+
+    async def _handle_connection(self, reader, writer):
+        """Serve requests on one connection until it closes or idles out"""
+        if self.connections >= self.max_connections:
+            writer.write(_http_response(503, _encode({'error': "Too many connections"}), False))
+            await _close(writer)
+            return
+
+        self.connections += 1
+        try:
+            for _ in range(MAX_REQUESTS_PER_CONNECTION):
+                try:
+                    request = await asyncio.wait_for(self._read_request(reader),
+                                                     self.keepalive_timeout)
+                except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+                    break
+                except RequestError as e:
+                    writer.write(_http_response(e.status, _encode({'error': str(e)}), False))
+                    break
+                method, path, keep_alive, body = request
+
+                start = time.perf_counter()
+                try:
+                    status, payload = await self._dispatch(method, path, body)
+                except RequestError as e:
+                    status, payload = e.status, _encode({'error': str(e)})
+                except Exception:
+                    # A bug must not drop the connection without an answer
+                    traceback.print_exc()
+                    status, payload = 500, _encode({'error': "Internal server error"})
+                self.requests += 1
+                metrics.record(f"server.{path.strip('/') or 'root'}",
+                               time.perf_counter() - start, status >= 400)
+
+                writer.write(_http_response(status, payload, keep_alive,
+                                            self.keepalive_timeout))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            self.connections -= 1
+            await _close(writer)
+
+    async def _read_request(self, reader):
+        """Read one request; returns (method, path, keep_alive, body)"""
+        try:
+            head = await reader.readuntil(b'\r\n\r\n')
+        except asyncio.LimitOverrunError:
+            raise RequestError(413, "Request headers too large")
+        lines = head.decode('latin-1').split('\r\n')
+        try:
+            method, target, version = lines[0].split(' ')
+        except ValueError:
+            raise RequestError(400, "Malformed request line")
+
+        headers = {}
+        for line in lines[1:]:
+            name, _, value = line.partition(':')
+            if name:
+                headers[name.strip().lower()] = value.strip()
+
+        connection = headers.get('connection', '').lower()
+        if version == 'HTTP/1.1':
+            keep_alive = connection != 'close'
+        else:
+            keep_alive = connection == 'keep-alive'
+
+        try:
+            length = int(headers.get('content-length', 0))
+        except ValueError:
+            raise RequestError(400, "Invalid Content-Length")
+        if length > MAX_BODY_BYTES:
+            raise RequestError(413, f"Request body is larger than {MAX_BODY_BYTES:,} bytes")
+        body = await reader.readexactly(length) if length else b''
+        return method, target.split('?', 1)[0], keep_alive, body
+
+    async def _dispatch(self, method, path, body):
+        """Route a request; returns (status, encoded body)"""
+        if path == '/calculate':
+            if method != 'POST':
+                raise RequestError(405, "Use POST for /calculate")
+            return await self._calculate(body)
+        if path == '/health':
+            return 200, _encode({'status': 'ok', 'connections': self.connections,
+                                 'requests': self.requests, 'offloaded': self.offloaded})
+        if path == '/metrics':
+            return 200, _encode(metrics.snapshot())
+        raise RequestError(404, f"No such endpoint: {path}")
+
+    async def _calculate(self, body):
+        """Price the loans in a /calculate body, offloading large requests"""
+        loans, include_schedule, single = parse_calculate_body(body)
+        async with self._limit:
+            if not include_schedule and len(loans) < self.offload_threshold:
+                return calculate_response(loans, include_schedule, single)
+            self.offloaded += 1
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._pool, calculate_response,
+                                              loans, include_schedule, single)
+
+
+def _http_response(status, body, keep_alive, keepalive_timeout=KEEPALIVE_TIMEOUT):
+    """Encode an HTTP/1.1 JSON response"""
+    head = (f"HTTP/1.1 {status} {REASONS.get(status, 'Error')}\r\n"
+            f"Content-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n")
+    if keep_alive:
+        head += f"Connection: keep-alive\r\nKeep-Alive: timeout={keepalive_timeout}\r\n\r\n"
+    else:
+        head += "Connection: close\r\n\r\n"
+    return head.encode('latin-1') + body
+
+
+async def _close(writer):
+    """Close a connection, ignoring clients that already went away"""
+    writer.close()
+    try:
+        await writer.wait_closed()
+    except ConnectionError:
+        pass
+
+
+# STEP 4: Command Line
+def build_parser():
+    """Create the argument parser for server mode"""
+    parser = argparse.ArgumentParser(
+        description="Serve the mortgage calculator as a local HTTP/JSON API")
+    parser.add_argument('--serve', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--host', default=DEFAULT_HOST, help="Address to listen on")
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help="Port to listen on")
+    parser.add_argument('--workers', type=int,
+                        help="Worker processes for large requests (default: all cores)")
+    parser.add_argument('--max-connections', type=int, default=DEFAULT_MAX_CONNECTIONS,
+                        help="Open connections before new ones are refused with 503")
+    parser.add_argument('--max-concurrent', type=int, default=DEFAULT_MAX_CONCURRENT,
+                        help="Requests priced at the same time; others wait")
+    parser.add_argument('--offload-threshold', type=int, default=OFFLOAD_THRESHOLD,
+                        help="Loans per request sent to the pool (schedules always are)")
+    return parser
+
+
+def main(argv=None):
+    """Run server mode from the command line"""
+    args = build_parser().parse_args(argv)
+    server = MortgageServer(args.host, args.port, args.workers, args.max_connections,
+                            args.max_concurrent, offload_threshold=args.offload_threshold)
+
+    async def run():
+        # Stop on SIGTERM as on Ctrl+C, shutting the worker processes down
+        asyncio.get_running_loop().add_signal_handler(signal.SIGTERM,
+                                                      asyncio.current_task().cancel)
+        await server.start()
+        print(f"Serving on http://{server.host}:{server.port} "
+              f"({server.workers} worker processes)", flush=True)
+        await server.serve_forever()
+
+    try:
+        asyncio.run(run())
+    except (KeyboardInterrupt, asyncio.CancelledError):
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
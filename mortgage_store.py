@@ -0,0 +1,299 @@
+# Local SQLite store of saved scenarios.
+#
+# Each scenario keeps its Step 2 inputs next to the computed results shown in
+# the window, so listing or reopening a scenario never runs the engine again.
+# Schedules are stored separately as compressed blobs and read only when a
+# scenario is opened. Indexes on customer, date, rate and loan amount keep
+# filtered listings fast with hundreds of thousands of rows, and bulk saves
+# from batch runs go through one prepared statement per transaction.
+import os
+import sqlite3
+import zlib
+from array import array
+from datetime import datetime
+
+from mortgage_inputs import format_months
+
+# STEP 1: Constants
+DEFAULT_STORE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                  'scenarios.db')
+DEFAULT_PAGE_SIZE = 200
+# A rate or amount filter matching at least this many rows is applied while
+# walking the sort order instead of through its own index and a sort
+SORTED_SCAN_MIN_MATCHES = 5000
+
+# Stored inputs and results, in table order
+SCENARIO_FIELDS = [
+    'created', 'customer', 'label', 'currency',
+    'loan_seeking', 'down_payment', 'loan_amount', 'interest_rate',
+    'principal_payment', 'extra_payment', 'monthly_fee', 'extra_start_month',
+    'monthly_interest', 'monthly_payment', 'total_interest', 'interest_saved',
+    'payoff_months', 'time_saved_months',
+]
+# Columns query() can sort by
+SORT_FIELDS = ['id', 'created', 'customer', 'interest_rate', 'loan_amount',
+               'monthly_payment', 'total_interest', 'payoff_months']
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS scenarios (
+    id INTEGER PRIMARY KEY,
+    created TEXT NOT NULL,
+    customer TEXT NOT NULL DEFAULT '',
+    label TEXT NOT NULL DEFAULT '',
+    currency TEXT NOT NULL,
+    loan_seeking REAL NOT NULL,
+    down_payment REAL NOT NULL,
+    loan_amount REAL NOT NULL,
+    interest_rate REAL NOT NULL,
+    principal_payment REAL NOT NULL,
+    extra_payment REAL NOT NULL,
+    monthly_fee REAL NOT NULL,
+    extra_start_month INTEGER NOT NULL DEFAULT 1,
+    monthly_interest REAL NOT NULL,
+    monthly_payment REAL NOT NULL,
+    total_interest REAL NOT NULL,
+    interest_saved REAL NOT NULL,
+    payoff_months INTEGER NOT NULL,
+    time_saved_months INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS schedules (
+    scenario_id INTEGER PRIMARY KEY REFERENCES scenarios(id) ON DELETE CASCADE,
+    months INTEGER NOT NULL,
+    rows BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS scenarios_customer ON scenarios(customer, created);
+CREATE INDEX IF NOT EXISTS scenarios_created ON scenarios(created);
+CREATE INDEX IF NOT EXISTS scenarios_rate ON scenarios(interest_rate);
+CREATE INDEX IF NOT EXISTS scenarios_loan_amount ON scenarios(loan_amount);
+"""
+
+INSERT_SCENARIO = (f"INSERT INTO scenarios ({', '.join(SCENARIO_FIELDS)}) "
+                   f"VALUES ({', '.join('?' * len(SCENARIO_FIELDS))})")
+INSERT_SCHEDULE = "INSERT OR REPLACE INTO schedules (scenario_id, months, rows) VALUES (?, ?, ?)"
+
+
+def timestamp():
+    """Current local time as stored in the created column"""
+    return datetime.now().isoformat(sep=' ', timespec='seconds')
+
+
+# STEP 2: Schedule Blobs
+def pack_schedule(rows):
+    """Compress ScheduleRows into (months, blob)"""
+    values = array('d')
+    months = 0
+    for row in rows:
+        values.extend(row)
+        months += 1
+    return months, zlib.compress(values.tobytes(), 6)
+
+
+def unpack_schedule(blob):
+    """Rebuild the ScheduleRows packed by pack_schedule()"""
+    from mortgage_schedule import ScheduleRow
+
+    values = array('d')
+    values.frombytes(zlib.decompress(blob))
+    width = len(ScheduleRow._fields)
+    return [ScheduleRow(int(values[start]), *values[start + 1:start + width])
+            for start in range(0, len(values), width)]
+
+
+# STEP 3: Scenario Store
+class ScenarioStore:
+    """Saved scenarios in one SQLite file
+
+    Records are dicts with the SCENARIO_FIELDS names plus 'id'. Missing
+    'created' values are filled in with the current time.
+    """
+
+    def __init__(self, path=DEFAULT_STORE_PATH):
+        """Open (and if needed create) the store at path"""
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        self.connection.row_factory = sqlite3.Row
+        self.connection.execute("PRAGMA foreign_keys = ON")
+        if path != ':memory:':
+            self.connection.execute("PRAGMA journal_mode = WAL")
+            self.connection.execute("PRAGMA synchronous = NORMAL")
+        self.connection.executescript(SCHEMA)
+        columns = {row['name'] for row in self.connection.execute("PRAGMA table_info(scenarios)")}
+        if 'extra_start_month' not in columns:
+            # Stores created before extra payments could start later in the loan
+            self.connection.execute("ALTER TABLE scenarios ADD COLUMN "
+                                    "extra_start_month INTEGER NOT NULL DEFAULT 1")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """Close the database connection"""
+        self.connection.close()
+
+    # Saving
+    def save(self, inputs, results, schedule=None, customer="", label=""):
+        """Save one calculation and optionally its schedule; returns its id
+
+        inputs are the Step 2 values (as from parse_inputs()) and results
+        the dict returned by calculate_loan().
+        """
+        record = dict(results, **inputs, customer=customer, label=label)
+        with self.connection:
+            cursor = self.connection.execute(INSERT_SCENARIO, self._values(record, timestamp()))
+            scenario_id = cursor.lastrowid
+            if schedule is not None:
+                self.connection.execute(INSERT_SCHEDULE,
+                                        (scenario_id, *pack_schedule(schedule)))
+        return scenario_id
+
+    def save_many(self, records):
+        """Save many records in one transaction; returns the number saved
+
+        Schedules are not saved; use save() for scenarios that need them.
+        """
+        created = timestamp()
+        with self.connection:
+            cursor = self.connection.executemany(
+                INSERT_SCENARIO, (self._values(record, created) for record in records))
+        return cursor.rowcount
+
+    def delete(self, scenario_id):
+        """Delete a scenario and its schedule"""
+        with self.connection:
+            self.connection.execute("DELETE FROM scenarios WHERE id = ?", (scenario_id,))
+
+    @staticmethod
+    def _values(record, created):
+        """Parameter tuple for INSERT_SCENARIO"""
+        return (
+            record.get('created') or created,
+            record.get('customer') or '',
+            record.get('label') or '',
+            record['currency'],
+            float(record['loan_seeking']),
+            float(record['down_payment']),
+            float(record['loan_amount']),
+            float(record['interest_rate']),
+            float(record['principal_payment']),
+            float(record['extra_payment']),
+            float(record['monthly_fee']),
+            int(record.get('extra_start_month') or 1),
+            float(record['monthly_interest']),
+            float(record['monthly_payment']),
+            float(record['total_interest']),
+            float(record['interest_saved']),
+            int(record['payoff_months']),
+            int(record['time_saved_months']),
+        )
+
+    # Reading
+    def get(self, scenario_id):
+        """Return the stored record for scenario_id, or None"""
+        row = self.connection.execute(
+            "SELECT * FROM scenarios WHERE id = ?", (scenario_id,)).fetchone()
+        return dict(row) if row is not None else None
+
+    def schedule(self, scenario_id):
+        """Return the stored ScheduleRows for scenario_id, or None if not saved"""
+        row = self.connection.execute(
+            "SELECT rows FROM schedules WHERE scenario_id = ?", (scenario_id,)).fetchone()
+        return unpack_schedule(row[0]) if row is not None else None
+
+    def query(self, customer=None, since=None, until=None, min_rate=None, max_rate=None,
+              min_amount=None, max_amount=None, order_by='created', descending=True,
+              limit=DEFAULT_PAGE_SIZE, offset=0):
+        """List stored records matching the filters, one page at a time
+
+        customer matches a prefix; since/until are inclusive 'YYYY-MM-DD'
+        dates; rates and loan amounts are inclusive ranges.
+        """
+        if order_by not in SORT_FIELDS:
+            raise ValueError(f"Cannot sort by {order_by}")
+        filters = (customer, since, until, min_rate, max_rate, min_amount, max_amount)
+        where, parameters = self._where(*filters)
+        ranges = {'interest_rate': (min_rate, max_rate), 'loan_amount': (min_amount, max_amount)}
+        if any(column != order_by and bounds != (None, None)
+               for column, bounds in ranges.items()) and (
+                   customer or self._matches_at_least(where, parameters,
+                                                      SORTED_SCAN_MIN_MATCHES)):
+            # The customer index narrows the rows best. Without a customer, a
+            # broad range filter is cheaper to apply while reading rows in
+            # order than to sort every match
+            where, parameters = self._where(*filters, range_indexes=False)
+        direction = 'DESC' if descending else 'ASC'
+        rows = self.connection.execute(
+            f"SELECT * FROM scenarios {where} ORDER BY {order_by} {direction}, id {direction} "
+            f"LIMIT ? OFFSET ?", (*parameters, limit, offset))
+        return [dict(row) for row in rows]
+
+    def count(self, customer=None, since=None, until=None, min_rate=None, max_rate=None,
+              min_amount=None, max_amount=None):
+        """Number of stored records matching the query() filters"""
+        where, parameters = self._where(customer, since, until, min_rate, max_rate,
+                                        min_amount, max_amount, range_indexes=not customer)
+        return self.connection.execute(
+            f"SELECT COUNT(*) FROM scenarios {where}", parameters).fetchone()[0]
+
+    def _matches_at_least(self, where, parameters, count):
+        """True when at least count rows match, counting no further"""
+        return self.connection.execute(
+            f"SELECT COUNT(*) FROM (SELECT 1 FROM scenarios {where} LIMIT ?)",
+            (*parameters, count)).fetchone()[0] >= count
+
+    @staticmethod
+    def _where(customer, since, until, min_rate, max_rate, min_amount, max_amount,
+               range_indexes=True):
+        """WHERE clause and parameters for the query() filters
+
+        With range_indexes False the rate and amount conditions are written so
+        SQLite cannot use their indexes.
+        """
+        conditions = []
+        parameters = []
+        if customer:
+            # Prefix range rather than LIKE, so the customer index is used
+            conditions.append("customer >= ? AND customer < ?")
+            parameters += [customer, customer + '\U0010ffff']
+        if since:
+            conditions.append("created >= ?")
+            parameters.append(since)
+        if until:
+            conditions.append("created < ?")
+            parameters.append(f"{until}\x7f")  # Whole day, after any time of day
+        prefix = '' if range_indexes else '+'
+        for column, low, high in ((f'{prefix}interest_rate', min_rate, max_rate),
+                                  (f'{prefix}loan_amount', min_amount, max_amount)):
+            if low is not None:
+                conditions.append(f"{column} >= ?")
+                parameters.append(low)
+            if high is not None:
+                conditions.append(f"{column} <= ?")
+                parameters.append(high)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        return where, parameters
+
+
+# STEP 4: Records for the Window
+def record_inputs(record):
+    """The Step 2 inputs of a stored record, as parse_inputs() returns them"""
+    return {field: record[field] for field in (
+        'loan_seeking', 'down_payment', 'interest_rate', 'principal_payment',
+        'extra_payment', 'monthly_fee', 'currency', 'extra_start_month')}
+
+
+def record_results(record):
+    """The calculate_loan() results shown in the window, from a stored record"""
+    return {field: record[field] for field in (
+        'loan_amount', 'monthly_interest', 'monthly_payment', 'total_interest',
+        'interest_saved', 'payoff_months', 'time_saved_months')}
+
+
+def record_summary(record):
+    """One line describing a stored record"""
+    currency = record['currency']
+    return (f"{record['customer'] or '-'}: {currency}{record['loan_amount']:,.0f} at "
+            f"{record['interest_rate']:g}%, {currency}{record['monthly_payment']:,.0f}/month, "
+            f"paid off in {format_months(record['payoff_months'])}")
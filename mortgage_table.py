@@ -0,0 +1,230 @@
+# Virtualized month-by-month schedule table for the calculator window.
+#
+# The Treeview only ever holds the rows that fit on screen. Scrolling,
+# resizing and sorting change which schedule months those items show instead
+# of adding an item per month, and rows are read from the schedule sequence
+# only when they are shown. With a mortgage_schedule.Schedule, which builds
+# each row on access, a 100,000-month schedule costs the same to display and
+# scroll as a 12-month one.
+from array import array
+from tkinter import ttk
+
+# STEP 1: Constants
+# (ScheduleRow field, heading, width)
+COLUMNS = [
+    ('month', "Month", 70), ('payment', "Payment", 95), ('principal', "Principal", 90),
+    ('extra', "Extra", 80), ('interest', "Interest", 85), ('fee', "Fee", 70),
+    ('balance', "Balance", 110), ('total_interest', "Total Interest", 110),
+]
+# Fields that never decrease (1) or never increase (-1) from one month to the
+# next, so sorting by them needs no rows to be read
+MONOTONIC_FIELDS = {'month': 1, 'total_interest': 1, 'total_paid': 1, 'balance': -1}
+DEFAULT_ROW_HEIGHT = 20
+WHEEL_ROWS = 3  # Rows scrolled per mouse wheel step
+
+
+# STEP 2: Sorted View
+class ScheduleView:
+    """Maps table positions to schedule rows for the current sort order
+
+    rows is any sequence of ScheduleRows, such as a Schedule or the list
+    stored with a saved scenario. Month order and the monotonic fields are
+    plain or reversed positions; other fields keep one array of month
+    indexes, never a copy of the rows.
+    """
+
+    def __init__(self, rows=()):
+        self.rows = rows
+        self.field = 'month'
+        self.descending = False
+        self._order = None  # Month index per position, when not plain or reversed
+        self._reversed = False
+
+    def __len__(self):
+        return len(self.rows)
+
+    def set_rows(self, rows):
+        """Show rows in the current sort order"""
+        self.rows = rows
+        self.sort(self.field, self.descending)
+
+    def sort(self, field, descending=False):
+        """Order the positions by a ScheduleRow field; ties keep month order"""
+        self.field, self.descending = field, descending
+        direction = MONOTONIC_FIELDS.get(field)
+        if direction is not None:
+            self._order = None
+            self._reversed = (direction < 0) != descending
+            return
+        column = list(self.rows[0]._fields).index(field) if len(self.rows) else 0
+        keys = [row[column] for row in self.rows]
+        order = sorted(range(len(keys)), key=keys.__getitem__, reverse=descending)
+        self._order = array('l', order)
+        self._reversed = False
+
+    def month_index(self, position):
+        """0-based month index of the row shown at position"""
+        if self._order is not None:
+            return self._order[position]
+        return len(self.rows) - 1 - position if self._reversed else position
+
+    def row_at(self, position):
+        """The ScheduleRow shown at position"""
+        return self.rows[self.month_index(position)]
+
+    def position_of(self, month_index):
+        """Position at which the row for a 0-based month index is shown"""
+        if self._order is not None:
+            return self._order.index(month_index)
+        return len(self.rows) - 1 - month_index if self._reversed else month_index
+
+
+# STEP 3: Table Widget
+class ScheduleTable(ttk.Frame):
+    """Scrollable schedule table that only creates items for visible rows
+
+    Click a heading to sort by it (again to reverse), and use
+    jump_to_year() to bring a year's first month to the top.
+    """
+
+    def __init__(self, parent, currency="kr", height=10, **kwargs):
+        super().__init__(parent, **kwargs)
+        self.view = ScheduleView()
+        self.currency = currency
+        self.offset = 0
+        self.row_height = DEFAULT_ROW_HEIGHT
+        self.header_height = DEFAULT_ROW_HEIGHT
+        self.capacity = height
+        self._redraw_pending = False
+
+        self.tree = ttk.Treeview(self, columns=[field for field, _, _ in COLUMNS],
+                                 show='headings', height=height, selectmode='none')
+        for field, heading, width in COLUMNS:
+            self.tree.heading(field, text=heading,
+                              command=lambda field=field: self.sort_by(field))
+            self.tree.column(field, width=width, minwidth=50, anchor='e')
+        self.scrollbar = ttk.Scrollbar(self, orient='vertical', command=self.yview)
+        self.tree.pack(side='left', fill='both', expand=True)
+        self.scrollbar.pack(side='right', fill='y')
+        self.items = []  # Item ids, reused for whichever rows are visible
+
+        self.tree.bind('<Configure>', self._on_resize)
+        for sequence in ('<MouseWheel>', '<Button-4>', '<Button-5>'):
+            self.tree.bind(sequence, self._on_wheel)
+        for key, rows in (('<Up>', -1), ('<Down>', 1), ('<Prior>', 'page-up'),
+                          ('<Next>', 'page-down')):
+            self.tree.bind(key, lambda event, rows=rows: self._on_key(rows))
+        self.tree.bind('<Home>', lambda event: self.scroll_to(0) or 'break')
+        self.tree.bind('<End>', lambda event: self.scroll_to(len(self.view)) or 'break')
+
+    # Data
+    def set_rows(self, rows, currency=None):
+        """Show a new schedule, keeping the sort order and scroll position"""
+        if currency is not None:
+            self.currency = currency
+        self.view.set_rows(rows)
+        self.scroll_to(self.offset)
+        self._schedule_redraw()
+
+    def sort_by(self, field):
+        """Sort by field, or reverse the order if already sorted by it"""
+        descending = not self.view.descending if self.view.field == field else False
+        self.view.sort(field, descending)
+        for name, heading, _ in COLUMNS:
+            arrow = (" ▼" if descending else " ▲") if name == field else ""
+            self.tree.heading(name, text=heading + arrow)
+        self.scroll_to(0)
+        self._schedule_redraw()
+
+    def jump_to_year(self, year):
+        """Scroll so the first month of year (1 is the first year) is on top"""
+        if not len(self.view):
+            return
+        month_index = min(max(int(year) - 1, 0) * 12, len(self.view) - 1)
+        self.scroll_to(self.view.position_of(month_index))
+
+    # Scrolling
+    def scroll_to(self, offset):
+        """Show rows from position offset on"""
+        offset = max(0, min(int(offset), len(self.view) - self.capacity))
+        if offset != self.offset:
+            self.offset = offset
+            self._schedule_redraw()
+
+    def yview(self, *args):
+        """Scrollbar command: ('moveto', fraction) or ('scroll', count, what)"""
+        if args[0] == 'moveto':
+            self.scroll_to(round(float(args[1]) * len(self.view)))
+        elif args[0] == 'scroll':
+            step = self.capacity if args[2] == 'pages' else 1
+            self.scroll_to(self.offset + int(args[1]) * step)
+
+    def _on_wheel(self, event):
+        if event.num == 4 or event.delta > 0:
+            self.scroll_to(self.offset - WHEEL_ROWS)
+        else:
+            self.scroll_to(self.offset + WHEEL_ROWS)
+        return 'break'
+
+    def _on_key(self, rows):
+        if rows == 'page-up':
+            rows = -self.capacity
+        elif rows == 'page-down':
+            rows = self.capacity
+        self.scroll_to(self.offset + rows)
+        return 'break'
+
+    def _on_resize(self, event):
+        capacity = max(1, (event.height - self.header_height) // self.row_height)
+        if capacity != self.capacity:
+            self.capacity = capacity
+            self.scroll_to(self.offset)
+            self._schedule_redraw()
+
+    # Drawing
+    def _schedule_redraw(self):
+        """Redraw once when idle, however many scroll events arrive first"""
+        if not self._redraw_pending:
+            self._redraw_pending = True
+            self.after_idle(self._redraw)
+
+    def _redraw(self):
+        """Point the visible items at the rows from offset on"""
+        self._redraw_pending = False
+        count = max(0, min(self.capacity, len(self.view) - self.offset))
+        while len(self.items) < count:
+            self.items.append(self.tree.insert('', 'end'))
+        if len(self.items) > count:
+            self.tree.delete(*self.items[count:])
+            del self.items[count:]
+        for position, item in enumerate(self.items, start=self.offset):
+            self.tree.item(item, values=self.format_row(self.view.row_at(position)))
+        self._measure()
+
+        total = len(self.view)
+        if total:
+            self.scrollbar.set(self.offset / total, (self.offset + count) / total)
+        else:
+            self.scrollbar.set(0, 1)
+
+    def _measure(self):
+        """Take the row and header heights from the first item once shown"""
+        if not self.items:
+            return
+        box = self.tree.bbox(self.items[0])
+        if box and (box[1], box[3]) != (self.header_height, self.row_height):
+            self.header_height, self.row_height = box[1], box[3]
+            height = self.tree.winfo_height()
+            capacity = max(1, (height - self.header_height) // self.row_height)
+            if height > 1 and capacity != self.capacity:
+                self.capacity = capacity
+                self._schedule_redraw()
+
+    def format_row(self, row):
+        """Cell texts for one ScheduleRow"""
+        currency = self.currency
+        year, month = divmod(row.month - 1, 12)
+        return (f"{row.month} (Y{year + 1})" if month == 0 else str(row.month),
+                f"{currency}{row.payment:,.2f}", f"{row.principal:,.2f}",
+                f"{row.extra:,.2f}", f"{row.interest:,.2f}", f"{row.fee:,.2f}",
+                f"{currency}{row.balance:,.2f}", f"{currency}{row.total_interest:,.2f}")